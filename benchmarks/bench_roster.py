@@ -0,0 +1,511 @@
+"""
+Benchmarks the roster hot paths on synthetic rosters
+
+Run from the repository root:
+
+    python -m benchmarks.bench_roster [--sizes 10,1000] [--only NAME ...]
+        [--output FILE] [--compare BASELINE]
+
+Results are written as JSON keyed by benchmark name and roster size, so the
+output of two commits can be compared with --compare. The run fails if the
+memory an entry retains exceeds its target in MEMORY_TARGETS.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+from src.dice import DiceExpression
+from src.entry import Entry
+from src.formats import FORMATS
+from src.render import colorize_hp, use_color
+from src.roster import Initiative
+from src.server import PlayerViewServer
+from src.simulate import simulate
+from src.snapshot import write_snapshot
+
+SIZES = (10, 100, 1000, 10000, 100000, 1000000)
+# Fast benchmarks are repeated until this many seconds were spent timing them
+# or MAX_REPEATS runs were made, keeping the best run
+MIN_TIME = 0.2
+MAX_REPEATS = 5
+# Calls per run for benchmarks of single cheap operations
+LOOKUPS = 10000
+ADDS = 1000
+SIMULATION_TRIALS = 2000
+VIEWERS = 300
+# Most bytes an entry may retain, per benchmark, once the roster is large
+# enough for fixed overheads not to matter; runs exceeding them fail
+MEMORY_TARGETS = {"entry_memory": 200, "roster_memory": 420}
+MEMORY_TARGET_MIN_SIZE = 1000
+BASE_NAMES = (
+    "goblin",
+    "orc",
+    "skeleton",
+    "giant spider",
+    "hobgoblin captain",
+    "Aria",
+    "Borin",
+    "Cassius the Bold",
+)
+# Synthetic names are all numbered, so put the named heroes on the party side
+PROFILES = {name: {"side": "party"} for name in ("Aria", "Borin", "Cassius the Bold")}
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, max_size: int = None):
+    """
+    Registers a benchmark under name; sizes above max_size are skipped
+
+    A benchmark is a context manager taking a roster size and a scratch
+    directory. It does its setup, yields (run, ops) where run is the callable
+    to time and ops the number of operations one call performs, and cleans
+    up afterwards. Whatever run returns is kept alive while the memory run
+    reads how many traced bytes are still allocated.
+    """
+
+    def register(func):
+        BENCHMARKS[name] = (contextmanager(func), max_size)
+        return func
+
+    return register
+
+
+def synthetic_entries(size: int, seed: int = 0) -> list:
+    """Returns size entries with varied names and stats, in initiative order"""
+    rng = random.Random(seed)
+    entries = []
+    for idx in range(1, size + 1):
+        hp_max = rng.randint(1, 200)
+        entries.append(
+            Entry(
+                f"{rng.choice(BASE_NAMES)} {idx}",
+                initiative=rng.randint(-2, 30),
+                init_bonus=rng.randint(-1, 5),
+                ac=rng.randint(8, 22),
+                hp_max=hp_max,
+                # Cover every HP color band, including overhealed and down
+                hp=rng.randint(-5, hp_max + 10),
+                hidden=rng.random() < 0.1,
+            )
+        )
+    entries.sort(key=lambda entry: -entry.initiative)
+    return entries
+
+
+def synthetic_roster(size: int, workdir: str) -> Initiative:
+    """Returns an Initiative holding size synthetic entries"""
+    path = os.path.join(workdir, f"roster-{size}.snap")
+    # Generating entries is slower than loading them, so keep a snapshot
+    if not os.path.exists(path):
+        write_snapshot(path, synthetic_entries(size))
+    initiative = Initiative(seed=0)
+    initiative.import_file(path, "snapshot")
+    return initiative
+
+
+@benchmark("entry_memory")
+def bench_entry_memory(size, workdir):
+    # retained_per_op is the size of one bare Entry and its list slot
+    yield lambda: synthetic_entries(size), size
+
+
+@benchmark("roster_memory")
+def bench_roster_memory(size, workdir):
+    # Write the snapshot outside of the measured runs
+    synthetic_roster(size, workdir)
+    # retained_per_op is what an entry costs once loaded into a roster, with
+    # its order, name index and group slots
+    yield lambda: synthetic_roster(size, workdir), size
+
+
+@benchmark("print_roster")
+def bench_print_roster(size, workdir):
+    initiative = synthetic_roster(size, workdir)
+    yield initiative.print_roster, 1
+
+
+@benchmark("hprint_roster")
+def bench_hprint_roster(size, workdir):
+    initiative = synthetic_roster(size, workdir)
+    yield initiative.hprint_roster, 1
+
+
+@benchmark("hprint_roster_after_change")
+def bench_hprint_roster_after_change(size, workdir):
+    initiative = synthetic_roster(size, workdir)
+    initiative.hprint_roster()
+
+    def run():
+        initiative.damage(size // 2, 1)
+        initiative.hprint_roster()
+
+    yield run, 1
+
+
+@benchmark("hprint_page")
+def bench_hprint_page(size, workdir):
+    initiative = synthetic_roster(size, workdir)
+    # A screenful from the middle of the roster
+    yield lambda: "".join(initiative.iter_roster(size // 2, size // 2 + 20, True)), 1
+
+
+@benchmark("hprint_collapsed")
+def bench_hprint_collapsed(size, workdir):
+    initiative = synthetic_roster(size, workdir)
+    # Synthetic entries fall into a handful of families, one row each
+    yield lambda: initiative.print_roster(True, collapse=True), 1
+
+
+@benchmark("colorize_hp")
+def bench_colorize_hp(size, workdir):
+    rng = random.Random(0)
+    cells = []
+    for _ in range(size):
+        hp_max = rng.randint(1, 200)
+        hp = rng.randint(-5, hp_max + 10)
+        cells.append((f"({hp}/{hp_max} HP)", hp, hp_max))
+    # Time the colored path even when the output is not a terminal
+    use_color(True)
+
+    def run():
+        for cell in cells:
+            colorize_hp(*cell)
+
+    try:
+        yield run, size
+    finally:
+        use_color()
+
+
+@benchmark("startup", max_size=10)
+def bench_startup(size, workdir):
+    # A fresh interpreter importing the program, as a scripted invocation does
+    command = [sys.executable, "-c", "import initiative"]
+    yield lambda: subprocess.run(command, check=True), 1
+
+
+@benchmark("get_entry_at_index")
+def bench_get_entry_at_index(size, workdir):
+    initiative = synthetic_roster(size, workdir)
+    rng = random.Random(0)
+    indexes = [rng.randrange(size) for _ in range(LOOKUPS)]
+
+    def run():
+        for index in indexes:
+            initiative.get_entry_at_index(index)
+
+    yield run, LOOKUPS
+
+
+@benchmark("copy_index")
+def bench_copy_index(size, workdir):
+    initiative = synthetic_roster(size, workdir)
+    # Copying as many entries as the roster holds doubles it
+    yield lambda: initiative.copy_index(0, size), size
+
+
+@benchmark("add_to_initiative")
+def bench_add_to_initiative(size, workdir):
+    initiative = synthetic_roster(size, workdir)
+    rng = random.Random(0)
+    # Half of the entries roll their initiative from a bonus
+    arguments = [
+        (f"added {idx}", rng.choice(("+2", "-1", str(rng.randint(1, 25)))), 14, 30)
+        for idx in range(ADDS)
+    ]
+
+    def run():
+        for name, init, ac, hp in arguments:
+            initiative.add_to_initiative(name, init, ac, hp, hp)
+
+    yield run, ADDS
+
+
+def _bench_export(fmt):
+    def bench(size, workdir):
+        initiative = synthetic_roster(size, workdir)
+        path = os.path.join(workdir, f"export-{size}.{fmt}")
+        yield lambda: initiative.export_file(path, fmt), size
+
+    return bench
+
+
+def _bench_import(fmt):
+    def bench(size, workdir):
+        path = os.path.join(workdir, f"import-{size}.{fmt}")
+        if not os.path.exists(path):
+            synthetic_roster(size, workdir).export_file(path, fmt)
+        yield lambda: Initiative(seed=0).import_file(path, fmt), size
+
+    return bench
+
+
+for _fmt in FORMATS:
+    benchmark(f"export_{_fmt}")(_bench_export(_fmt))
+    benchmark(f"import_{_fmt}")(_bench_import(_fmt))
+
+
+@benchmark("roll")
+def bench_roll(size, workdir):
+    initiative = synthetic_roster(min(size, 10), workdir)
+
+    def run():
+        for _ in range(size):
+            initiative.roll(modifier=3)
+
+    yield run, size
+
+
+@benchmark("roll_many")
+def bench_roll_many(size, workdir):
+    initiative = synthetic_roster(min(size, 10), workdir)
+    expression = DiceExpression.simple(modifier=3)
+    yield lambda: initiative.dice.roll_many(expression, size), size
+
+
+@benchmark("simulate", max_size=100)
+def bench_simulate(size, workdir):
+    initiative = synthetic_roster(size, workdir)
+
+    def run():
+        simulate(initiative, SIMULATION_TRIALS, PROFILES, workers=1, seed=0)
+
+    yield run, SIMULATION_TRIALS
+
+
+@benchmark("simulate_parallel", max_size=100)
+def bench_simulate_parallel(size, workdir):
+    initiative = synthetic_roster(size, workdir)
+
+    def run():
+        # One worker per CPU; compare with "simulate" to see the scaling
+        simulate(initiative, SIMULATION_TRIALS, PROFILES, seed=0)
+
+    yield run, SIMULATION_TRIALS
+
+
+@benchmark("player_view_publish", max_size=100000)
+def bench_player_view_publish(size, workdir):
+    initiative = synthetic_roster(size, workdir)
+    server = PlayerViewServer()
+    server.attach(initiative)
+    server.start()
+    viewers = []
+    try:
+        for _ in range(VIEWERS):
+            connection = socket.create_connection((server.host, server.port))
+            viewers.append((connection, connection.makefile("rb")))
+        for _, stream in viewers:
+            stream.readline()
+
+        def run():
+            # One change to the player view, then wait until every viewer
+            # received its diff
+            initiative.toggle_hidden(size // 2)
+            server.publish(initiative)
+            for _, stream in viewers:
+                stream.readline()
+
+        yield run, VIEWERS
+    finally:
+        for connection, stream in viewers:
+            stream.close()
+            connection.close()
+        server.stop()
+
+
+def measure(bench, size: int, workdir: str, trace_memory: bool = True) -> dict:
+    """
+    Times a benchmark at a roster size and measures its memory use
+
+    peak_bytes is the most memory traced during a run and retained_bytes
+    what was still allocated at its end, including what run returned.
+    """
+    best = None
+    spent = 0.0
+    repeats = 0
+    while repeats < MAX_REPEATS and (best is None or spent < MIN_TIME):
+        with bench(size, workdir) as (run, ops):
+            gc.collect()
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+        spent += elapsed
+        repeats += 1
+        best = elapsed if best is None else min(best, elapsed)
+    result = {
+        "seconds": best,
+        "per_op": best / ops,
+        "ops": ops,
+        "repeats": repeats,
+        "peak_bytes": None,
+        "retained_bytes": None,
+        "retained_per_op": None,
+    }
+    if trace_memory:
+        # Tracing slows everything down, so memory gets a run of its own
+        with bench(size, workdir) as (run, ops):
+            gc.collect()
+            tracemalloc.start()
+            try:
+                kept = run()
+                gc.collect()
+                retained, result["peak_bytes"] = tracemalloc.get_traced_memory()
+                result["retained_bytes"] = retained
+                result["retained_per_op"] = retained / ops
+                del kept
+            finally:
+                tracemalloc.stop()
+    return result
+
+
+def environment() -> dict:
+    """Returns what a run's results depend on besides the code under test"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": Initiative().dice.use_numpy,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run_benchmarks(names: list, sizes: list, trace_memory: bool = True) -> dict:
+    """Runs the named benchmarks at every size, reporting progress to stderr"""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            bench, max_size = BENCHMARKS[name]
+            results[name] = {}
+            for size in sizes:
+                if max_size is not None and size > max_size:
+                    continue
+                result = measure(bench, size, workdir, trace_memory)
+                results[name][str(size)] = result
+                print(
+                    f"{name:>28} {size:>8}: {result['seconds']:.6f}s",
+                    file=sys.stderr,
+                )
+    return {"environment": environment(), "results": results}
+
+
+def over_memory_target(current: dict) -> list:
+    """Prints and returns the (name, size, bytes) of results over their target"""
+    over = []
+    for name, target in MEMORY_TARGETS.items():
+        for size, result in current["results"].get(name, {}).items():
+            retained = result["retained_per_op"]
+            if int(size) < MEMORY_TARGET_MIN_SIZE or retained is None:
+                continue
+            if retained > target:
+                print(
+                    f"{name:>28} {size:>8}: {retained:.1f} bytes per entry, "
+                    f"over the target of {target}"
+                )
+                over.append((name, size, retained))
+    return over
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    Prints the timing of every result present in both runs
+
+    Returns the (name, size, ratio) of every result that got more than
+    threshold times slower.
+    """
+    regressions = []
+    for name, sizes in current["results"].items():
+        for size, result in sizes.items():
+            old = baseline["results"].get(name, {}).get(size)
+            if old is None or not old["seconds"]:
+                continue
+            ratio = result["seconds"] / old["seconds"]
+            flag = "  REGRESSION" if ratio > threshold else ""
+            print(
+                f"{name:>28} {size:>8}: {old['seconds']:.6f}s -> "
+                f"{result['seconds']:.6f}s ({ratio:.2f}x){flag}"
+            )
+            if ratio > threshold:
+                regressions.append((name, size, ratio))
+    return regressions
+
+
+def parse_arguments():
+    """Parses the benchmark runner's command-line arguments"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--sizes",
+        type=lambda text: [int(size) for size in text.split(",")],
+        default=list(SIZES),
+        help="comma-separated roster sizes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=sorted(BENCHMARKS),
+        metavar="NAME",
+        help="benchmarks to run (default: all)",
+    )
+    parser.add_argument(
+        "-o", "--output", metavar="FILE", help="write results here, not stdout"
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="BASELINE",
+        help="compare against the results of an earlier run",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="slowdown ratio reported as a regression (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="skip the separate peak memory runs",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    current = run_benchmarks(
+        args.only or list(BENCHMARKS), args.sizes, not args.no_memory
+    )
+    text = json.dumps(current, indent=2)
+    if args.output:
+        with open(args.output, "w") as fo:
+            fo.write(f"{text}\n")
+    else:
+        print(text)
+    failed = bool(over_memory_target(current))
+    if args.compare:
+        with open(args.compare, "r") as fo:
+            baseline = json.load(fo)
+        failed = bool(compare(baseline, current, args.threshold)) or failed
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
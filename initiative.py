@@ -1,7 +1,23 @@
 import argparse
+import sys
 
+import src.encounters as encounters
+import src.formats as formats
+import src.history as history
 import src.initiative_cmd as initiative_cmd
+import src.render as render
 import src.roster as roster
+import src.stats as stats
+
+# The player view server (asyncio), the shared roster (multiprocessing), the
+# journal and the bestiary (json) are slow to import, so they are imported
+# only by the options that use them
+
+
+def parse_address(text):
+    """Parses 'HOST:PORT' or 'PORT' into a (host, port) pair"""
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
 
 
 def parse_arguments():
@@ -13,7 +29,121 @@ def parse_arguments():
         type=str,
         required=False,
         default=None,
-        help="json-formatted file to import",
+        help="roster file to import",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        required=False,
+        default=None,
+        choices=formats.FORMATS,
+        help="format of the imported file (default: picked by file extension)",
+    )
+    parser.add_argument(
+        "-j",
+        "--journal",
+        type=str,
+        required=False,
+        default=None,
+        help="snapshot file to autosave to, recovering its journal on startup",
+    )
+    parser.add_argument(
+        "-s",
+        "--script",
+        type=str,
+        required=False,
+        default=None,
+        help="file of commands to run without prompting, or '-' for stdin",
+    )
+    parser.add_argument(
+        "--serve",
+        type=parse_address,
+        required=False,
+        default=None,
+        metavar="[HOST:]PORT",
+        help="serve the player view to viewers connecting to this address",
+    )
+    parser.add_argument(
+        "--watch",
+        type=parse_address,
+        required=False,
+        default=None,
+        metavar="[HOST:]PORT",
+        help="show the player view served at this address instead of a roster",
+    )
+    parser.add_argument(
+        "--share",
+        type=str,
+        nargs="?",
+        required=False,
+        default=None,
+        const="initiative",
+        metavar="NAME",
+        help="write the roster to shared memory for --view (default name:"
+        " initiative)",
+    )
+    parser.add_argument(
+        "--share-capacity",
+        type=int,
+        required=False,
+        default=4096,
+        metavar="N",
+        help="number of entries the shared roster can hold (default: 4096)",
+    )
+    parser.add_argument(
+        "--view",
+        type=str,
+        nargs="?",
+        required=False,
+        default=None,
+        const="initiative",
+        metavar="NAME",
+        help="show the player view of a roster shared with --share instead",
+    )
+    parser.add_argument(
+        "--bestiary",
+        type=str,
+        required=False,
+        default=None,
+        metavar="DIR",
+        help="directory of json/jsonl creature templates for `spawn`",
+    )
+    parser.add_argument(
+        "--no-color",
+        action="store_true",
+        help="print without colors (the default when not writing to a terminal)",
+    )
+    parser.add_argument(
+        "--history",
+        type=int,
+        required=False,
+        default=100,
+        help="number of commands that can be undone (default: 100)",
+    )
+    parser.add_argument(
+        "--stats",
+        type=str,
+        required=False,
+        default=None,
+        metavar="FILE",
+        help="write command timings and operation counts to this json file on exit",
+    )
+    parser.add_argument(
+        "--encounters",
+        type=str,
+        required=False,
+        default=None,
+        metavar="DIR",
+        help="directory keeping the encounters created with `encounter new`",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        required=False,
+        default=256,
+        metavar="MB",
+        help="memory kept for loaded encounters before saving idle ones to disk"
+        " (default: 256)",
     )
     return parser.parse_args()
 
@@ -23,16 +153,118 @@ def main():
     # Parse arguments
     args = parse_arguments()
 
+    if args.no_color:
+        render.use_color(False)
+
+    # Viewers only mirror a served player view
+    if args.watch is not None:
+        import asyncio
+
+        import src.server as server
+
+        try:
+            asyncio.run(server.watch(*args.watch))
+        except ConnectionError as e:
+            print(e)
+        return
+
+    # Or the player view of a roster shared by another process
+    if args.view is not None:
+        import src.shared as shared
+
+        try:
+            shared.view(args.view)
+        except (OSError, ValueError) as e:
+            print(e)
+        return
+
     # Set up program loop
     program = initiative_cmd.ProgramLoop()
     program.register_initiative(roster.Initiative())
 
+    # Recover the autosaved roster before anything else touches it
+    if args.journal is not None:
+        import src.journal as journal
+
+        program.register_journal(journal.Journal(args.journal))
+        program.journal.attach(program.initiative)
+        if program.journal.error is not None:
+            print(f"journal failed: {program.journal.error}")
+    program.register_history(history.History(args.history))
+    program.history.attach(program.initiative)
+    program.register_stats(stats.CommandStats())
+    program.stats.attach(program.initiative)
+
+    # The startup roster stays loaded, as the journal and --file belong to it,
+    # and takes the place of any default encounter saved in the directory
+    program.register_encounters(
+        encounters.EncounterManager(args.encounters, args.memory_budget << 20)
+    )
+    program.encounters.pin("default")
+    program.encounters.new("default", program.initiative, replace=True)
+    program.encounters.switch("default")
+
+    if args.bestiary is not None:
+        import src.bestiary as bestiary
+
+        try:
+            program.register_bestiary(bestiary.Bestiary(args.bestiary))
+        except (OSError, ValueError) as e:
+            print(f"bestiary failed: {e}")
+
     # Run import file first if applicable
     if args.file is not None:
-        program.do_import(args.file)
+        if args.format is not None:
+            program.do_import(f"--{args.format} {args.file}")
+        else:
+            program.do_import(args.file)
+
+    if args.serve is not None:
+        import src.server as server
+
+        program.register_server(server.PlayerViewServer(*args.serve))
+        program.server.attach(program.initiative)
+        program.server.start()
+        print(f"Serving the player view on {program.server.host}:{program.server.port}")
+
+    try:
+        if args.share is not None:
+            import src.shared as shared
+
+            try:
+                shared_roster = shared.SharedRoster(args.share, args.share_capacity)
+                program.register_shared(shared_roster)
+            except OSError as e:
+                print(f"sharing failed: {e}")
+            else:
+                program.shared.attach(program.initiative)
+                print(f"Sharing the roster as {program.shared.name}")
+                # A roster beyond the capacity is shared once it shrinks
+                try:
+                    program.shared.publish(program.initiative)
+                except ValueError as e:
+                    print(f"sharing failed: {e}")
 
-    # Execute program loop
-    program.cmdloop()
+        # Execute program loop, or the given script in its place
+        if args.script == "-":
+            program.run_script(sys.stdin)
+        elif args.script is not None:
+            with open(args.script, "r") as fo:
+                program.run_script(fo)
+        else:
+            program.cmdloop()
+    finally:
+        if program.journal is not None:
+            program.journal.close()
+            if program.journal.error is not None:
+                print(f"journal failed: {program.journal.error}")
+        if program.server is not None:
+            program.server.stop()
+        if program.shared is not None:
+            program.shared.close()
+        if args.stats is not None:
+            program.stats.dump(args.stats)
+        program.encounters.close()
 
 
 if __name__ == "__main__":
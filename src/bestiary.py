@@ -0,0 +1,150 @@
+"""Implements a library of creature templates read from json and jsonl files"""
+import json
+import os
+
+from collections import OrderedDict
+
+from src.names import NameIndex
+
+INDEX_FILE = ".bestiary-index.json"
+INDEX_VERSION = 1
+EXTENSIONS = (".json", ".jsonl")
+
+
+def _index_json(path: str) -> list:
+    """Returns (name, offset, length) of every record of a json list file"""
+    with open(path, "rb") as fo:
+        data = fo.read()
+    text = data.decode()
+    decoder = json.JSONDecoder()
+    records = []
+    pos = text.index("[") + 1
+    # Offsets are kept in bytes, so records can be read back with one seek
+    byte_pos = len(text[:pos].encode())
+    while True:
+        start = pos
+        while text[pos] in " \t\r\n,":
+            pos += 1
+        # Separators are ASCII, one byte per character
+        byte_pos += pos - start
+        if text[pos] == "]":
+            return records
+        record, end = decoder.raw_decode(text, pos)
+        length = len(text[pos:end].encode())
+        records.append((record["name"], byte_pos, length))
+        byte_pos += length
+        pos = end
+
+
+def _index_jsonl(path: str) -> list:
+    """Returns (name, offset, length) of every record of a jsonl file"""
+    records = []
+    offset = 0
+    with open(path, "rb") as fo:
+        for line in fo:
+            if line.strip():
+                records.append((json.loads(line)["name"], offset, len(line)))
+            offset += len(line)
+    return records
+
+
+class Bestiary:
+
+    """
+    Creature templates read from a directory of json and jsonl files
+
+    A .json file holds a list of templates and a .jsonl file one template per
+    line. A template is an object with a name and optionally ac, hp (a number
+    or dice expression such as '2d6'), init_bonus and hidden. Where two files
+    define the same name, the file sorting last wins.
+
+    Opening a bestiary reads only a cached index of where each template is
+    stored, rebuilt for the files whose modification time or size changed.
+    Templates are parsed on first use and the most recently used cache_size
+    of them are kept in memory.
+    """
+
+    def __init__(self, directory: str, cache_size: int = 256) -> None:
+        self.directory = directory
+        self.cache_size = cache_size
+        self._records = OrderedDict()
+        self._locations = {}
+        self.names = NameIndex()
+        self.__load_index()
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._locations
+
+    def __load_index(self) -> None:
+        """Helper function to read the cached index, refreshing stale files"""
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            with open(index_path, "r") as fo:
+                index = json.load(fo)
+            if index.get("version") != INDEX_VERSION:
+                raise ValueError("outdated bestiary index")
+        except (OSError, ValueError):
+            index = {"version": INDEX_VERSION, "files": {}}
+
+        files = {}
+        changed = False
+        for filename in sorted(os.listdir(self.directory)):
+            # Hidden files include the index itself
+            if filename.startswith(".") or not filename.endswith(EXTENSIONS):
+                continue
+            status = os.stat(os.path.join(self.directory, filename))
+            cached = index["files"].get(filename)
+            stamp = [status.st_mtime_ns, status.st_size]
+            if cached is not None and cached["stamp"] == stamp:
+                files[filename] = cached
+                continue
+            files[filename] = {"stamp": stamp, "records": self.__index_file(filename)}
+            changed = True
+        if changed or files.keys() != index["files"].keys():
+            index["files"] = files
+            try:
+                with open(f"{index_path}.tmp", "w") as fo:
+                    json.dump(index, fo)
+                os.replace(f"{index_path}.tmp", index_path)
+            except OSError:
+                # A read-only bestiary is indexed again the next time instead
+                pass
+
+        for filename, cached in files.items():
+            for name, offset, length in cached["records"]:
+                self._locations[name] = (filename, offset, length)
+        self.names.update(self._locations)
+
+    def __index_file(self, filename: str) -> list:
+        """Helper function to index the templates of one file"""
+        path = os.path.join(self.directory, filename)
+        try:
+            if filename.endswith(".jsonl"):
+                return _index_jsonl(path)
+            return _index_json(path)
+        except (KeyError, TypeError, IndexError, ValueError) as e:
+            raise ValueError(f"{filename} is not a valid bestiary file: {e}") from e
+
+    def get(self, name: str) -> dict:
+        """Returns the template called name, parsing it on first use"""
+        record = self._records.get(name)
+        if record is not None:
+            self._records.move_to_end(name)
+            return record
+        if name not in self._locations:
+            message = f"no template is named {name}"
+            suggestions = self.names.similar(name)
+            if suggestions:
+                message += f" (did you mean {', '.join(suggestions)}?)"
+            raise ValueError(message)
+        filename, offset, length = self._locations[name]
+        with open(os.path.join(self.directory, filename), "rb") as fo:
+            fo.seek(offset)
+            record = json.loads(fo.read(length))
+        self._records[name] = record
+        if len(self._records) > self.cache_size:
+            self._records.popitem(last=False)
+        return record
@@ -0,0 +1,194 @@
+"""Implements dice expressions and a seedable roller with a batch API"""
+import re
+
+from importlib.util import find_spec
+
+# NumPy is optional, and batches fall back to pure Python without it. It is
+# also slow to import, so it is only imported by the first batch roll of at
+# least NUMPY_MIN_BATCH rolls; smaller batches are quicker in pure Python.
+HAVE_NUMPY = find_spec("numpy") is not None
+NUMPY_MIN_BATCH = 64
+np = None
+
+
+_TERM_RE = re.compile(
+    r"\s*([+-]?)\s*(?:(\d*)d(\d+)(?:(kh|kl|dh|dl|k)(\d+))?|(\d+))", re.IGNORECASE
+)
+_FLAG_RE = re.compile(r"\s+(adv|advantage|dis|disadvantage)\s*$", re.IGNORECASE)
+
+
+class DiceTerm:
+
+    """A group of identical dice, such as the '4d6kh3' in '4d6kh3+2'"""
+
+    __slots__ = ("sign", "count", "sides", "keep_high", "keep")
+
+    def __init__(
+        self,
+        count: int,
+        sides: int,
+        sign: int = 1,
+        keep_high: bool = True,
+        keep: int = None,
+    ) -> None:
+        if sides < 1:
+            raise ValueError(f"dice need at least one side, not {sides}")
+        self.sign = sign
+        self.count = count
+        self.sides = sides
+        self.keep_high = keep_high
+        # None keeps every die
+        self.keep = None if keep is None or keep >= count else max(keep, 0)
+
+
+class DiceExpression:
+
+    """A parsed dice expression: a sum of dice terms plus a flat modifier"""
+
+    def __init__(self, terms: list, modifier: int = 0, advantage: int = 0) -> None:
+        self.terms = terms
+        self.modifier = modifier
+        # 1 rolls every die twice keeping the higher, -1 keeping the lower
+        self.advantage = advantage
+
+    @classmethod
+    def parse(cls, text: str):
+        """Parses expressions such as '4d6kh3+2', '2d20kl1' or 'd20+5 adv'"""
+        advantage = 0
+        flag = _FLAG_RE.search(text)
+        if flag:
+            advantage = 1 if flag.group(1).lower().startswith("adv") else -1
+            text = text[: flag.start()]
+        text = text.strip()
+        if not text:
+            raise ValueError("empty dice expression")
+
+        terms = []
+        modifier = 0
+        pos = 0
+        while pos < len(text):
+            match = _TERM_RE.match(text, pos)
+            # Every term after the first needs an explicit sign
+            if not match or (pos and not match.group(1)):
+                raise ValueError(f"invalid dice expression: {text!r}")
+            sign, count, sides, keep_kind, keep, flat = match.groups()
+            sign = -1 if sign == "-" else 1
+            if flat is not None:
+                modifier += sign * int(flat)
+            else:
+                count = int(count) if count else 1
+                keep_kind = (keep_kind or "").lower()
+                keep = int(keep) if keep else None
+                # Dropping dice is keeping the rest from the other end
+                if keep_kind in ("dh", "dl"):
+                    keep = count - keep
+                keep_high = keep_kind in ("kh", "k", "dl")
+                terms.append(DiceTerm(count, int(sides), sign, keep_high, keep))
+            pos = match.end()
+
+        return cls(terms, modifier, advantage)
+
+    @classmethod
+    def simple(
+        cls, die: int = 20, count: int = 1, modifier: int = 0, advantage: bool = False
+    ):
+        """Builds the expression 'COUNTdDIE+MODIFIER', optionally with advantage"""
+        return cls([DiceTerm(count, die)], modifier, int(advantage))
+
+
+class DiceRoller:
+
+    """Rolls dice expressions, singly or in vectorized batches"""
+
+    def __init__(self, seed: int = None, use_numpy: bool = None) -> None:
+        """Initializes a roller; equal seeds reproduce equal results"""
+        if use_numpy is None:
+            use_numpy = HAVE_NUMPY
+        elif use_numpy and not HAVE_NUMPY:
+            raise ValueError("use_numpy requires NumPy to be installed")
+        self.use_numpy = use_numpy
+        self._seed = seed
+        self._random = None
+        self._numpy_rng = None
+
+    @property
+    def random(self):
+        """The generator of single rolls, created by the first roll"""
+        if self._random is None:
+            import random
+            self._random = random.Random(self._seed)
+        return self._random
+
+    @property
+    def numpy_rng(self):
+        """The NumPy generator of batch rolls, or None when NumPy is not used"""
+        global np
+        if self._numpy_rng is None and self.use_numpy:
+            if np is None:
+                import numpy as np
+            self._numpy_rng = np.random.default_rng(self._seed)
+        return self._numpy_rng
+
+    def __coerce(self, expression) -> DiceExpression:
+        """Helper function to accept both parsed and textual expressions"""
+        if isinstance(expression, DiceExpression):
+            return expression
+        return DiceExpression.parse(expression)
+
+    def __roll_die(self, sides: int, advantage: int) -> int:
+        """Helper function to roll a single die, with dis/advantage applied"""
+        roll = self.random.randint(1, sides)
+        if advantage > 0:
+            roll = max(roll, self.random.randint(1, sides))
+        elif advantage < 0:
+            roll = min(roll, self.random.randint(1, sides))
+        return roll
+
+    def roll(self, expression) -> int:
+        """Rolls an expression once and returns the total"""
+        expression = self.__coerce(expression)
+        total = expression.modifier
+        for term in expression.terms:
+            rolls = [
+                self.__roll_die(term.sides, expression.advantage)
+                for _ in range(term.count)
+            ]
+            if term.keep is not None:
+                rolls.sort(reverse=term.keep_high)
+                rolls = rolls[: term.keep]
+            total += term.sign * sum(rolls)
+        return total
+
+    def roll_many(self, expression, amount: int) -> list:
+        """
+        Rolls an expression amount number of times and returns every total
+
+        Batches of at least NUMPY_MIN_BATCH rolls are rolled by NumPy when it
+        is used, drawing from a generator of their own, so for a given seed
+        the results depend on the batch sizes as well as on their order.
+        """
+        expression = self.__coerce(expression)
+        if amount < NUMPY_MIN_BATCH or self.numpy_rng is None:
+            return [self.roll(expression) for _ in range(amount)]
+        numpy_rng = self.numpy_rng
+
+        totals = np.full(amount, expression.modifier, dtype=np.int64)
+        for term in expression.terms:
+            shape = (amount, term.count)
+            rolls = numpy_rng.integers(1, term.sides + 1, size=shape)
+            if expression.advantage > 0:
+                rolls = np.maximum(
+                    rolls, numpy_rng.integers(1, term.sides + 1, size=shape)
+                )
+            elif expression.advantage < 0:
+                rolls = np.minimum(
+                    rolls, numpy_rng.integers(1, term.sides + 1, size=shape)
+                )
+            if term.keep is not None:
+                rolls.sort(axis=1)
+                if term.keep_high:
+                    rolls = rolls[:, term.count - term.keep :]
+                else:
+                    rolls = rolls[:, : term.keep]
+            totals += term.sign * rolls.sum(axis=1)
+        return totals.tolist()
@@ -0,0 +1,180 @@
+"""Implements a manager hosting the rosters of many encounters in one process"""
+import os
+import re
+
+from collections import OrderedDict
+
+from src.roster import Initiative
+from src.snapshot import Snapshot, write_snapshot
+
+# Estimated memory held per entry once both views were rendered: the entry,
+# its order and name index slots and its cached rows
+ENTRY_BYTES = 700
+ENCOUNTER_BYTES = 16 << 10
+_ENCOUNTER_ID = re.compile(r"[\w-]+")
+
+
+class EncounterManager:
+
+    """
+    The rosters of many encounters keyed by encounter id
+
+    Loaded encounters are kept in least recently used order. When their
+    estimated memory use exceeds memory_budget bytes, the least recently used
+    ones are written to snapshots in directory and dropped, to be reloaded
+    when next used. The current encounter and pinned encounters are never
+    evicted. Without a directory, evicted encounters go to a temporary one
+    removed by close().
+    """
+
+    def __init__(
+        self, directory: str = None, memory_budget: int = 256 << 20, seed: int = None
+    ) -> None:
+        self._temporary = directory is None
+        if directory is None:
+            import tempfile
+
+            directory = tempfile.mkdtemp(prefix="initiative-encounters-")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.seed = seed
+        self.loaded = OrderedDict()
+        self.pinned = set()
+        self.current = None
+
+    def __path(self, encounter_id: str, extension: str) -> str:
+        """Helper function to build the path of an evicted encounter's file"""
+        return os.path.join(self.directory, f"{encounter_id}{extension}")
+
+    def __saved_ids(self) -> set:
+        """Helper function to list the encounters saved in the directory"""
+        return {
+            name[: -len(".snap")]
+            for name in os.listdir(self.directory)
+            if name.endswith(".snap")
+        }
+
+    def __contains__(self, encounter_id: str) -> bool:
+        return encounter_id in self.loaded or os.path.exists(
+            self.__path(encounter_id, ".snap")
+        )
+
+    def ids(self) -> list:
+        """Returns the ids of every encounter, loaded or not, in sorted order"""
+        return sorted(self.loaded.keys() | self.__saved_ids())
+
+    def new(
+        self, encounter_id: str, initiative: Initiative = None, replace: bool = False
+    ) -> Initiative:
+        """
+        Adds an encounter, by default with an empty roster, and returns it
+
+        An encounter of the same id is refused, or with replace dropped along
+        with its saved snapshot.
+        """
+        if not _ENCOUNTER_ID.fullmatch(encounter_id):
+            raise ValueError(
+                f"{encounter_id} is not a valid encounter id (use letters, digits,"
+                " '_' and '-')"
+            )
+        if encounter_id in self:
+            if not replace:
+                raise ValueError(f"encounter {encounter_id} already exists")
+            self.loaded.pop(encounter_id, None)
+            if os.path.exists(self.__path(encounter_id, ".snap")):
+                os.remove(self.__path(encounter_id, ".snap"))
+        if initiative is None:
+            initiative = Initiative(self.seed)
+        self.loaded[encounter_id] = initiative
+        self.__enforce_budget(encounter_id)
+        return initiative
+
+    def get(self, encounter_id: str) -> Initiative:
+        """Returns an encounter's roster, reloading it if it was evicted"""
+        initiative = self.loaded.get(encounter_id)
+        if initiative is None:
+            initiative = self.__load(encounter_id)
+            self.loaded[encounter_id] = initiative
+        self.loaded.move_to_end(encounter_id)
+        self.__enforce_budget(encounter_id)
+        return initiative
+
+    def switch(self, encounter_id: str) -> Initiative:
+        """Makes an encounter the current one and returns its roster"""
+        initiative = self.get(encounter_id)
+        self.current = encounter_id
+        # The previous encounter may be evicted now that it is no longer current
+        self.__enforce_budget(encounter_id)
+        return initiative
+
+    def pin(self, encounter_id: str) -> None:
+        """Keeps an encounter loaded and out of the directory for good"""
+        self.pinned.add(encounter_id)
+
+    def memory_estimate(self) -> int:
+        """Returns the estimated memory use of the loaded encounters in bytes"""
+        return sum(
+            ENCOUNTER_BYTES + ENTRY_BYTES * len(initiative)
+            for initiative in self.loaded.values()
+        )
+
+    def summary(self) -> list:
+        """Returns (id, number of entries, loaded) for every encounter"""
+        rows = []
+        for encounter_id in self.ids():
+            initiative = self.loaded.get(encounter_id)
+            if initiative is not None:
+                rows.append((encounter_id, len(initiative), True))
+                continue
+            # The snapshot header holds the count, so nothing else is read
+            snapshot = Snapshot(self.__path(encounter_id, ".snap"))
+            rows.append((encounter_id, len(snapshot), False))
+            snapshot.close()
+        return rows
+
+    def save(self, encounter_id: str) -> None:
+        """Writes a loaded encounter's roster and turn to the directory"""
+        initiative = self.loaded[encounter_id]
+        write_snapshot(
+            self.__path(encounter_id, ".snap"), initiative, initiative.turn_state()
+        )
+
+    def evict(self, encounter_id: str) -> None:
+        """Saves a loaded encounter and drops its roster from memory"""
+        self.save(encounter_id)
+        del self.loaded[encounter_id]
+
+    def __load(self, encounter_id: str) -> Initiative:
+        """Helper function to reload an evicted encounter"""
+        path = self.__path(encounter_id, ".snap")
+        if not os.path.exists(path):
+            raise ValueError(f"no encounter is called {encounter_id}")
+        initiative = Initiative(self.seed)
+        initiative.import_file(path, "snapshot")
+        return initiative
+
+    def __enforce_budget(self, used: str) -> None:
+        """Helper function to evict encounters, except used, until the rest fit"""
+        evictable = [
+            encounter_id
+            for encounter_id in self.loaded
+            if encounter_id not in (used, self.current)
+            and encounter_id not in self.pinned
+        ]
+        # Loaded encounters are in least recently used order
+        for encounter_id in evictable:
+            if self.memory_estimate() <= self.memory_budget:
+                break
+            self.evict(encounter_id)
+
+    def close(self) -> None:
+        """Saves every loaded encounter, or removes a temporary directory"""
+        if self._temporary:
+            import shutil
+
+            shutil.rmtree(self.directory, ignore_errors=True)
+            return
+        for encounter_id in self.loaded:
+            if encounter_id not in self.pinned:
+                self.save(encounter_id)
@@ -1,4 +1,19 @@
 class Entry:
+    # Rosters can hold hundreds of thousands of entries, so skip the
+    # per-instance __dict__
+    __slots__ = (
+        "name",
+        "initiative",
+        "init_bonus",
+        "ac",
+        "hp_max",
+        "hp",
+        "hidden",
+        "conditions",
+        "tags",
+        "sequence",
+    )
+
     def __init__(
         self,
         name: str,
@@ -8,6 +23,8 @@ class Entry:
         hp_max: int = 0,
         hp: int = 0,
         hidden: bool = False,
+        conditions: tuple = (),
+        tags: tuple = (),
     ) -> None:
         self.name = name
         self.initiative = initiative
@@ -16,6 +33,14 @@ class Entry:
         self.hp_max = hp_max
         self.hp = hp
         self.hidden = hidden
+        # Condition dicts, replaced rather than mutated so that change
+        # records can keep the old value
+        self.conditions = tuple(conditions)
+        # Group names given by the user, such as 'elite', without duplicates;
+        # replaced like conditions
+        self.tags = tuple(dict.fromkeys(tags))
+        # Breaks ties in initiative, set by the roster holding the entry
+        self.sequence = 0
 
     def __lt__(self, other):
         return self.initiative < other.initiative
@@ -35,6 +60,20 @@ class Entry:
     def __ge__(self, other):
         return self.initiative >= other.initiative
 
+    def copy(self, name: str):
+        """Returns a copy of this entry under a new name"""
+        return Entry(
+            name,
+            self.initiative,
+            self.init_bonus,
+            self.ac,
+            self.hp_max,
+            self.hp,
+            self.hidden,
+            self.conditions,
+            self.tags,
+        )
+
     def heal(self, amount: int) -> None:
         self.hp += amount
 
@@ -45,7 +84,7 @@ class Entry:
         self.hidden = not self.hidden
 
     def to_dict(self) -> dict:
-        return {
+        data = {
             "name": self.name,
             "initiative": self.initiative,
             "init_bonus": self.init_bonus,
@@ -54,6 +93,13 @@ class Entry:
             "hp": self.hp,
             "hidden": self.hidden,
         }
+        # Leave the keys out when empty, so rosters without conditions or
+        # tags are written as before
+        if self.conditions:
+            data["conditions"] = list(self.conditions)
+        if self.tags:
+            data["tags"] = list(self.tags)
+        return data
 
     @classmethod
     def from_dict(cls, data: dict):
@@ -65,4 +111,6 @@ class Entry:
             hp_max=data.get("hp_max", 0),
             hp=data.get("hp", 0),
             hidden=data.get("hidden", False),
+            conditions=data.get("conditions", ()),
+            tags=data.get("tags", ()),
         )
@@ -0,0 +1,104 @@
+"""Implements the file formats that rosters can be imported from and exported to"""
+import os
+
+from src.entry import Entry
+from src.snapshot import read_snapshot, write_snapshot
+
+# Extensions that select a format when none is given explicitly
+EXTENSIONS = {
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".snap": "snapshot",
+}
+FORMATS = ("json", "jsonl", "snapshot")
+# Buffer size for streamed reads and writes
+BUFFER_SIZE = 1 << 20
+
+
+def detect_format(path: str, fmt: str = None) -> str:
+    """Returns fmt if given, otherwise the format implied by path's extension"""
+    if fmt is None:
+        fmt = EXTENSIONS.get(os.path.splitext(path)[1].lower(), "json")
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown roster format: {fmt}")
+    return fmt
+
+
+def read_json(path: str, turn: dict = None):
+    """
+    Yields the entries of a json-formatted roster file
+
+    If the file holds a turn, it is copied into the turn dict, if given.
+    """
+    import json
+
+    with open(path, "r") as fo:
+        data = json.load(fo)
+    # Entries are objects, so an integer round marks a roster saved mid-encounter
+    if isinstance(data.get("round"), int):
+        if turn is not None:
+            turn.update(round=data["round"], name=data.get("turn"))
+        data = data["roster"]
+    for name, entry_data in data.items():
+        yield Entry.from_dict({"name": name, **entry_data})
+
+
+def write_json(path: str, entries, turn: dict = None) -> None:
+    """
+    Writes entries to a json-formatted roster file
+
+    With a turn, as returned by Initiative.turn_state(), the roster is nested
+    under 'roster' next to the round and the name of the current entry.
+    """
+    import json
+
+    serializable_roster = {entry.name: entry.to_dict() for entry in entries}
+    if turn is not None:
+        serializable_roster = {
+            "round": turn["round"],
+            "turn": turn["name"],
+            "roster": serializable_roster,
+        }
+    with open(path, "w") as fo:
+        json.dump(serializable_roster, fo, indent=2)
+
+
+def read_jsonl(path: str, turn: dict = None):
+    """
+    Yields the entries of a JSON Lines roster file, one line at a time
+
+    If the file holds a turn, it is copied into the turn dict, if given.
+    """
+    import json
+
+    with open(path, "r", buffering=BUFFER_SIZE) as fo:
+        for line in fo:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            # Every entry has a name, unlike the line holding the turn
+            if "name" not in data:
+                if turn is not None:
+                    turn.update(round=data["round"], name=data.get("turn"))
+                continue
+            yield Entry.from_dict(data)
+
+
+def write_jsonl(path: str, entries, turn: dict = None) -> None:
+    """
+    Streams entries to a JSON Lines roster file, one entry per line
+
+    With a turn, as returned by Initiative.turn_state(), the first line holds
+    the round and the name of the current entry.
+    """
+    import json
+
+    with open(path, "w", buffering=BUFFER_SIZE) as fo:
+        if turn is not None:
+            fo.write(f"{json.dumps({'round': turn['round'], 'turn': turn['name']})}\n")
+        fo.writelines(f"{json.dumps(entry.to_dict())}\n" for entry in entries)
+
+
+READERS = {"json": read_json, "jsonl": read_jsonl, "snapshot": read_snapshot}
+WRITERS = {"json": write_json, "jsonl": write_jsonl, "snapshot": write_snapshot}
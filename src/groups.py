@@ -0,0 +1,145 @@
+"""Implements running aggregates over families and tags of roster entries"""
+from heapq import heapify, heappop, heappush
+from itertools import count
+
+from src.helpers import split_name
+
+
+class GroupStats:
+
+    """
+    Running totals of one group of entries, such as every 'goblin N'
+
+    Totals are adjusted as members join, leave or change, so reading them
+    costs nothing. The member with the lowest HP comes from a heap holding
+    (hp, sequence, entry) for every HP a member had; outdated items are
+    skipped when they reach the top and the heap is rebuilt once most of it
+    is outdated.
+    """
+
+    __slots__ = ("count", "visible", "alive", "hp", "hp_max", "_members", "_heap")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.visible = 0
+        self.alive = 0
+        self.hp = 0
+        self.hp_max = 0
+        self._members = {}
+        self._heap = []
+
+    def __iter__(self):
+        """Iterates over the members in no particular order"""
+        return iter(self._members.values())
+
+    def add(self, entry, sequence: int) -> None:
+        """Adds an entry to the group"""
+        self._members[entry.name] = entry
+        self.count += 1
+        self.visible += not entry.hidden
+        self.alive += entry.hp > 0
+        self.hp += entry.hp
+        self.hp_max += entry.hp_max
+        heappush(self._heap, (entry.hp, sequence, entry))
+
+    def remove(self, entry) -> None:
+        """Removes an entry, which must be a member, from the group"""
+        del self._members[entry.name]
+        self.count -= 1
+        self.visible -= not entry.hidden
+        self.alive -= entry.hp > 0
+        self.hp -= entry.hp
+        self.hp_max -= entry.hp_max
+
+    def update(self, entry, attribute: str, old, new, sequence: int) -> None:
+        """Adjusts the totals to a change of one of a member's attributes"""
+        if attribute == "hp":
+            self.hp += new - old
+            self.alive += (new > 0) - (old > 0)
+            heappush(self._heap, (new, sequence, entry))
+            if len(self._heap) > 2 * self.count + 16:
+                self.__rebuild()
+        elif attribute == "hp_max":
+            self.hp_max += new - old
+        elif attribute == "hidden":
+            self.visible += bool(old) - bool(new)
+
+    def __is_current(self, item: tuple) -> bool:
+        """Helper function to check a heap item still matches its entry"""
+        hp, _, entry = item
+        return self._members.get(entry.name) is entry and entry.hp == hp
+
+    def __rebuild(self) -> None:
+        """Helper function to drop the outdated items of the heap"""
+        self._heap = [item for item in self._heap if self.__is_current(item)]
+        heapify(self._heap)
+
+    def lowest(self):
+        """Returns the member with the lowest HP, or None if there is none"""
+        while self._heap and not self.__is_current(self._heap[0]):
+            heappop(self._heap)
+        return self._heap[0][2] if self._heap else None
+
+
+class Groups:
+
+    """
+    Aggregates of the entry families and tags of a roster
+
+    An entry belongs to the family of its base name, so 'goblin 1' to
+    'goblin 40' form the family 'goblin', and to a group for every one of
+    its tags. The roster reports every entry it adds, removes or changes.
+    """
+
+    def __init__(self, entries=()) -> None:
+        self.families = {}
+        self.tags = {}
+        self._sequence = count()
+        for entry in entries:
+            self.add(entry)
+
+    def __join(self, groups: dict, key: str, entry) -> None:
+        """Helper function to add an entry to a group, creating it if needed"""
+        groups.setdefault(key, GroupStats()).add(entry, next(self._sequence))
+
+    def __leave(self, groups: dict, key: str, entry) -> None:
+        """Helper function to remove an entry from a group, dropping it if empty"""
+        group = groups[key]
+        group.remove(entry)
+        if not group.count:
+            del groups[key]
+
+    def groups_of(self, entry):
+        """Yields the family and tag groups of an entry"""
+        yield self.families[split_name(entry.name)[0]]
+        for tag in entry.tags:
+            yield self.tags[tag]
+
+    def add(self, entry) -> None:
+        """Adds an entry to its family and tag groups"""
+        self.__join(self.families, split_name(entry.name)[0], entry)
+        for tag in entry.tags:
+            self.__join(self.tags, tag, entry)
+
+    def remove(self, entry) -> None:
+        """Removes an entry from its groups; call it before a rename as well"""
+        self.__leave(self.families, split_name(entry.name)[0], entry)
+        for tag in entry.tags:
+            self.__leave(self.tags, tag, entry)
+
+    def update(self, entry, attribute: str, old, new) -> None:
+        """Adjusts the groups of an entry to a change of one of its attributes"""
+        if attribute == "tags":
+            for tag in old:
+                if tag not in new:
+                    self.__leave(self.tags, tag, entry)
+            for tag in new:
+                if tag not in old:
+                    self.__join(self.tags, tag, entry)
+            return
+        for group in self.groups_of(entry):
+            group.update(entry, attribute, old, new, next(self._sequence))
+
+    def family(self, name: str) -> GroupStats:
+        """Returns the family of the entry called name"""
+        return self.families[split_name(name)[0]]
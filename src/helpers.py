@@ -1,3 +1,11 @@
 def strlen(arg):
     """Takes the length of the string form of arg"""
     return len(str(arg))
+
+
+def split_name(name):
+    """Splits 'name N' into ('name', N); unnumbered names give (name, None)"""
+    parts = name.rsplit(None, 1)
+    if len(parts) == 2 and parts[1].isdecimal():
+        return parts[0], int(parts[1])
+    return name, None
@@ -0,0 +1,90 @@
+"""Implements undo and redo for a roster as a log of reversible changes"""
+from collections import deque
+
+
+class History:
+
+    """
+    Bounded undo/redo stacks of an Initiative's change records
+
+    Records are grouped into steps, normally one per command, and every record
+    carries its old and new values, so undoing or redoing a step costs only
+    the size of that step. At most depth steps are kept.
+    """
+
+    def __init__(self, depth: int = 100) -> None:
+        """Initializes an empty history keeping at most depth steps"""
+        self.undo_stack = deque(maxlen=depth)
+        self.redo_stack = deque(maxlen=depth)
+        self.initiative = None
+        self._step = None
+        self._replaying = False
+
+    def attach(self, initiative) -> None:
+        """Starts recording the changes made to initiative"""
+        self.initiative = initiative
+        initiative.listeners.append(self.record)
+
+    def detach(self) -> None:
+        """Stops recording and forgets every step, as they no longer apply"""
+        if self.initiative is not None:
+            self.initiative.listeners.remove(self.record)
+        self.initiative = None
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self._step = None
+
+    def begin(self) -> None:
+        """Starts a step; records until the matching end() are undone together"""
+        self._step = []
+
+    def end(self) -> None:
+        """Closes the current step, making it the next one to undo"""
+        step, self._step = self._step, None
+        if step:
+            self.undo_stack.append(step)
+            self.redo_stack.clear()
+
+    def record(self, change: tuple) -> None:
+        """Adds a change record to the current step"""
+        if self._replaying:
+            return
+        if change[0] == "load":
+            # Changes from before a wholesale replacement no longer apply
+            self.undo_stack.clear()
+            self.redo_stack.clear()
+            self._step = [] if self._step is not None else None
+        elif self._step is not None:
+            self._step.append(change)
+        else:
+            # Changes made outside of a step are undone one at a time
+            self.undo_stack.append([change])
+            self.redo_stack.clear()
+
+    def undo(self) -> bool:
+        """Reverts the most recent step, returning False if there is none"""
+        if not self.undo_stack:
+            return False
+        step = self.undo_stack.pop()
+        self._replaying = True
+        try:
+            for change in reversed(step):
+                self.initiative.revert_change(change)
+        finally:
+            self._replaying = False
+        self.redo_stack.append(step)
+        return True
+
+    def redo(self) -> bool:
+        """Reapplies the most recently undone step, returning False if none"""
+        if not self.redo_stack:
+            return False
+        step = self.redo_stack.pop()
+        self._replaying = True
+        try:
+            for change in step:
+                self.initiative.apply_change(change)
+        finally:
+            self._replaying = False
+        self.undo_stack.append(step)
+        return True
@@ -1,5 +1,7 @@
 """Implements the cmd side of the initiative.py program"""
 import cmd
+import io
+import re
 
 
 class ProgramLoop(cmd.Cmd):
@@ -15,19 +17,180 @@ class ProgramLoop(cmd.Cmd):
  |___|_| |_|_|\__|_|\__,_|\__|_| \_/ \___|
  =========================================\n"""
 
+    # Batch mode never prompts and skips the context printouts
+    interactive = True
+    # Rows per page of `print --page`
+    page_size = 20
+    journal = None
+    history = None
+    server = None
+    stats = None
+    encounters = None
+    shared = None
+    bestiary = None
+
     def register_initiative(self, initiative_obj):
         """Registers an initiative object to the ProgramLoop"""
         self.initiative = initiative_obj
 
-    def __print_initiative_prelude(self):
-        print("Initiative order")
-        print("________________")
+    def register_journal(self, journal_obj):
+        """Registers a journal to be flushed after every command"""
+        self.journal = journal_obj
+
+    def register_history(self, history_obj):
+        """Registers an undo history, recording one step per command"""
+        self.history = history_obj
+
+    def register_server(self, server_obj):
+        """Registers a player view server, updated after every command"""
+        self.server = server_obj
+
+    def register_stats(self, stats_obj):
+        """Registers command statistics, timing every command"""
+        self.stats = stats_obj
+
+    def register_shared(self, shared_obj):
+        """Registers a shared memory roster, updated after every command"""
+        self.shared = shared_obj
+
+    def register_bestiary(self, bestiary_obj):
+        """Registers a bestiary, making its templates available to `spawn`"""
+        self.bestiary = bestiary_obj
+
+    def register_encounters(self, encounters_obj):
+        """Registers an encounter manager, making its encounters switchable"""
+        self.encounters = encounters_obj
+
+    def precmd(self, line):
+        """Groups the changes made by every command into one undo step"""
+        if self.stats is not None:
+            # An empty line repeats the previous command
+            self.stats.begin(self.parseline(line or self.lastcmd)[0] or "")
+        if self.history is not None:
+            self.history.begin()
+        return line
+
+    def postcmd(self, stop, line):
+        """Makes the changes of every completed command durable"""
+        if self.history is not None:
+            self.history.end()
+        if self.journal is not None:
+            # Batch mode leaves flushing to the journal's own batching
+            if self.interactive:
+                self.journal.flush()
+            if self.journal.error is not None:
+                print(f"journal failed: {self.journal.error}")
+                self.journal.error = None
+        if self.server is not None:
+            self.server.publish(self.initiative)
+        if self.shared is not None:
+            try:
+                self.shared.publish(self.initiative)
+            except ValueError as e:
+                print(f"sharing failed: {e}")
+        if self.stats is not None:
+            self.stats.end()
+        return stop
+
+    def run_script(self, lines):
+        """
+        Runs commands non-interactively, one per line, until the lines run out
+
+        Blank lines and lines starting with '#' are skipped. Commands missing
+        their arguments fail instead of prompting for them.
+        """
+        self.interactive = False
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            line = self.precmd(line)
+            stop = self.onecmd(line)
+            if self.postcmd(stop, line):
+                break
+
+    def __ask(self, prompt: str) -> str:
+        """Prompts for a missing argument, failing in batch mode instead"""
+        if not self.interactive:
+            raise ValueError(f"missing argument ({prompt.strip(' :')})")
+        return input(prompt)
+
+    def __show_context(self):
+        """Prints the roster before prompting, so indexes can be looked up"""
+        if self.interactive:
+            self.do_hprint(None)
+
+    def __parse_index(self, text: str) -> int:
+        """Converts a 1-based index or an entry's name into a 0-based index"""
+        text = text.strip()
+        if not text.isdigit() and not text.startswith("-"):
+            return self.initiative.index_of(self.initiative.lookup(text).name)
+        index = int(text)
+        if not 1 <= index <= len(self.initiative):
+            raise ValueError(f"Invalid index provided: {index}")
+        return index - 1
+
+    def __split_entry(self, arg: str):
+        """Splits 'ENTRY REST' into the entry's 0-based index and the rest"""
+        words = arg.split()
+        # Names may contain spaces, so look for the longest leading name
+        for count in range(len(words) - 1, 1, -1):
+            name = " ".join(words[:count])
+            if name in self.initiative.roster:
+                return self.__parse_index(name), " ".join(words[count:])
+        entry, _, rest = arg.strip().partition(" ")
+        return self.__parse_index(entry), rest
+
+    def __complete_names(self, text, line, begidx, endidx):
+        """Completes the entry name a command starts with, spaces included"""
+        typed = line[:endidx].lstrip().partition(" ")[2]
+        done = len(typed) - len(text)
+        return [name[done:] for name in self.initiative.names.prefix(typed)]
+
+    def help_entries(self):
+        print(
+            "Commands taking an INDEX or TARGETS also accept entry names, such as\n"
+            "`rename goblin 3 goblin boss`. Besides an exact name, the start of a\n"
+            "name or a glob such as 'orc 1*' works as long as it matches a single\n"
+            "entry, and misspelled names get suggestions. Numbers are always read\n"
+            "as indexes. Press tab to complete names."
+        )
+
+    def __write_roster(self, roster_text: str):
+        """Writes the initiative prelude and a rendered roster in one write"""
+        self.stdout.write(f"Initiative order\n________________\n{roster_text}")
+
+    def __write_view(self, arg, with_hidden: bool):
+        """Writes the roster, or the part of it selected by a view option"""
+        words = arg.split() if arg else []
+        if not words:
+            self.__write_roster(self.initiative.print_roster(with_hidden))
+            return
+        if words == ["--collapse"]:
+            self.__write_roster(self.initiative.print_roster(with_hidden, True))
+            return
+        if len(words) != 2 or words[0] not in ("--top", "--page", "--window"):
+            raise ValueError("expected --top K, --page N, --window K or --collapse")
+        option, amount = words[0], int(words[1])
+        if amount < 1:
+            raise ValueError(f"{option} needs a positive number")
+        if option == "--top":
+            start, stop = 0, amount
+        elif option == "--page":
+            start = (amount - 1) * self.page_size
+            stop = start + self.page_size
+        else:
+            row = self.initiative.turn_row(with_hidden)
+            start, stop = max(row - amount, 0), row + amount + 1
+        self.__write_roster(
+            "".join(self.initiative.iter_roster(start, stop, with_hidden))
+        )
 
     def do_print(self, arg):
         """
         Prints the roster without hidden entries or attributes shown
 
-        Usage: print
+        Usage: print [--top K | --page N | --window K | --collapse]
 
         This command is intended to provide a printout that can be copied
         and given to players, containing only the necessary information
@@ -37,142 +200,295 @@ class ProgramLoop(cmd.Cmd):
         For a more complete printout that contains information about creature
         HP/AC and/or creatures that are hidden from the initiative order, see
         `hprint`.
+
+        With a large roster, one of these options prints only part of it:
+        --top K shows the first K entries, --page N the Nth page of 20 entries
+        and --window K the entry whose turn it is with K entries on each side.
+        --collapse shows every family of numbered entries, such as 'goblin 1'
+        to 'goblin 40', as a single row.
         """
-        self.__print_initiative_prelude()
-        self.initiative.print_roster()
+        try:
+            self.__write_view(arg, False)
+        except ValueError as e:
+            print(f"print failed: {e}")
 
     def do_hprint(self, arg):
         """
         Prints the roster with hidden entries or attributes shown
 
-        Usage: hprint
+        Usage: hprint [--top K | --page N | --window K | --collapse]
 
         This command is intended to provide the DM with all of the
         easily-trackable stat information related to creatures in the initiative
         order, such as Max HP, Current HP, and AC as well as all of the
         information presented by `print`. This also will print any creatures
         that are intended to be hidden from the initiative order, such as
-        creatures that are hiding and have not been discovered yet.
+        creatures that are hiding and have not been discovered yet. It takes
+        the same options as `print` to show only part of the roster.
         """
-        self.__print_initiative_prelude()
-        self.initiative.hprint_roster()
+        try:
+            self.__write_view(arg, True)
+        except ValueError as e:
+            print(f"hprint failed: {e}")
+
+    def __split_format(self, arg: str):
+        """Splits an optional leading '--FORMAT' flag from a filepath argument"""
+        if arg.startswith("--"):
+            fmt, _, path = arg[2:].partition(" ")
+            return fmt, path.strip()
+        return None, arg.strip()
 
     def do_export(self, arg):
         """
         Exports the roster to the given filepath, overwriting the given file
 
-        Usage: export FILEPATH
+        Usage: export [--json|--jsonl|--snapshot] FILEPATH
 
         This command serializes all of the information about currently-tracked
-        entries in the roster and outputs them to the given filepath.
+        entries in the roster and outputs them to the given filepath. The
+        format is picked from the file extension unless a format flag is
+        given: '.jsonl' and '.ndjson' are written one entry per line, and
+        '.snap' files are compact binary snapshots that load fastest.
 
         WARNING: This will overwrite the given file without prompting the user
         for confirmation.
         """
+        fmt, path = self.__split_format(arg)
         try:
-            self.initiative.export_file(arg)
+            self.initiative.export_file(path, fmt)
         # TODO: Improve this
         except (FileNotFoundError, PermissionError) as e:
             raise e
+        except ValueError as e:
+            print(f"export failed: {e}")
 
     def do_import(self, arg):
         """
         Import a roster from the given file, overwriting the current roster
 
-        Usage: import FILEPATH
+        Usage: import [--json|--jsonl|--snapshot] FILEPATH
 
         This command deserializes all of the information from the given file
-        and loads it into the current roster.
+        and loads it into the current roster. The format is picked from the
+        file extension unless a format flag is given, as with `export`.
 
         WARNING: This will overwrite the current roster with the information
         from the given file. Additionally, passing it an improperly-formatted
         file will cause the program to crash.
         """
+        fmt, path = self.__split_format(arg)
         try:
-            self.initiative.import_file(arg)
+            self.initiative.import_file(path, fmt)
         # TODO: Specifically improve error checking on the file contents
         # and the error messages. Just lazy tbh.
-        except (FileNotFoundError, PermissionError) as e:
+        except (FileNotFoundError, PermissionError, ValueError) as e:
             print(e)
 
     def do_toggle_hidden(self, arg):
         """
         Toggle the hidden status on an entry
 
-        Usage: toggle_hidden
+        Usage: toggle_hidden [INDEX]
 
         This command toggles whether or not a creature is currently being
-        hidden from the initiative order. It does not accept arguments, but
-        instead receives its input interactively after passing the command.
+        hidden from the initiative order. If no index is passed, it is asked
+        for interactively.
         """
-        self.do_hprint(None)
         try:
-            index = int(input(f"Index of the entry you want to un/hide: "))
-
-            self.initiative.toggle_hidden(index - 1)
+            if not arg:
+                self.__show_context()
+                arg = self.__ask("Index of the entry you want to un/hide: ")
+            self.initiative.toggle_hidden(self.__parse_index(arg))
 
-        except ValueError:
-            print(f"toggle_hidden failed: [FIXME]")
+        except ValueError as e:
+            print(f"toggle_hidden failed: {e}")
 
     def do_rename(self, arg):
         """
         Rename an entry
 
-        Usage: rename
+        Usage: rename [INDEX NEW_NAME]
 
-        This command will rename the entry at the specified index. It does not
-        accept arguments, but instead receives its input interactively after
-        passing the command.
+        This command will rename the entry at the specified index. If no
+        arguments are passed, they are asked for interactively.
         """
-        self.do_hprint(None)
         try:
-            index = int(input(f"Index of the entry you want to rename: "))
-            new_name = input("New name: ")
+            if arg:
+                index, new_name = self.__split_entry(arg)
+            else:
+                self.__show_context()
+                index = self.__parse_index(
+                    self.__ask("Index of the entry you want to rename: ")
+                )
+                new_name = self.__ask("New name: ")
+            new_name = new_name.strip()
+            if not new_name:
+                raise ValueError("No new name provided")
 
-            self.initiative.rename_entry(index - 1, new_name)
+            self.initiative.rename_entry(index, new_name)
 
-        except ValueError:
-            print(f"rename failed: [FIXME]")
+        except ValueError as e:
+            print(f"rename failed: {e}")
 
     def do_copy(self, arg):
         """
         Copy an entry a number of times
 
-        Usage: copy
+        Usage: copy [INDEX AMOUNT]
 
-        This command will copy the entry a specified number of times. It does
-        not accept arguments, but instead receives its input interactively after
-        passing the command.
+        This command will copy the entry a specified number of times. If no
+        arguments are passed, they are asked for interactively.
 
         Note: If the entry's Initiative value was passed manually as opposed
         to having it rolled automagically, then the copies will have the same
         initiative value. Conversely, if they were rolled, the copies will all
         have their initiatives randomly rolled as well.
         """
-        self.do_hprint(None)
         try:
-            index = int(input(f"Index of the entry you want to copy: "))
-            amount = int(input("Number of copies: "))
+            if arg:
+                index, amount = self.__split_entry(arg)
+                if len(amount.split()) != 1:
+                    raise ValueError("expected an index and an amount")
+            else:
+                self.__show_context()
+                index = self.__parse_index(
+                    self.__ask("Index of the entry you want to copy: ")
+                )
+                amount = self.__ask("Number of copies: ")
+
+            self.initiative.copy_index(index, int(amount))
+
+        except ValueError as e:
+            print(f"copy failed: {e}")
+
+    def do_spawn(self, arg):
+        """
+        Add creatures from a bestiary template
+
+        Usage: spawn [TEMPLATE [xAMOUNT] [hidden]]
+
+        This command adds AMOUNT entries (default: 1) built from the TEMPLATE
+        statblock of the bestiary, numbered after any existing entries of the
+        same name, such as `spawn goblin x4`. Their initiatives are rolled
+        from the template's initiative bonus, and so are their hit points if
+        the template gives them as dice. If no arguments are passed, they are
+        asked for interactively.
+        """
+        if self.bestiary is None:
+            print("spawn failed: no bestiary is loaded (start with --bestiary DIR)")
+            return
+        try:
+            if arg.strip():
+                words = arg.split()
+                hidden = words[-1] == "hidden"
+                if hidden:
+                    words.pop()
+                amount = 1
+                if len(words) > 1 and re.fullmatch(r"x\d+", words[-1]):
+                    amount = int(words.pop()[1:])
+                name = " ".join(words)
+            else:
+                name = self.__ask("Template to spawn: ").strip()
+                amount = int(self.__ask("Number to spawn: ") or 1)
+                hidden = False
+            entries = self.initiative.spawn(self.bestiary.get(name), amount, hidden)
+        except ValueError as e:
+            print(f"spawn failed: {e}")
+            return
+        if entries and self.interactive:
+            print(f"Spawned {entries[0].name} to {entries[-1].name}")
 
-            self.initiative.copy_index(index - 1, amount)
+    def complete_spawn(self, text, line, begidx, endidx):
+        """Completes the template name a `spawn` starts with, spaces included"""
+        if self.bestiary is None:
+            return []
+        typed = line[:endidx].lstrip().partition(" ")[2]
+        done = len(typed) - len(text)
+        return [name[done:] for name in self.bestiary.names.prefix(typed)]
 
-        except ValueError:
-            print(f"copy failed: [FIXME]")
+    def do_bestiary(self, arg):
+        """
+        List the templates of the bestiary
+
+        Usage: bestiary [PATTERN]
 
-    def __apply_hp_change(self, action_name: str, action_func: callable):
-        """Apply a healing or damage action to selected entries by index"""
-        self.do_hprint(None)
+        This command lists the names of the templates starting with PATTERN,
+        or matching it if it is a glob such as '*dragon*'. Without a pattern,
+        every template is listed.
+        """
+        if self.bestiary is None:
+            print("bestiary failed: no bestiary is loaded (start with --bestiary DIR)")
+            return
+        pattern = arg.strip()
+        if any(char in pattern for char in "*?["):
+            matches = self.bestiary.names.glob(pattern)
+        else:
+            matches = self.bestiary.names.prefix(pattern)
+        for name in matches:
+            print(name)
+
+    def __parse_targets(self, response: str):
+        """
+        Converts a target string into a target selection for the roster
+
+        Accepts 1-based indexes and inclusive ranges ('1 3 5-9' or '1,3,5-9'),
+        filter words that must all hold ('visible', 'hidden', 'alive', 'down',
+        'all'), a tag such as '#elite', a name glob such as 'goblin *', or
+        otherwise a name as accepted by Initiative.lookup().
+        """
+        filters = {
+            "all": lambda entry: True,
+            "visible": lambda entry: not entry.hidden,
+            "hidden": lambda entry: entry.hidden,
+            "alive": lambda entry: entry.hp > 0,
+            "down": lambda entry: entry.hp <= 0,
+        }
+        words = response.split()
+        if not words:
+            raise ValueError("No targets provided")
+        if all(word in filters for word in words):
+            checks = [filters[word] for word in words]
+            return lambda entry: all(check(entry) for check in checks)
+        if not re.fullmatch(r"[\d\s,-]+", response):
+            pattern = response.strip()
+            if pattern.startswith("#"):
+                self.initiative.group(pattern)
+                return pattern
+            if self.initiative.names.glob(pattern):
+                return pattern
+            return [self.initiative.index_of(self.initiative.lookup(pattern).name)]
+
+        indexes = []
+        for part in response.replace(",", " ").split():
+            start, _, stop = part.partition("-")
+            start = int(start)
+            stop = int(stop) if stop else start
+            if not 1 <= start <= stop <= len(self.initiative):
+                raise ValueError("Invalid index provided")
+            indexes.extend(range(start - 1, stop))
+        return indexes
+
+    def __split_amount(self, arg: str):
+        """Splits 'TARGETS AMOUNT' into a target selection and an integer"""
+        targets, _, amount = arg.strip().rpartition(" ")
+        return self.__parse_targets(targets), int(amount)
+
+    def __apply_hp_change(self, arg: str, action_name: str, sign: int):
+        """Apply a healing or damage action to the selected entries"""
         # TODO: smarter exception handling
         try:
-            response = input(
-                f"Indexes of the entries you want to {action_name} (space-separated): "
-            )
-            amount = int(input("Amount: "))
-            for index in response.split():
-                index = int(index)
-                if index > len(self.initiative.roster.keys()):
-                    raise ValueError("Invalid index provided")
-                action_func(index - 1, amount)
+            if arg:
+                targets, amount = self.__split_amount(arg)
+            else:
+                self.__show_context()
+                targets = self.__parse_targets(
+                    self.__ask(
+                        f"Indexes of the entries you want to {action_name} "
+                        "(space-separated): "
+                    )
+                )
+                amount = int(self.__ask("Amount: "))
+            self.initiative.apply_hp_batch(targets, sign * amount)
         except ValueError as e:
             print(f"{action_name} failed:", e)
 
@@ -180,67 +496,111 @@ class ProgramLoop(cmd.Cmd):
         """
         Apply healing to a number of entries
 
-        Usage: heal
+        Usage: heal [TARGETS AMOUNT]
 
         This command will add an amount to the given entries' Current HP values.
-        It does not accept arguments, but instead receives its input
-        interactively after passing the command.
+        Targets are indexes and ranges such as '3,5-9', or any other selection
+        accepted by `area`. If no arguments are passed, they are asked for
+        interactively.
         """
-        self.__apply_hp_change("heal", self.initiative.heal)
+        self.__apply_hp_change(arg, "heal", 1)
 
     def do_damage(self, arg):
         """
         Apply damage to a number of entries
 
-        Usage: damage
+        Usage: damage [TARGETS AMOUNT]
 
         This command will subtract an amount from the given entries' Current HP
-        values. It does not accept arguments, but instead receives its input
-        interactively after passing the command.
+        values. Targets are indexes and ranges such as '3,5-9', or any other
+        selection accepted by `area`. If no arguments are passed, they are
+        asked for interactively.
+        """
+        self.__apply_hp_change(arg, "damage", -1)
+
+    def do_area(self, arg):
+        """
+        Apply damage or healing to every entry matched by a target selection
+
+        Usage: area [damage|heal TARGETS AMOUNT]
+
+        This command applies one amount to many entries at once, such as
+        everything caught in a fireball. Targets may be given as indexes and
+        ranges ('1,3,5-9'), a name glob ('goblin *'), or filter words that must
+        all hold ('visible alive', 'down', 'hidden', 'all'). If no arguments
+        are passed, they are asked for interactively.
         """
-        self.__apply_hp_change("damage", self.initiative.damage)
+        try:
+            if arg:
+                action_name, _, arg = arg.strip().partition(" ")
+                targets, amount = self.__split_amount(arg)
+            else:
+                self.__show_context()
+                action_name = self.__ask("Damage or heal? [d/h]: ")
+                targets = self.__parse_targets(self.__ask("Targets: "))
+                amount = int(self.__ask("Amount: "))
+            action_name = action_name.strip().lower()
+            if action_name not in ("d", "damage", "h", "heal"):
+                raise ValueError(f"{action_name} is not 'damage' or 'heal'")
+            if action_name.startswith("d"):
+                amount = -amount
+            changed = self.initiative.apply_hp_batch(targets, amount)
+            if self.interactive:
+                print(f"{changed} entries affected")
+        except ValueError as e:
+            print("area failed:", e)
 
     def do_modify(self, arg):
         """
         Apply a modification to an entry's attributes
 
-        Usage: modify
+        Usage: modify [INDEX FIELD VALUE]
 
         This command will modify an entry's Initiative, AC, Max HP, or Current
-        HP values to the specified number. It does not accept arguments, but
-        instead receives its input interactively after passing the command."""
-        # Provide hprint for context
-        self.do_hprint(None)
+        HP values to the specified number. FIELD is one of 'initiative', 'ac',
+        'hp_max' or 'hp', or its number from the interactive menu. If no
+        arguments are passed, they are asked for interactively."""
+        fields = {
+            "1": "initiative",
+            "initiative": "initiative",
+            "init": "initiative",
+            "2": "ac",
+            "ac": "ac",
+            "3": "hp_max",
+            "hp_max": "hp_max",
+            "max": "hp_max",
+            "4": "hp",
+            "hp": "hp",
+        }
         try:
-            # Prompt for index of entry
-            index = int(input("Index of the entry you want to modify: "))
-            if index > len(self.initiative.roster.keys()):
-                raise ValueError
-
-            # Prompt for index of field to modify
-            options = ("Initiative", "AC", "Max HP", "Current HP")
-            for idx, option in enumerate(options, start=1):
-                print(f"{idx} {option}")
-            key = input("Index of the field you want to modify: ")
-            if key == "1":
-                key = "initiative"
-            elif key == "2":
-                key = "ac"
-            elif key == "3":
-                key = "hp_max"
-            elif key == "4":
-                key = "hp"
+            if arg:
+                index, key, value = arg.rsplit(maxsplit=2)
             else:
-                print(f"{key} is not a valid index")
-                raise ValueError
+                # Provide hprint for context
+                self.__show_context()
+                # Prompt for index of entry
+                index = self.__ask("Index of the entry you want to modify: ")
+                self.__parse_index(index)
+
+                # Prompt for index of field to modify
+                options = ("Initiative", "AC", "Max HP", "Current HP")
+                for idx, option in enumerate(options, start=1):
+                    print(f"{idx} {option}")
+                key = self.__ask("Index of the field you want to modify: ")
+                if key.lower() not in fields:
+                    print(f"{key} is not a valid index")
+                    raise ValueError
 
-            value = int(input("Enter a new value: "))
+                value = self.__ask("Enter a new value: ")
+            index = self.__parse_index(index)
+            key = fields[key.lower()]
+            value = int(value)
 
-        except ValueError:
+        except (ValueError, KeyError):
             print("modify failed: Invalid index or integer provided")
             return
 
-        self.initiative.modify_index(index - 1, key, value)
+        self.initiative.modify_index(index, key, value)
 
     def __validate_add_to_initiative_args(
         self, name, initiative, ac, hp_max, hp, hidden
@@ -257,39 +617,90 @@ class ProgramLoop(cmd.Cmd):
                     print(f"add_to_initiative failed: {field} is not a number")
                     raise e
 
+    def __parse_add_to_initiative_args(self, arg):
+        """Splits 'NAME INITIATIVE [ac=N] [hp_max=N] [hp=N] [hidden]' into fields"""
+        words = arg.split()
+        params = {"ac": "", "hp_max": "", "hp": "", "hidden": False}
+        # Options trail the positional NAME and INITIATIVE words
+        while words and ("=" in words[-1] or words[-1].lower() == "hidden"):
+            option = words.pop()
+            if option.lower() == "hidden":
+                params["hidden"] = True
+                continue
+            key, _, value = option.partition("=")
+            key = {"max": "hp_max"}.get(key.lower(), key.lower())
+            if key not in ("ac", "hp_max", "hp", "hidden"):
+                raise ValueError(f"unknown option {key}")
+            if key == "hidden":
+                value = value.lower() in ("y", "ye", "yes", "true", "1")
+            params[key] = value
+        if len(words) < 2:
+            raise ValueError("a name and an initiative are required")
+        params["name"] = " ".join(words[:-1])
+        params["initiative"] = words[-1]
+        # A single HP value describes a creature at full health
+        if not params["hp_max"]:
+            params["hp_max"] = params["hp"]
+        if not params["hp"]:
+            params["hp"] = params["hp_max"]
+        return params
+
     def do_add_to_initiative(self, arg):
         """
         Adds an entry to the initiative roster
 
-        Usage: add_to_initiative
+        Usage: add_to_initiative [NAME INITIATIVE [ac=N] [hp_max=N] [hp=N] [hidden]]
 
         This command will add a new entry to the initiative roster. You are
         required to enter at least an entry's Name and Initiative values, while
-        all other fields can be left blank or filled out, optionally.
+        all other fields can be left blank or filled out, optionally. If no
+        arguments are passed, they are asked for interactively; given inline,
+        a lone `hp` or `hp_max` sets both, such as `add goblin +2 ac=15 hp=7`.
 
         The Initiative field accepts three different formats: 'int', '+int',
         and '-int'. Specifying 'int' will set the initiative value to that
         number, while specifying one of the other two will treat that as an
         initiative modifier and randomly roll for its position in the roster.
 
-        Note: Setting a name that ends with numbers, I.e 'creature 1' can
-        potentially break the automatic numbering system in place with the
-        `copy` command.
+        Note: Setting a name that ends with numbers, I.e 'creature 7' makes
+        later copies of 'creature' continue numbering from 'creature 8'.
         """
+        try:
+            if arg:
+                params = self.__parse_add_to_initiative_args(arg)
+            else:
+                params = self.__ask_add_to_initiative_args()
+        except ValueError as e:
+            print(f"add_to_initiative failed: {e}")
+            return
+
+        try:
+            self.__validate_add_to_initiative_args(**params)
+        except ValueError as e:
+            pass
+        else:
+            nonblank_params = {key: value for key, value in params.items() if value}
+            if not self.initiative.add_to_initiative(**nonblank_params):
+                print(
+                    "add_to_initiative failed: entry already exists (use modify instead?)"
+                )
+
+    def __ask_add_to_initiative_args(self):
+        """Prompts for the fields of a new entry"""
         # Receive parameters from command line
-        name = input("Name: ")
-        initiative = input("Initiative: ")
-        ac = input("AC: ")
-        hp_max = input("HP Max: ")
-        hp = input("HP Current: ")
-        hidden = input("Hidden? [y/n]: ")
+        name = self.__ask("Name: ")
+        initiative = self.__ask("Initiative: ")
+        ac = self.__ask("AC: ")
+        hp_max = self.__ask("HP Max: ")
+        hp = self.__ask("HP Current: ")
+        hidden = self.__ask("Hidden? [y/n]: ")
         # Check for 'y'-like values in hidden field
         if hidden.lower() in ("y", "ye", "yes"):
             hidden = True
         else:
             hidden = False
         # Package them into a dict
-        params = {
+        return {
             "name": name,
             "initiative": initiative,
             "ac": ac,
@@ -298,16 +709,432 @@ class ProgramLoop(cmd.Cmd):
             "hidden": hidden,
         }
 
+    do_add = do_add_to_initiative
+
+    def __announce_turn(self, entry):
+        """Prints the conditions that just expired and whose turn it is"""
+        for name, condition in self.initiative.expired:
+            print(f"{condition} ended on {name}")
+        print(f"Round {self.initiative.round}: {entry.name}")
+
+    def do_next(self, arg):
+        """
+        Pass the turn to the next entry in the initiative order
+
+        Usage: next
+
+        This command starts the encounter at the top of the order if it has
+        not started yet, and starts a new round after the last entry. The
+        entry whose turn it is is marked with a '>' by `print` and `hprint`;
+        hidden entries take their turns too, but are never marked in `print`.
+        Conditions that expire as the turn passes are removed and listed.
+        """
         try:
-            self.__validate_add_to_initiative_args(**params)
+            self.__announce_turn(self.initiative.next_turn())
         except ValueError as e:
-            pass
-        else:
-            nonblank_params = {key: value for key, value in params.items() if value}
-            if not self.initiative.add_to_initiative(**nonblank_params):
-                print(
-                    "add_to_initiative failed: entry already exists (use modify instead?)"
+            print(f"next failed: {e}")
+
+    def do_prev(self, arg):
+        """
+        Pass the turn back to the previous entry in the initiative order
+
+        Usage: prev
+
+        This command undoes a `next`, going back into the previous round from
+        the top of the order.
+        """
+        try:
+            self.__announce_turn(self.initiative.previous_turn())
+        except ValueError as e:
+            print(f"prev failed: {e}")
+
+    def do_delay(self, arg):
+        """
+        Delay the current entry's turn to a lower initiative
+
+        Usage: delay [INITIATIVE]
+
+        This command moves the entry whose turn it is to the given initiative
+        and passes the turn to the entry after it. The delayed entry acts
+        again when its new place in the order comes up. If no initiative is
+        passed, it is asked for interactively.
+        """
+        try:
+            if not arg:
+                self.__show_context()
+                arg = self.__ask("New initiative: ")
+            self.__announce_turn(self.initiative.delay_turn(int(arg)))
+        except ValueError as e:
+            print(f"delay failed: {e}")
+
+    def do_ready(self, arg):
+        """
+        Ready the current entry's action for another entry's turn
+
+        Usage: ready [INDEX]
+
+        This command moves the entry whose turn it is to act right after the
+        entry at INDEX, as when a readied action is triggered by that entry,
+        and passes the turn to the entry after it. If no index is passed, it
+        is asked for interactively.
+        """
+        try:
+            if not arg:
+                self.__show_context()
+                arg = self.__ask("Index of the entry that triggers the action: ")
+            index = self.__parse_index(arg)
+            self.__announce_turn(self.initiative.ready_turn(index))
+        except ValueError as e:
+            print(f"ready failed: {e}")
+
+    def do_remove(self, arg):
+        """
+        Remove an entry from the roster
+
+        Usage: remove [INDEX]
+
+        This command removes the entry at the specified index, such as a
+        creature that fled or died. If it was that entry's turn, the turn
+        passes to the next entry. If no index is passed, it is asked for
+        interactively.
+        """
+        try:
+            if not arg:
+                self.__show_context()
+                arg = self.__ask("Index of the entry you want to remove: ")
+            self.initiative.remove_entry(self.__parse_index(arg))
+        except ValueError as e:
+            print(f"remove failed: {e}")
+
+    def do_condition(self, arg):
+        """
+        Put a condition on a number of entries
+
+        Usage: condition [TARGETS NAME [ROUNDS | start INDEX | end INDEX]]
+
+        This command tracks a condition such as 'poisoned' or 'blessed' on the
+        given entries, shown by `hprint`. Targets are indexes and ranges such
+        as '3,5-9', or any other selection accepted by `area`. The condition
+        lasts until removed with `remove_condition`, unless it is given:
+
+        ROUNDS       it expires after that many rounds, at the start of the
+                     turn of the entry whose turn it is now
+        end INDEX    it expires at the end of the next turn of entry INDEX
+        start INDEX  it expires at the start of the next turn of entry INDEX
+
+        Expired conditions are removed by `next`. If no arguments are passed,
+        they are asked for interactively.
+        """
+        try:
+            if not arg:
+                self.__show_context()
+                arg = " ".join(
+                    (
+                        self.__ask("Targets: "),
+                        self.__ask("Condition: "),
+                        self.__ask("Duration (ROUNDS, end INDEX or start INDEX): "),
+                    )
                 )
+            words = arg.split()
+            rounds = anchor = None
+            phase = "end"
+            if len(words) >= 4 and words[-2].lower() in ("start", "end"):
+                phase = words[-2].lower()
+                anchor = self.__parse_index(words[-1])
+                words = words[:-2]
+            elif len(words) >= 3 and words[-1].isdigit():
+                rounds = int(words.pop())
+            if len(words) < 2:
+                raise ValueError("targets and a condition name are required")
+            targets = self.__parse_targets(" ".join(words[:-1]))
+            self.initiative.add_condition(targets, words[-1], rounds, anchor, phase)
+        except (ValueError, IndexError) as e:
+            print(f"condition failed: {e}")
+
+    def do_remove_condition(self, arg):
+        """
+        Remove a condition from a number of entries
+
+        Usage: remove_condition [TARGETS NAME]
+
+        This command removes the named condition from every given entry that
+        has it, before it would expire on its own. Targets are as for
+        `condition`. If no arguments are passed, they are asked for
+        interactively.
+        """
+        try:
+            if arg:
+                targets, _, name = arg.strip().rpartition(" ")
+            else:
+                self.__show_context()
+                targets = self.__ask("Targets: ")
+                name = self.__ask("Condition: ")
+            changed = self.initiative.remove_condition(
+                self.__parse_targets(targets), name.strip()
+            )
+            if not changed:
+                raise ValueError(f"no target has the condition {name.strip()}")
+        except (ValueError, IndexError) as e:
+            print(f"remove_condition failed: {e}")
+
+    def do_tag(self, arg):
+        """
+        Tag a number of entries, grouping them under a name
+
+        Usage: tag [TARGETS TAG]
+
+        This command adds TAG to every given entry, such as `tag goblin *
+        flankers`. Tagged entries can be targeted as '#TAG' by commands taking
+        TARGETS, and their totals are shown by `groups`. Targets are as for
+        `heal`. If no arguments are passed, they are asked for interactively.
+        """
+        try:
+            if arg:
+                targets, _, tag = arg.strip().rpartition(" ")
+            else:
+                self.__show_context()
+                targets = self.__ask("Targets: ")
+                tag = self.__ask("Tag: ")
+            self.initiative.tag_entries(self.__parse_targets(targets), tag.strip())
+        except (ValueError, IndexError) as e:
+            print(f"tag failed: {e}")
+
+    def do_untag(self, arg):
+        """
+        Remove a tag from a number of entries
+
+        Usage: untag [TARGETS TAG]
+
+        This command removes TAG from every given entry that has it, such as
+        `untag #flankers flankers`. If no arguments are passed, they are asked
+        for interactively.
+        """
+        try:
+            if arg:
+                targets, _, tag = arg.strip().rpartition(" ")
+            else:
+                self.__show_context()
+                targets = self.__ask("Targets: ")
+                tag = self.__ask("Tag: ")
+            changed = self.initiative.untag_entries(
+                self.__parse_targets(targets), tag.strip()
+            )
+            if not changed:
+                raise ValueError(f"no target has the tag {tag.strip()}")
+        except (ValueError, IndexError) as e:
+            print(f"untag failed: {e}")
+
+    def do_groups(self, arg):
+        """
+        Print the totals of entry families and tags
+
+        Usage: groups [FAMILY | #TAG]
+
+        This command shows, for every family of two or more numbered entries
+        (such as 'goblin 1' to 'goblin 40') and every tag, how many members
+        it has and how many are up, their total and average HP and the member
+        with the lowest HP. With an argument, only that group is shown.
+        """
+        key = arg.strip()
+        try:
+            if key:
+                groups = [(key, self.initiative.group(key))]
+            else:
+                families = self.initiative.groups.families.items()
+                groups = [(base, group) for base, group in families if group.count > 1]
+                groups.sort()
+                groups += sorted(
+                    (f"#{tag}", group)
+                    for tag, group in self.initiative.groups.tags.items()
+                )
+        except ValueError as e:
+            print(f"groups failed: {e}")
+            return
+        for key, group in groups:
+            lowest = group.lowest()
+            print(
+                f"{key}: {group.count} ({group.alive} up), "
+                f"{group.hp}/{group.hp_max} HP (avg {group.hp / group.count:.1f}), "
+                f"lowest {lowest.name} ({lowest.hp} HP)"
+            )
+
+    def do_simulate(self, arg):
+        """
+        Simulate the current encounter many times and report the outcomes
+
+        Usage: simulate TRIALS [PROFILES_FILE]
+
+        This command plays out the encounter TRIALS times, spread over every
+        CPU core, and reports how often each side wins, how many rounds the
+        fights last and how much HP each entry has left. Numbered entries such
+        as 'goblin 3' fight as 'monsters' and all others as 'party'.
+
+        PROFILES_FILE is an optional json file mapping entry names or base
+        names to attack profiles, such as
+        {"goblin": {"to_hit": 4, "damage": "1d6+2"}, "Aria": {"side": "party"}}.
+        Entries without a profile attack at +3 for 1d6.
+        """
+        try:
+            trials, _, path = arg.strip().partition(" ")
+            profiles = None
+            if path:
+                import json
+
+                with open(path.strip(), "r") as fo:
+                    profiles = json.load(fo)
+            # The simulator pulls in multiprocessing, so load it on first use
+            from src.simulate import simulate
+
+            result = simulate(self.initiative, int(trials), profiles)
+        except (OSError, ValueError) as e:
+            print(f"simulate failed: {e}")
+            return
+        self.stdout.write(result.summary())
+
+    def do_undo(self, arg):
+        """
+        Undo the changes made by the most recent command
+
+        Usage: undo
+
+        This command reverts every change made by the last command that changed
+        the roster, such as a mistyped `damage` or `modify`. It can be repeated
+        to step further back, up to the configured history depth.
+        """
+        if self.history is None or not self.history.undo():
+            print("undo failed: nothing to undo")
+
+    def do_redo(self, arg):
+        """
+        Redo the changes most recently reverted by `undo`
+
+        Usage: redo
+
+        This command reapplies the last step reverted by `undo`. Running any
+        command that changes the roster discards the steps left to redo.
+        """
+        if self.history is None or not self.history.redo():
+            print("redo failed: nothing to redo")
+
+    def do_stats(self, arg):
+        """
+        Print how long commands took and how much work they did
+
+        Usage: stats [reset]
+
+        This command lists every command run so far with its number of calls
+        and its total, mean, 95th percentile and maximum latency, slowest in
+        total first, followed by counts of roster sorts, render passes and
+        dice rolls. `stats reset` starts counting from scratch.
+        """
+        if self.stats is None:
+            print("stats failed: statistics are not being collected")
+            return
+        if arg.strip() == "reset":
+            self.stats.reset()
+            return
+        self.stdout.write(self.stats.summary())
+
+    def do_profile(self, arg):
+        """
+        Run a single command under the profiler and print where time went
+
+        Usage: profile COMMAND [ARGUMENTS]
+
+        This command runs COMMAND as usual, such as `profile hprint`, and then
+        prints the 20 functions with the most cumulative time spent in them.
+        """
+        if not arg.strip():
+            print("profile failed: no command provided")
+            return
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        stop = profiler.runcall(self.onecmd, arg)
+        report = io.StringIO()
+        stats = pstats.Stats(profiler, stream=report)
+        stats.sort_stats("cumulative").print_stats(20)
+        self.stdout.write(report.getvalue())
+        return stop
+
+    def __switch_encounter(self, encounter_id):
+        """Helper function to make another encounter's roster the current one"""
+        initiative = self.encounters.switch(encounter_id)
+        if initiative is self.initiative:
+            return
+        # Undo steps and the player view belong to the roster they were made on
+        if self.history is not None:
+            self.history.detach()
+            self.history.attach(initiative)
+        if self.server is not None:
+            self.server.detach(self.initiative)
+            self.server.attach(initiative)
+        if self.shared is not None:
+            self.shared.detach(self.initiative)
+            self.shared.attach(initiative)
+        if self.stats is not None:
+            self.stats.attach(initiative)
+        self.initiative = initiative
+
+    def do_encounter(self, arg):
+        """
+        Create, switch between and list encounters
+
+        Usage: encounter [list]
+               encounter new ID
+               encounter switch ID
+
+        Every encounter has its own roster, turn and undo history. `encounter
+        new` creates an empty encounter and switches to it, `encounter switch`
+        makes another encounter the current one and `encounter list` shows
+        every encounter with its number of entries. Encounters not used in a
+        while are saved to disk to stay within the memory budget, and loaded
+        again when switched to.
+        """
+        if self.encounters is None:
+            print("encounter failed: encounters are not available")
+            return
+        action, _, encounter_id = arg.strip().partition(" ")
+        encounter_id = encounter_id.strip()
+        try:
+            if action in ("", "list"):
+                for row_id, size, loaded in self.encounters.summary():
+                    marker = "*" if row_id == self.encounters.current else " "
+                    state = "" if loaded else ", on disk"
+                    print(f"{marker} {row_id} ({size} entries{state})")
+            elif action == "new" and encounter_id:
+                self.encounters.new(encounter_id)
+                self.__switch_encounter(encounter_id)
+            elif action == "switch" and encounter_id:
+                self.__switch_encounter(encounter_id)
+            else:
+                print(f"encounter failed: invalid arguments {arg}")
+        except (OSError, ValueError) as e:
+            print(f"encounter failed: {e}")
+
+    def complete_encounter(self, text, line, begidx, endidx):
+        """Completes encounter ids after `encounter switch`"""
+        if self.encounters is None or line.split()[1:2] != ["switch"]:
+            return []
+        return [
+            encounter_id
+            for encounter_id in self.encounters.ids()
+            if encounter_id.startswith(text)
+        ]
+
+    complete_toggle_hidden = __complete_names
+    complete_rename = __complete_names
+    complete_copy = __complete_names
+    complete_heal = __complete_names
+    complete_damage = __complete_names
+    complete_modify = __complete_names
+    complete_ready = __complete_names
+    complete_remove = __complete_names
+    complete_condition = __complete_names
+    complete_remove_condition = __complete_names
+    complete_tag = __complete_names
+    complete_untag = __complete_names
 
     def do_EOF(self, arg):
         raise KeyboardInterrupt
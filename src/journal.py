@@ -0,0 +1,163 @@
+"""Implements an append-only journal that keeps a roster durable on disk"""
+import json
+import os
+import zlib
+
+from src.snapshot import write_snapshot
+
+
+def _checksum(path: str) -> int:
+    """Returns the CRC32 of a file, identifying the snapshot a journal extends"""
+    checksum = 0
+    with open(path, "rb") as fo:
+        for block in iter(lambda: fo.read(1 << 20), b""):
+            checksum = zlib.crc32(block, checksum)
+    return checksum
+
+
+class Journal:
+
+    """
+    Write-ahead journal of roster changes on top of a binary snapshot
+
+    Every change record from the attached Initiative is appended to
+    PATH.journal as one JSON line, flushed in batches. Compaction folds the
+    journal into the snapshot at PATH and starts an empty journal, whose
+    first line holds the checksum of the snapshot it extends, so a journal
+    left over from an interrupted compaction is never replayed twice.
+
+    When the snapshot cannot be written, for instance because a value does
+    not fit its 32-bit columns, compaction leaves the journal in place and
+    sets error to say why; the caller reports and clears it.
+    """
+
+    def __init__(
+        self, path: str, flush_every: int = 64, compact_every: int = 10000
+    ) -> None:
+        """Initializes a journal for the snapshot at path"""
+        self.snapshot_path = path
+        self.journal_path = f"{path}.journal"
+        self.flush_every = flush_every
+        self.compact_every = compact_every
+        self.initiative = None
+        self._pending = []
+        self._journaled = 0
+        # Why the last compaction failed, or None
+        self.error = None
+        # Set while a replaced roster could not be written to the snapshot,
+        # as the journal on disk belongs to the roster it replaced
+        self._orphaned = False
+
+    def attach(self, initiative) -> int:
+        """
+        Recovers the saved roster into initiative and starts journaling it
+
+        Returns the number of journal records replayed on top of the snapshot.
+        """
+        replayed = self.recover(initiative)
+        self.initiative = initiative
+        initiative.listeners.append(self.record)
+        # Start every session from a freshly compacted journal
+        self.compact()
+        return replayed
+
+    def recover(self, initiative) -> int:
+        """Loads the snapshot and replays the journal tail into initiative"""
+        if not os.path.exists(self.snapshot_path):
+            return 0
+        initiative.import_file(self.snapshot_path, "snapshot")
+        if not os.path.exists(self.journal_path):
+            return 0
+
+        replayed = 0
+        with open(self.journal_path, "r") as fo:
+            header = fo.readline()
+            try:
+                extends = json.loads(header)["snapshot"]
+            except (ValueError, KeyError, TypeError):
+                return 0
+            # A mismatch means the journal was already folded into the snapshot
+            if extends != _checksum(self.snapshot_path):
+                return 0
+            for line in fo:
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    # A torn final record from a crash mid-write
+                    break
+                initiative.apply_change(change)
+                replayed += 1
+        return replayed
+
+    def record(self, change: tuple) -> None:
+        """Queues a change record, flushing or compacting when due"""
+        if change[0] == "load":
+            # The roster was replaced wholesale, so the journal is moot
+            self._pending.clear()
+            self._orphaned = True
+            self.compact()
+            return
+        if self._orphaned:
+            # The journal on disk extends the replaced roster, so these
+            # records cannot go there; retry the compaction every batch
+            self._journaled += 1
+            if self._journaled >= self.flush_every:
+                self.compact()
+            return
+        self._pending.append(json.dumps(change))
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Appends the queued records to the journal file, compacting when due"""
+        self.__append()
+        if self._journaled >= self.compact_every:
+            self.compact()
+
+    def __append(self) -> None:
+        """Helper function to append the queued records to the journal file"""
+        if not self._pending:
+            return
+        with open(self.journal_path, "a") as fo:
+            fo.writelines(f"{line}\n" for line in self._pending)
+            fo.flush()
+            os.fsync(fo.fileno())
+        self._journaled += len(self._pending)
+        self._pending.clear()
+
+    def compact(self) -> bool:
+        """
+        Folds the journal into a new snapshot and starts an empty journal
+
+        Queued records are appended first, so they survive a failed write of
+        the snapshot. Returns False, setting error, if the write failed.
+        """
+        self.__append()
+        try:
+            write_snapshot(
+                self.snapshot_path, self.initiative, self.initiative.turn_state()
+            )
+        except (OSError, ValueError) as e:
+            self.error = f"cannot write {self.snapshot_path}: {e}"
+            if self._orphaned:
+                self.error += " (changes are not saved until it can be written)"
+            # Try again once another batch was journaled
+            self._journaled = 0
+            return False
+        self.error = None
+        self._orphaned = False
+        header = json.dumps({"snapshot": _checksum(self.snapshot_path)})
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, "w") as fo:
+            fo.write(f"{header}\n")
+        os.replace(tmp_path, self.journal_path)
+        self._journaled = 0
+        return True
+
+    def close(self) -> None:
+        """Compacts the journal and stops journaling the attached roster"""
+        if self.initiative is None:
+            return
+        self.compact()
+        self.initiative.listeners.remove(self.record)
+        self.initiative = None
@@ -0,0 +1,78 @@
+"""Implements a sorted index of entry names for prefix, glob and fuzzy lookups"""
+from bisect import bisect_left, insort
+from difflib import get_close_matches
+from fnmatch import fnmatchcase
+
+# Glob wildcards; the literal text before the first one bounds a glob lookup
+WILDCARDS = "*?["
+# Names on each side of a misspelled name compared to it by similar()
+SIMILAR_WINDOW = 50
+
+
+class NameIndex:
+
+    """
+    Sorted list of names supporting exact, prefix, glob and fuzzy lookups
+
+    Every lookup bisects to the run of names sharing a literal prefix, so it
+    costs O(log n) plus the size of that run, independent of initiative order.
+    """
+
+    def __init__(self, names=()) -> None:
+        self._names = sorted(names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        idx = bisect_left(self._names, name)
+        return idx < len(self._names) and self._names[idx] == name
+
+    def add(self, name: str) -> None:
+        """Adds a name to the index"""
+        insort(self._names, name)
+
+    def update(self, names) -> None:
+        """Adds many names to the index at once"""
+        # Timsort merges the sorted run with the new names in near linear time
+        self._names.extend(names)
+        self._names.sort()
+
+    def discard(self, name: str) -> None:
+        """Removes a name from the index if it is there"""
+        idx = bisect_left(self._names, name)
+        if idx < len(self._names) and self._names[idx] == name:
+            del self._names[idx]
+
+    def prefix(self, prefix: str) -> list:
+        """Returns the names starting with prefix, in sorted order"""
+        matches = []
+        for idx in range(bisect_left(self._names, prefix), len(self._names)):
+            if not self._names[idx].startswith(prefix):
+                break
+            matches.append(self._names[idx])
+        return matches
+
+    def glob(self, pattern: str) -> list:
+        """Returns the names matching a glob such as 'orc 1*', in sorted order"""
+        literal = pattern
+        for idx, char in enumerate(pattern):
+            if char in WILDCARDS:
+                literal = pattern[:idx]
+                break
+        if literal == pattern:
+            return [pattern] if pattern in self else []
+        return [name for name in self.prefix(literal) if fnmatchcase(name, pattern)]
+
+    def similar(self, name: str, count: int = 3) -> list:
+        """
+        Returns up to count names close to name, such as 'goblin' for 'gobiln'
+
+        Only the SIMILAR_WINDOW names sorting on either side of name are
+        compared, which keeps the lookup sublinear: they share the longest
+        prefixes with it, so typos near the start of a name are corrected
+        less often than later ones.
+        """
+        idx = bisect_left(self._names, name)
+        window = self._names[max(idx - SIMILAR_WINDOW, 0) : idx + SIMILAR_WINDOW]
+        return get_close_matches(name, window, count)
@@ -0,0 +1,244 @@
+"""Implements the roster renderer and its per-row render cache"""
+import os
+import sys
+
+from collections import Counter
+
+from src.helpers import strlen
+
+# ANSI escape prefixes of the HP bands returned by hp_band(), from down to
+# overhealed: blinking red, light red, light yellow, light green, light blue
+HP_STYLES = ("\x1b[5m\x1b[31m", "\x1b[91m", "\x1b[93m", "\x1b[92m", "\x1b[94m")
+RESET = "\x1b[0m"
+
+# None until decided by use_color() or by the first colored row
+_color = None
+
+
+def use_color(enabled: bool = None) -> bool:
+    """
+    Turns colored output on or off, or with None detects whether to use it
+
+    Detection follows the usual conventions: NO_COLOR or ANSI_COLORS_DISABLED
+    turn color off, FORCE_COLOR turns it on, and otherwise only a terminal
+    other than TERM=dumb gets color. Call this before rendering, as rendered
+    rows are cached.
+    """
+    global _color
+    if enabled is None:
+        if os.environ.get("ANSI_COLORS_DISABLED") or os.environ.get("NO_COLOR"):
+            enabled = False
+        elif os.environ.get("FORCE_COLOR"):
+            enabled = True
+        elif os.environ.get("TERM") == "dumb":
+            enabled = False
+        else:
+            try:
+                enabled = os.isatty(sys.stdout.fileno())
+            except (AttributeError, OSError, ValueError):
+                enabled = False
+    _color = enabled
+    return enabled
+
+
+def hp_band(hp: int, hp_max: int) -> int:
+    """
+    Returns the band of remaining health: 0 at or below 0%, 1 up to 50%, 2 up
+    to 80%, 3 up to 100% and 4 above it
+    """
+    if hp_max < 0:
+        hp, hp_max = -hp, -hp_max
+    # Compare in integers rather than computing a percentage
+    if hp > hp_max:
+        return 4
+    if 5 * hp > 4 * hp_max:
+        return 3
+    if 2 * hp > hp_max:
+        return 2
+    return 1 if hp > 0 else 0
+
+
+def colorize_hp(hp_string: str, hp: int, hp_max: int) -> str:
+    """Colors an '(hp)' string by remaining health"""
+    if _color is None:
+        use_color()
+    if not _color:
+        return hp_string
+    return f"{HP_STYLES[hp_band(int(hp), int(hp_max))]}{hp_string}{RESET}"
+
+
+def describe_condition(condition: dict) -> str:
+    """Returns a condition as text, such as 'poisoned (until end of orc 2, round 3)'"""
+    if "anchor" not in condition:
+        return condition["name"]
+    return (
+        f"{condition['name']} (until {condition['phase']} of {condition['anchor']}, "
+        f"round {condition['round']})"
+    )
+
+
+def _column_lengths(entry) -> tuple:
+    """Returns the widths an entry needs in the initiative, name and hp columns"""
+    return (
+        strlen(entry.initiative),
+        len(entry.name),
+        strlen(entry.hp) + strlen(entry.hp_max),
+    )
+
+
+class RosterRenderer:
+
+    """
+    Renders rosters as text, re-rendering only the rows that changed
+
+    Each entry's row is cached without its index, so rows only need to be
+    re-rendered when their entry changed or when a column width changed.
+    Column widths are tracked with a count of entries per width, so they are
+    known without scanning the roster. A whole rendered roster is cached by
+    roster version, so rendering an unchanged roster again is free.
+    """
+
+    def __init__(self) -> None:
+        # name -> [column lengths, player view row, hidden view row]
+        self._rows = {}
+        self._width_counts = (Counter(), Counter(), Counter())
+        self._widths = None
+        # with_hidden -> (version, rendered text)
+        self._texts = {}
+
+    def __forget_row(self, name: str) -> None:
+        """Helper function to drop a cached row and its column widths"""
+        row = self._rows.pop(name, None)
+        if row is None:
+            return
+        for counts, length in zip(self._width_counts, row[0]):
+            counts[length] -= 1
+            if not counts[length]:
+                del counts[length]
+
+    def __track_row(self, entry) -> None:
+        """Helper function to start caching a row for an entry"""
+        lengths = _column_lengths(entry)
+        for counts, length in zip(self._width_counts, lengths):
+            counts[length] += 1
+        self._rows[entry.name] = [lengths, None, None]
+
+    def __refresh(self, roster: dict, dirty) -> None:
+        """Helper function to invalidate the rows of changed entries"""
+        if dirty is None:
+            self._rows = {
+                name: [_column_lengths(entry), None, None]
+                for name, entry in roster.items()
+            }
+            columns = list(zip(*(row[0] for row in self._rows.values())))
+            self._width_counts = tuple(
+                Counter(column) for column in columns or ((), (), ())
+            )
+        else:
+            for name in dirty:
+                self.__forget_row(name)
+                if name in roster:
+                    self.__track_row(roster[name])
+        widths = tuple(max(counts, default=0) for counts in self._width_counts)
+        if widths != self._widths:
+            # Every row is padded to the column widths, so all of them change
+            self._widths = widths
+            for row in self._rows.values():
+                row[1] = row[2] = None
+
+    def __render_row(self, entry, with_hidden: bool, widths: tuple) -> str:
+        """Helper function to render an entry's row without its index"""
+        init_width, name_width, hp_width = widths
+        entry_string = (
+            f"{'':>{init_width - strlen(entry.initiative)}}[{entry.initiative}] "
+            f"{entry.name:>{name_width}}"
+        )
+        if not with_hidden:
+            return entry_string
+        # Hidden information includes hidden entries in the initiative
+        # as well as the HP and AC values of all creatures
+        hp_string = ""
+        ac_string = ""
+        # Only print HP/AC values if not None
+        if entry.hp_max != 0:
+            hp_ws = " " * (hp_width - strlen(entry.hp) - strlen(entry.hp_max))
+            hp_string = colorize_hp(
+                f"{hp_ws}({entry.hp}/{entry.hp_max} HP)", entry.hp, entry.hp_max
+            )
+        if entry.ac != 0:
+            ac_string = f"(AC: {entry.ac})"
+        row = f"{entry_string} {hp_string} {ac_string}"
+        if entry.conditions:
+            row += f" [{', '.join(map(describe_condition, entry.conditions))}]"
+        return row
+
+    def render(
+        self,
+        order: list,
+        roster: dict,
+        version: int,
+        dirty,
+        with_hidden: bool,
+        turn: int = None,
+    ) -> str:
+        """
+        Returns the roster as printable text
+
+        order holds the entries in initiative order and version identifies the
+        roster's state. dirty holds the names of the entries changed since the
+        previous call, or None if every entry may have changed. turn is the
+        index in order of the entry whose turn it is, which is marked with a
+        '>', or None before the first turn.
+        """
+        if dirty is None or dirty:
+            self.__refresh(roster, dirty)
+        cached = self._texts.get(with_hidden)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        view = 2 if with_hidden else 1
+        idx_width = strlen(len(order))
+        lines = []
+        visible_idx = 0
+        for position, entry in enumerate(order):
+            idx = position + 1
+            # Printing without hidden info displays only indexes for shown entries
+            if not with_hidden:
+                if entry.hidden:
+                    continue
+                visible_idx += 1
+                idx = visible_idx
+            row = self._rows[entry.name]
+            if row[view] is None:
+                row[view] = self.__render_row(entry, with_hidden, self._widths)
+            line = f"{idx:>{idx_width}}. {row[view]}\n"
+            if turn is not None:
+                line = f"{'>' if position == turn else ' '}{line}"
+            lines.append(line)
+
+        text = "".join(lines)
+        self._texts[with_hidden] = (version, text)
+        return text
+
+    def render_part(self, numbered, with_hidden: bool, current=None):
+        """
+        Yields the lines of part of a roster, such as one page of it
+
+        numbered holds (index, entry) pairs in initiative order. Column widths
+        are computed over these entries alone and the cache is bypassed, so
+        the cost depends only on the number of entries shown. current is the
+        entry whose turn it is, or None before the first turn; when it is
+        set, every line gets a turn marker as with render().
+        """
+        numbered = list(numbered)
+        if not numbered:
+            return
+        lengths = [_column_lengths(entry) for _, entry in numbered]
+        widths = tuple(max(column) for column in zip(*lengths))
+        idx_width = strlen(numbered[-1][0])
+        for idx, entry in numbered:
+            row = self.__render_row(entry, with_hidden, widths)
+            line = f"{idx:>{idx_width}}. {row}\n"
+            if current is not None:
+                line = f"{'>' if entry is current else ' '}{line}"
+            yield line
@@ -1,181 +1,872 @@
 """Implements the Initiative class, which tracks turn order, stats, and conditions"""
-import json
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from heapq import heapify, heappop, heappush
+from itertools import count, islice, repeat
 
-from termcolor import colored
-from random import randint
-from copy import deepcopy
-
-from src.helpers import strlen
+from src import formats
+from src.dice import DiceExpression, DiceRoller
+from src.helpers import split_name
 from src.entry import Entry
+from src.groups import Groups
+from src.names import NameIndex
+from src.render import RosterRenderer
+
+
+def _order_key(entry: Entry) -> int:
+    """Sort key placing entries in descending initiative order"""
+    return -entry.initiative
+
+
+def _position_key(entry: Entry) -> tuple:
+    """Sort key of an entry's exact place in the initiative order"""
+    return -entry.initiative, entry.sequence
 
 
 class Initiative:
 
     """Class that tracks turn order, stats, and conditions"""
 
-    def __init__(self):
-        """Initializes an Initiative object"""
+    def __init__(self, seed: int = None):
+        """Initializes an Initiative object; seed makes its rolls reproducible"""
         self.roster = {}
+        self.dice = DiceRoller(seed)
+        # Entries sorted by initiative desc., ties kept in insertion order by
+        # their sequence numbers
+        self._order = []
+        # Next free copy number for each base name, e.g. 'goblin' -> 4
+        self._copy_counters = {}
+        # Roster names in sorted order, for lookups by name
+        self.names = NameIndex()
+        # Running totals of every entry family and tag
+        self.groups = Groups()
+        # Callables receiving a change record for every mutation
+        self.listeners = []
+        # Increases with every mutation; names changed since the last render,
+        # or None when the whole roster must be re-rendered
+        self.version = 0
+        self._dirty = set()
+        self._renderer = RosterRenderer()
+        # Number of sorts, render passes and rolls, for profiling sessions
+        self.counters = Counter()
+        # Current round, 0 before the first turn, and the index in the order
+        # of the entry whose turn it is, or None
+        self.round = 0
+        self._turn = None
+        # (anchor name, 'start' or 'end') -> heap of (round, sequence, entry,
+        # condition) for the conditions expiring at that point of the anchor's
+        # turn; conditions removed otherwise are skipped when popped
+        self._expiries = {}
+        # Source of the sequence numbers of entries and of expiry heap items
+        self._sequence = count()
+        # (entry name, condition name) of the conditions the last turn expired
+        self.expired = []
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __iter__(self):
+        """Iterates over the entries in initiative order"""
+        return iter(self._order)
+
+    def __note_name(self, name: str) -> None:
+        """Advances the copy counter of a numbered name's base name"""
+        base, number = split_name(name)
+        if number is not None and number >= self._copy_counters.get(base, 1):
+            self._copy_counters[base] = number + 1
+
+    def __forget_name(self, name: str) -> None:
+        """Frees a numbered name's copy number if it was the highest in use"""
+        base, number = split_name(name)
+        if number is not None and self._copy_counters.get(base) == number + 1:
+            self._copy_counters[base] = number
+
+    def __record(self, *change) -> None:
+        """Helper function to pass a change record to every listener"""
+        for listener in self.listeners:
+            listener(change)
+
+    def __touch(self, *names: str) -> None:
+        """Helper function to bump the version and mark entries for re-render"""
+        self.version += 1
+        if self._dirty is not None:
+            self._dirty.update(names)
+
+    def __locate(self, entry: Entry) -> int:
+        """Returns the index of an entry in the initiative order"""
+        idx = bisect_left(self._order, _position_key(entry), key=_position_key)
+        if idx < len(self._order) and self._order[idx] is entry:
+            return idx
+        raise ValueError(f"{entry.name} is not in the initiative order")
+
+    def __link_entry(self, entry: Entry) -> int:
+        """Inserts an entry into the initiative order, returning its index"""
+        # The entry goes after the entries it ties with
+        entry.sequence = next(self._sequence)
+        idx = bisect_right(self._order, -entry.initiative, key=_order_key)
+        self._order.insert(idx, entry)
+        # Keep the turn on the same entry
+        if self._turn is not None and idx <= self._turn:
+            self._turn += 1
+        return idx
+
+    def __schedule(self, entry: Entry, conditions) -> None:
+        """Helper function to queue the expiry of an entry's conditions"""
+        for condition in conditions:
+            if "anchor" in condition:
+                heap = self._expiries.setdefault(
+                    (condition["anchor"], condition["phase"]), []
+                )
+                heappush(
+                    heap, (condition["round"], next(self._sequence), entry, condition)
+                )
+
+    def __is_pending(self, entry: Entry, condition: dict) -> bool:
+        """Helper function to check a queued condition was not removed since"""
+        return self.roster.get(entry.name) is entry and condition in entry.conditions
+
+    def __insert_entry(self, entry: Entry) -> None:
+        """Adds an entry to the roster and to the initiative order"""
+        self.roster[entry.name] = entry
+        self.__note_name(entry.name)
+        self.names.add(entry.name)
+        self.groups.add(entry)
+        self.__link_entry(entry)
+        if entry.conditions:
+            self.__schedule(entry, entry.conditions)
+        self.__touch(entry.name)
+        if self.listeners:
+            self.__record("add", entry.to_dict())
+
+    def __insert_entries(self, entries: list) -> None:
+        """Adds many entries to the roster and merges them into the order at once"""
+        for entry in entries:
+            self.roster[entry.name] = entry
+            self.__note_name(entry.name)
+            self.groups.add(entry)
+            if entry.conditions:
+                self.__schedule(entry, entry.conditions)
+        self.names.update(entry.name for entry in entries)
+        current = self.current_turn()
+        run = sorted(entries, key=_order_key)
+        for entry in run:
+            entry.sequence = next(self._sequence)
+        # Timsort merges the existing run with the sorted new run in linear
+        # time; being stable, it keeps new entries after those they tie with
+        self._order.extend(run)
+        self._order.sort(key=_order_key)
+        self.counters["sorts"] += 1
+        if current is not None:
+            self._turn = self.__locate(current)
+        self.__touch(*(entry.name for entry in entries))
+        if self.listeners:
+            for entry in entries:
+                self.__record("add", entry.to_dict())
+
+    def __unlink_entry(self, entry: Entry) -> int:
+        """Removes an entry from the initiative order, returning its index"""
+        idx = self.__locate(entry)
+        del self._order[idx]
+        # Removing the current entry leaves the turn on the entry after it
+        if self._turn is not None and idx < self._turn:
+            self._turn -= 1
+        return idx
+
+    def __remove_entry(self, entry: Entry) -> None:
+        """Removes an entry from the roster and from the initiative order"""
+        self.__release_anchor(entry)
+        self.__unlink_entry(entry)
+        if self._turn is not None and self._turn >= len(self._order):
+            self._turn = 0 if self._order else None
+        del self.roster[entry.name]
+        self.__forget_name(entry.name)
+        self.names.discard(entry.name)
+        self.groups.remove(entry)
+        self.__touch(entry.name)
+        if self.listeners:
+            self.__record("remove", entry.to_dict())
+
+    def __set_attribute(self, entry: Entry, attribute: str, value) -> None:
+        """Sets an attribute of an entry, keeping the initiative order sorted"""
+        old_value = getattr(entry, attribute)
+        if attribute == "initiative":
+            # Changing initiative moves the entry within the order, and the
+            # turn moves along with the entry
+            is_current = entry is self.current_turn()
+            self.__unlink_entry(entry)
+            entry.initiative = value
+            idx = self.__link_entry(entry)
+            if is_current:
+                self._turn = idx
+        elif attribute == "conditions":
+            # Records read back from JSON hold lists
+            value = tuple(value)
+            entry.conditions = value
+            self.__schedule(entry, [c for c in value if c not in old_value])
+        elif attribute == "tags":
+            value = tuple(dict.fromkeys(value))
+            entry.tags = value
+        else:
+            setattr(entry, attribute, value)
+        self.groups.update(entry, attribute, old_value, value)
+        self.__touch(entry.name)
+        self.__record("set", entry.name, attribute, old_value, value)
+
+    def __rename(self, entry: Entry, new_key: str) -> None:
+        """Renames an entry and its roster key to new_key"""
+        if self.roster.get(new_key, entry) is not entry:
+            raise ValueError(f"an entry is already named {new_key}")
+        old_key = entry.name
+        del self.roster[old_key]
+        self.__forget_name(old_key)
+        self.names.discard(old_key)
+        self.groups.remove(entry)
+        entry.name = new_key
+        self.roster[new_key] = entry
+        self.__note_name(new_key)
+        self.names.add(new_key)
+        self.groups.add(entry)
+        self.__touch(old_key, new_key)
+        self.__move_anchor(old_key, new_key)
+        self.__record("rename", old_key, new_key)
+
+    def __move_anchor(self, old_key: str, new_key: str) -> None:
+        """Helper function to update conditions anchored to a renamed entry"""
+        for phase in ("start", "end"):
+            heap = self._expiries.pop((old_key, phase), None)
+            if heap is None:
+                continue
+            moved = []
+            for round_number, sequence, entry, condition in heap:
+                if not self.__is_pending(entry, condition):
+                    continue
+                renamed = {**condition, "anchor": new_key}
+                entry.conditions = tuple(
+                    renamed if other == condition else other
+                    for other in entry.conditions
+                )
+                self.__touch(entry.name)
+                moved.append((round_number, sequence, entry, renamed))
+            if moved:
+                heapify(moved)
+                self._expiries[(new_key, phase)] = moved
+
+    def __release_anchor(self, entry: Entry) -> None:
+        """Helper function to re-anchor the conditions of an entry's turn"""
+        pending = [
+            (target, condition)
+            for phase in ("start", "end")
+            for _, _, target, condition in self._expiries.pop((entry.name, phase), ())
+            if target is not entry and self.__is_pending(target, condition)
+        ]
+        if not pending:
+            return
+        # They expire when the entry after it starts its turn instead, which
+        # is in the next round if the entry was the last one
+        idx = self.__locate(entry) + 1
+        wrapped = idx == len(self._order)
+        successor = self._order[0 if wrapped else idx]
+        for target, condition in pending:
+            moved = {
+                **condition,
+                "anchor": successor.name,
+                "phase": "start",
+                "round": condition["round"] + wrapped,
+            }
+            conditions = tuple(
+                moved if other == condition else other for other in target.conditions
+            )
+            self.__set_attribute(target, "conditions", conditions)
+
+    def __reindex(self, turn: dict) -> None:
+        """
+        Rebuilds the initiative order and copy counters from the roster
+
+        turn holds the round and current entry name to restore, if any.
+        """
+        self._order = sorted(self.roster.values(), key=_order_key)
+        for entry in self._order:
+            entry.sequence = next(self._sequence)
+        self.counters["sorts"] += 1
+        self.names = NameIndex(self.roster)
+        self.groups = Groups(self._order)
+        self.round = turn.get("round", 0)
+        current = self.roster.get(turn.get("name"))
+        self._turn = None if current is None else self.__locate(current)
+        self._expiries = {}
+        for entry in self._order:
+            if entry.conditions:
+                self.__schedule(entry, entry.conditions)
+        self._copy_counters = {}
+        for name in self.roster:
+            self.__note_name(name)
+        # The whole roster was replaced rather than changed
+        self.version += 1
+        self._dirty = None
+        self.__record("load")
+
+    def __set_turn(self, index: int, round_number: int) -> None:
+        """Helper function to move the turn to the entry at index"""
+        old = self.current_turn()
+        old_round = self.round
+        self._turn = index
+        self.round = round_number
+        new = self.current_turn()
+        self.__touch()
+        self.__record(
+            "turn",
+            old.name if old is not None else None,
+            old_round,
+            new.name if new is not None else None,
+            round_number,
+        )
+
+    def __turn_index(self, name: str) -> int:
+        """Helper function to find the index of a turn record's entry"""
+        return None if name is None else self.__locate(self.roster[name])
+
+    def apply_change(self, change) -> None:
+        """
+        Applies a change record, as passed to listeners, to the roster
+
+        Records are ('add', entry_dict), ('remove', entry_dict),
+        ('set', name, attribute, old, new), ('rename', old_name, new_name) or
+        ('turn', old_name, old_round, new_name, new_round); any sequence of
+        that shape is accepted, so records read back from JSON apply as well.
+        """
+        op = change[0]
+        if op == "add":
+            self.__insert_entry(Entry.from_dict(change[1]))
+        elif op == "remove":
+            self.__remove_entry(self.roster[change[1]["name"]])
+        elif op == "set":
+            _, name, attribute, _, value = change
+            self.__set_attribute(self.roster[name], attribute, value)
+        elif op == "rename":
+            _, old_key, new_key = change
+            self.__rename(self.roster[old_key], new_key)
+        elif op == "turn":
+            _, _, _, name, round_number = change
+            self.__set_turn(self.__turn_index(name), round_number)
+        else:
+            raise ValueError(f"cannot apply change record {op!r}")
+
+    def revert_change(self, change) -> None:
+        """Undoes a change record by applying its inverse to the roster"""
+        op = change[0]
+        if op == "add":
+            self.__remove_entry(self.roster[change[1]["name"]])
+        elif op == "remove":
+            self.__insert_entry(Entry.from_dict(change[1]))
+        elif op == "set":
+            _, name, attribute, value, _ = change
+            self.__set_attribute(self.roster[name], attribute, value)
+        elif op == "rename":
+            _, old_key, new_key = change
+            self.__rename(self.roster[new_key], old_key)
+        elif op == "turn":
+            _, name, round_number, _, _ = change
+            self.__set_turn(self.__turn_index(name), round_number)
+        else:
+            raise ValueError(f"cannot revert change record {op!r}")
 
     def toggle_hidden(self, index: int) -> None:
         """Toggles the hidden attribute on the given entry"""
-        self.get_entry_at_index(index).toggle_hidden()
+        entry = self.get_entry_at_index(index)
+        self.__set_attribute(entry, "hidden", not entry.hidden)
 
     def rename_entry(self, index: int, new_key: str) -> None:
-        """Renames an entry and its name attribute to new_key"""
-        self.roster[new_key] = self.roster.pop(self.get_entry_at_index(index).name)
-        self.modify_index(index, "name", new_key)
+        """
+        Renames an entry and its name attribute to new_key
+
+        Raises a ValueError if another entry is already called new_key.
+        """
+        self.__rename(self.get_entry_at_index(index), new_key)
 
-    # TODO: Put in its own class?
     def roll(
         self, die: int = 20, count: int = 1, modifier: int = 0, advantage: bool = False
     ) -> int:
         """Rolls a number of dice according to the given schema"""
-        rolls = []
-        for _ in range(0, count):
-            if advantage:
-                roll = max(randint(1, die), randint(1, die))
-            else:
-                roll = randint(1, die)
-            rolls.append(roll)
+        self.counters["rolls"] += 1
+        return self.dice.roll(DiceExpression.simple(die, count, modifier, advantage))
 
-        return sum(rolls) + modifier
+    def __unknown_name(self, name: str) -> str:
+        """Helper function to describe a name that matches no entry"""
+        message = f"no entry is named {name}"
+        suggestions = self.names.similar(name)
+        if suggestions:
+            message += f" (did you mean {', '.join(suggestions)}?)"
+        return message
 
-    def get_entry_at_index(self, index: int) -> None:
+    def index_of(self, name: str) -> int:
+        """Returns the index of the entry named name in the initiative order"""
+        if name not in self.roster:
+            raise ValueError(self.__unknown_name(name))
+        return self.__locate(self.roster[name])
+
+    def lookup(self, name: str) -> Entry:
+        """
+        Returns the entry called name
+
+        name may also be a glob or the start of a name, as long as it matches
+        a single entry. Raises a ValueError suggesting close names otherwise.
+        """
+        if name in self.roster:
+            return self.roster[name]
+        matches = self.names.glob(name) or self.names.prefix(name)
+        if len(matches) == 1:
+            return self.roster[matches[0]]
+        if matches:
+            shown = ", ".join(matches[:5]) + (", ..." if len(matches) > 5 else "")
+            raise ValueError(f"{name} matches {len(matches)} entries: {shown}")
+        raise ValueError(self.__unknown_name(name))
+
+    def get_entry_at_index(self, index: int) -> Entry:
         """Returns the Entity object at the specified index from the roster"""
-        return self.__get_sorted_roster()[index]
+        return self._order[index]
+
+    def current_turn(self) -> Entry:
+        """Returns the entry whose turn it is, or None before the first turn"""
+        return None if self._turn is None else self._order[self._turn]
+
+    def turn_state(self) -> dict:
+        """
+        Returns the round and the name of the current entry, for saving
+
+        The name is None if the turn was cleared; before the first turn there
+        is nothing to save and None is returned.
+        """
+        if not self.round:
+            return None
+        current = self.current_turn()
+        return {"round": self.round, "name": current.name if current else None}
+
+    def __expire(self, anchor: Entry, phase: str) -> None:
+        """Helper function to remove the conditions due at an anchor's turn"""
+        heap = self._expiries.get((anchor.name, phase))
+        while heap and heap[0][0] <= self.round:
+            _, _, entry, condition = heappop(heap)
+            if not self.__is_pending(entry, condition):
+                continue
+            remaining = tuple(other for other in entry.conditions if other != condition)
+            self.__set_attribute(entry, "conditions", remaining)
+            self.expired.append((entry.name, condition["name"]))
+        if heap == []:
+            del self._expiries[(anchor.name, phase)]
+
+    def next_turn(self) -> Entry:
+        """
+        Passes the turn to the next entry, starting a new round at the top
+
+        Conditions expiring at the end of the current entry's turn or at the
+        start of the next entry's turn are removed; self.expired lists them.
+        """
+        if not self._order:
+            raise ValueError("the roster is empty")
+        self.expired = []
+        if self._turn is not None:
+            self.__expire(self._order[self._turn], "end")
+        if self._turn is None:
+            self.__set_turn(0, self.round + 1)
+        elif self._turn + 1 < len(self._order):
+            self.__set_turn(self._turn + 1, self.round)
+        else:
+            self.__set_turn(0, self.round + 1)
+        self.__expire(self._order[self._turn], "start")
+        return self.current_turn()
+
+    def previous_turn(self) -> Entry:
+        """Passes the turn back to the previous entry"""
+        if self._turn is None:
+            raise ValueError("the encounter has not started")
+        if self._turn > 0:
+            self.__set_turn(self._turn - 1, self.round)
+        elif self.round > 1:
+            self.__set_turn(len(self._order) - 1, self.round - 1)
+        else:
+            raise ValueError("already at the first turn")
+        return self.current_turn()
+
+    def delay_turn(self, initiative: int) -> Entry:
+        """
+        Moves the current entry to a new initiative, passing the turn on
+
+        The turn goes to the entry that came after the current one, and the
+        delayed entry acts again when its new place in the order comes up.
+        Returns the entry whose turn it now is.
+        """
+        entry = self.current_turn()
+        if entry is None:
+            raise ValueError("the encounter has not started")
+        if len(self._order) > 1:
+            self.next_turn()
+        self.__set_attribute(entry, "initiative", initiative)
+        return self.current_turn()
+
+    def ready_turn(self, index: int) -> Entry:
+        """
+        Moves the current entry to act right after the entry at index
+
+        This is delay_turn() with the initiative of the triggering entry, so
+        the readied entry follows it and any entries tied with it.
+        """
+        trigger = self.get_entry_at_index(index)
+        if trigger is self.current_turn():
+            raise ValueError("an entry cannot ready an action on itself")
+        return self.delay_turn(trigger.initiative)
+
+    def remove_entry(self, index: int) -> None:
+        """Removes the entry at index; if it is its turn, the turn passes on"""
+        entry = self.get_entry_at_index(index)
+        if entry is self.current_turn():
+            if len(self._order) > 1:
+                self.next_turn()
+            else:
+                self.__set_turn(None, self.round)
+        self.__remove_entry(entry)
+
+    def __next_turn_round(self, entry: Entry) -> int:
+        """Helper function to find the round of an entry's next turn"""
+        if self._turn is None:
+            return self.round + 1
+        if self.__locate(entry) > self._turn:
+            return self.round
+        return self.round + 1
+
+    def add_condition(
+        self,
+        targets,
+        name: str,
+        rounds: int = None,
+        anchor: int = None,
+        phase: str = "end",
+    ) -> int:
+        """
+        Puts a condition on every entry selected by targets
+
+        Without rounds or anchor the condition lasts until removed. With
+        rounds it expires once that many rounds passed, at the start of the
+        turn of the entry whose turn it is (or of each target, before the
+        first turn). With anchor, the index of an entry, it expires at the
+        phase ('start' or 'end') of that entry's next turn. A condition
+        replaces any condition of the same name. Returns the number of
+        entries changed; targets is as in select_entries().
+        """
+        if phase not in ("start", "end"):
+            raise ValueError(f"{phase} is not 'start' or 'end'")
+        entries = self.select_entries(targets)
+        if anchor is not None:
+            anchor_entry = self.get_entry_at_index(anchor)
+            expiry = {
+                "anchor": anchor_entry.name,
+                "phase": phase,
+                "round": self.__next_turn_round(anchor_entry),
+            }
+        elif rounds is not None:
+            if rounds < 1:
+                raise ValueError("a condition must last at least one round")
+            holder = self.current_turn()
+            expiry = {
+                "anchor": holder.name if holder is not None else None,
+                "phase": "start",
+                "round": max(self.round, 1) + rounds,
+            }
+        else:
+            expiry = {}
+        for entry in entries:
+            condition = {"name": name, **expiry}
+            if condition.get("anchor", "") is None:
+                condition["anchor"] = entry.name
+            conditions = tuple(
+                other for other in entry.conditions if other["name"] != name
+            )
+            self.__set_attribute(entry, "conditions", conditions + (condition,))
+        return len(entries)
+
+    def remove_condition(self, targets, name: str) -> int:
+        """Removes a condition from the entries selected by targets that have it"""
+        changed = 0
+        for entry in self.select_entries(targets):
+            conditions = tuple(
+                other for other in entry.conditions if other["name"] != name
+            )
+            if len(conditions) != len(entry.conditions):
+                self.__set_attribute(entry, "conditions", conditions)
+                changed += 1
+        return changed
+
+    def tag_entries(self, targets, tag: str) -> int:
+        """Adds a tag to the entries selected by targets that lack it"""
+        if not tag or tag.startswith("#") or any(char.isspace() for char in tag):
+            raise ValueError(f"{tag!r} is not a valid tag (one word, no leading #)")
+        changed = 0
+        for entry in self.select_entries(targets):
+            if tag not in entry.tags:
+                self.__set_attribute(entry, "tags", entry.tags + (tag,))
+                changed += 1
+        return changed
+
+    def untag_entries(self, targets, tag: str) -> int:
+        """Removes a tag from the entries selected by targets that have it"""
+        changed = 0
+        for entry in self.select_entries(targets):
+            if tag in entry.tags:
+                tags = tuple(other for other in entry.tags if other != tag)
+                self.__set_attribute(entry, "tags", tags)
+                changed += 1
+        return changed
+
+    def group(self, key: str):
+        """
+        Returns the running totals of a group of entries
+
+        key is a base name such as 'goblin', for the family of every 'goblin
+        N', or a tag prefixed with '#'.
+        """
+        if key.startswith("#"):
+            group = self.groups.tags.get(key[1:])
+        else:
+            group = self.groups.families.get(key)
+        if group is None:
+            raise ValueError(f"no group is called {key}")
+        return group
 
     def damage(self, index: int, amount: int) -> None:
         """Damage the entity at index by amount"""
-        self.get_entry_at_index(index).damage(amount)
+        self.heal(index, -amount)
 
     def heal(self, index: int, amount: int) -> None:
         """Heal the entity at index by amount"""
-        self.get_entry_at_index(index).heal(amount)
+        entry = self.get_entry_at_index(index)
+        self.__set_attribute(entry, "hp", entry.hp + amount)
+
+    def select_entries(self, targets) -> list:
+        """
+        Returns the entries matched by targets, in initiative order for globs
+        and predicates
+
+        targets may be an iterable of indexes (such as a range), a name glob
+        like 'goblin *', a tag prefixed with '#' or a predicate called with
+        each Entry.
+        """
+        if isinstance(targets, str) and targets.startswith("#"):
+            return sorted(self.group(targets), key=_position_key)
+        if isinstance(targets, str):
+            # The name index narrows globs down without scanning the roster
+            entries = [self.roster[name] for name in self.names.glob(targets)]
+            return sorted(entries, key=_position_key)
+        if callable(targets):
+            return [entry for entry in self._order if targets(entry)]
+        entries = []
+        for index in targets:
+            if not 0 <= index < len(self._order):
+                raise IndexError(f"index {index} is out of range")
+            entries.append(self._order[index])
+        return entries
 
-    def __get_sorted_roster(self):
-        """Returns the roster as a list, sorted by initiative value desc."""
-        # TODO: Maintain internally for efficiency
-        return sorted(self.roster.values(), key=lambda x: x.initiative, reverse=True)
+    def apply_hp_batch(self, targets, amounts) -> int:
+        """
+        Applies HP changes to every entry selected by targets in a single pass
+
+        amounts is either one amount applied to every target or a sequence
+        holding one amount per target, in target order. Positive amounts heal
+        and negative amounts damage. Returns the number of entries changed.
+        """
+        entries = self.select_entries(targets)
+        if isinstance(amounts, int):
+            amounts = repeat(amounts, len(entries))
+        elif len(amounts) != len(entries):
+            raise ValueError(
+                f"{len(amounts)} amounts given for {len(entries)} target entries"
+            )
+        for entry, amount in zip(entries, amounts):
+            self.__set_attribute(entry, "hp", entry.hp + amount)
+        return len(entries)
 
     def modify_index(self, index: int, attribute: int, value: int) -> None:
         """Modifies the entry at index's attribute to the specified value"""
-        setattr(self.get_entry_at_index(index), attribute, value)
+        entry = self.get_entry_at_index(index)
+        if attribute == "name":
+            self.__rename(entry, value)
+        else:
+            self.__set_attribute(entry, attribute, value)
 
     def copy_index(self, index: int, amount: int) -> None:
         """Copies the entry at the given index amount number of times"""
-        entry = self.get_entry_at_index(index).name
-
-        # If name does not end with a number, rename it to 'name 1'
-        if not entry.split()[-1].isnumeric():
-            self.rename_entry(index, f"{entry} 1")
-            entry = f"{entry} 1"
-        # Count the number of entities with the same name
-        existing_copies = sum(
-            1 for n in self.roster.keys() if n.split()[:-1] == entry.split()[:-1]
-        )
+        source = self.get_entry_at_index(index)
+        base, number = split_name(source.name)
+
+        # If name does not end with a number, give it the next free one
+        if number is None:
+            self.rename_entry(index, f"{base} {self._copy_counters.get(base, 1)}")
+        first_copy = self._copy_counters[base]
+        # If initiative bonus is not 0, reroll initiative using that bonus
+        if source.init_bonus:
+            roll = DiceExpression.simple(modifier=source.init_bonus)
+            rolls = self.dice.roll_many(roll, amount)
+            self.counters["rolls"] += amount
+        else:
+            rolls = [source.initiative] * amount
         # Create amount number of copies of the specified entry
-        for _ in range(amount):
-            new_entry = f"{' '.join(entry.split()[:-1])} {existing_copies + 1}"
-            self.roster[new_entry] = deepcopy(self.roster[entry])
-            self.roster[new_entry].name = new_entry
-            # If initiative bonus is not 0, reroll initiative using that bonus
-            if self.roster[new_entry].init_bonus:
-                self.roster[new_entry].initiative = self.roll(
-                    modifier=self.roster[new_entry].init_bonus
-                )
-            existing_copies += 1
-
-    def __get_hp_ws(self, hp: int, hp_max: int) -> str:
-        """Helper function to right justify the whitespace for '(hp)'"""
-        max_hp_entry = max(self.roster.values(), key=lambda x: x.hp + x.hp_max)
-        max_hp_entry_len = strlen(max_hp_entry.hp) + strlen(max_hp_entry.hp_max)
-        return f"{' ' * (max_hp_entry_len - strlen(hp) - strlen(hp_max))}"
-
-    def __get_name_ws(self, name: str) -> str:
-        """Helper function to right justify the whitespace for 'name'"""
-        max_name_len = len(max(self.roster.keys(), key=strlen))
-        return f"{' ' * (max_name_len - len(name))}"
-
-    def __get_init_ws(self, max_init_entry, current_entry: Entry) -> str:
-        """Helper function to right justify the whitespace for '[init]'"""
-        max_init_len = strlen(max_init_entry.initiative)
-        cur_init_len = strlen(current_entry.initiative)
-        return f"{' ' * (max_init_len - cur_init_len)}"
-
-    def __get_idx_ws(self, idx: int) -> str:
-        """Helper function to right justify the whitespace for 'idx.'"""
-        return f"{' ' * (strlen(len(self.roster)) - strlen(idx))}"
-
-    def print_roster(self, with_hidden: bool = False) -> None:
-        """Prints the roster without hidden information shown"""
-        # TODO: return str instead of printing to terminal directly
-        # Iterate through a sorted version of the roster
-
-        sorted_roster = self.__get_sorted_roster()
-        for idx, entry in enumerate(sorted_roster, start=1):
-            # Printing without hidden info displays only indexes for shown entries
-            if not with_hidden:
-                idx = sum(1 for n in sorted_roster[:idx] if not n.hidden)
-            # Calling helper functions for variable whitespace calculation
-            idx_ws = self.__get_idx_ws(idx)
-            init_ws = self.__get_init_ws(sorted_roster[0], entry)
-            name_ws = self.__get_name_ws(entry.name)
-            hp_ws = self.__get_hp_ws(entry.hp, entry.hp_max)
-            # Set defaults for variable string fields
-            entry_string = (
-                f"{idx_ws}{idx}. {init_ws}[{entry.initiative}] {name_ws}{entry.name}"
+        copies = [
+            source.copy(f"{base} {copy_number}")
+            for copy_number in range(first_copy, first_copy + amount)
+        ]
+        for new_entry, initiative in zip(copies, rolls):
+            new_entry.initiative = initiative
+        self.__insert_entries(copies)
+
+    def spawn(self, template: dict, amount: int, hidden: bool = False) -> list:
+        """
+        Adds amount numbered entries built from a bestiary template
+
+        Initiatives are rolled from the template's init_bonus and, when its hp
+        is a dice expression such as '2d6+2', hit points as well, each in one
+        batch. Returns the new entries.
+        """
+        if amount < 1:
+            raise ValueError(f"cannot spawn {amount} entries")
+        try:
+            base = template["name"]
+            ac = int(template.get("ac", 0))
+            init_bonus = int(template.get("init_bonus", 0))
+            hp = template.get("hp", 0)
+            if not isinstance(hp, str):
+                hp = int(hp)
+            hidden = hidden or bool(template.get("hidden", False))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"invalid template {template!r}: {e}") from e
+        rolls = self.dice.roll_many(DiceExpression.simple(modifier=init_bonus), amount)
+        self.counters["rolls"] += amount
+        if isinstance(hp, str):
+            hit_points = self.dice.roll_many(DiceExpression.parse(hp), amount)
+            self.counters["rolls"] += amount
+        else:
+            hit_points = repeat(hp, amount)
+        first = self._copy_counters.get(base, 1)
+        entries = [
+            Entry(
+                f"{base} {number}",
+                initiative=initiative,
+                init_bonus=init_bonus,
+                ac=ac,
+                hp_max=max(entry_hp, 1) if hp else 0,
+                hp=max(entry_hp, 1) if hp else 0,
+                hidden=hidden,
             )
-            hp_string = ""
-            ac_string = ""
-            # Only print HP/AC values if not None
-            if entry.hp_max != 0:
-                hp_string = f"{hp_ws}({entry.hp}/{entry.hp_max} HP)"
-                # Colorize health output
-                percentage_hp = (
-                    int(entry.hp) / int(entry.hp_max) * 100
-                )  # TODO: add try/catch here
-
-                if percentage_hp > 100:
-                    hp_string = colored(hp_string, "light_blue")
-                elif percentage_hp > 80:
-                    hp_string = colored(hp_string, "light_green")
-                elif percentage_hp > 50:
-                    hp_string = colored(hp_string, "light_yellow")
-                elif percentage_hp > 0:
-                    hp_string = colored(hp_string, "light_red")
-                else:
-                    hp_string = colored(hp_string, "red", attrs=["blink"])
-            if entry.ac != 0:
-                ac_string = f"(AC: {entry.ac})"
-            # Combine substrings and print
-            if with_hidden:
-                # Hidden information includes hidden entries in the initiative
-                # as well as the HP and AC values of all creatures
-                print(f"{entry_string} {hp_string} {ac_string}")
-            else:
-                if not entry.hidden:
-                    print(f"{entry_string}")
-
-    def hprint_roster(self) -> None:
-        """Prints the roster with hidden information shown"""
-        self.print_roster(True)
-
-    def import_file(self, path: str) -> None:
-        """Imports a json-formatted file as initiative data"""
-        with open(path, "r") as fo:
-            data = json.load(fo)
-            self.roster = {
-                name: Entry.from_dict(entry_data) for name, entry_data in data.items()
-            }
+            for number, initiative, entry_hp in zip(
+                range(first, first + amount), rolls, hit_points
+            )
+        ]
+        self.__insert_entries(entries)
+        return entries
+
+    def print_roster(self, with_hidden: bool = False, collapse: bool = False) -> str:
+        """
+        Returns the roster without hidden information shown as printable text
+
+        With collapse, every family of two or more shown entries, such as
+        'goblin 1' to 'goblin 40', takes a single row at its first member's
+        position, showing the family's size and total HP from its running
+        totals.
+        """
+        self.counters["renders"] += 1
+        if collapse:
+            return self.__print_collapsed(with_hidden)
+        dirty, self._dirty = self._dirty, set()
+        return self._renderer.render(
+            self._order, self.roster, self.version, dirty, with_hidden, self._turn
+        )
+
+    def __print_collapsed(self, with_hidden: bool) -> str:
+        """Helper function to render the roster with one row per family"""
+        current = self.current_turn()
+        # Members of a collapsed family mark the family's row instead
+        marker = current
+        rows = []
+        collapsed = {}
+        visible_idx = 0
+        for position, entry in enumerate(self._order):
+            idx = position + 1
+            if not with_hidden:
+                if entry.hidden:
+                    continue
+                visible_idx += 1
+                idx = visible_idx
+            base = split_name(entry.name)[0]
+            group = self.groups.families[base]
+            shown = group.count if with_hidden else group.visible
+            if shown < 2:
+                rows.append((idx, entry))
+                continue
+            row = collapsed.get(base)
+            if row is None:
+                name = f"{base} x{shown}"
+                if with_hidden:
+                    name += f" ({group.alive} up)"
+                row = Entry(name, entry.initiative, hp_max=group.hp_max, hp=group.hp)
+                collapsed[base] = row
+                rows.append((idx, row))
+            if entry is current:
+                marker = row
+        return "".join(self._renderer.render_part(rows, with_hidden, marker))
+
+    def hprint_roster(self) -> str:
+        """Returns the roster with hidden information shown as printable text"""
+        return self.print_roster(True)
+
+    def iter_roster(self, start: int = 0, stop: int = None, with_hidden=False):
+        """
+        Yields the lines of rows start to stop (0-based) of the roster
+
+        Rows are numbered and rendered as by print_roster(), with column
+        widths fitted to the rows shown. With hidden information shown this
+        slices the initiative order, costing only the number of rows shown;
+        the player view skips hidden entries, so it also walks the entries
+        before start.
+        """
+        if with_hidden:
+            entries = self._order[start:stop]
+        else:
+            visible = (entry for entry in self._order if not entry.hidden)
+            entries = islice(visible, start, stop)
+        return self._renderer.render_part(
+            enumerate(entries, start + 1), with_hidden, self.current_turn()
+        )
+
+    def turn_row(self, with_hidden: bool = False) -> int:
+        """Returns the 0-based row of the current turn in a view, 0 before it"""
+        if self._turn is None:
+            return 0
+        if with_hidden:
+            return self._turn
+        return sum(not entry.hidden for entry in islice(self._order, self._turn))
+
+    def import_file(self, path: str, fmt: str = None) -> None:
+        """
+        Imports a roster file as initiative data
+
+        fmt is one of formats.FORMATS; by default it is picked from the file
+        extension, and JSON Lines files are parsed one entry at a time. The
+        round and current turn are restored if the file holds them.
+
+        Every format is loaded in full, snapshots included: the order, name
+        index and group totals need every row, so importing takes time linear
+        in the roster size. Use snapshot.Snapshot to read rows lazily instead.
+        """
+        reader = formats.READERS[formats.detect_format(path, fmt)]
+        turn = {}
+        self.roster = {entry.name: entry for entry in reader(path, turn)}
+        self.__reindex(turn)
+
+    def export_file(self, path: str, fmt: str = None) -> None:
+        """
+        Exports the current initiative data to a file, in initiative order
 
-    def export_file(self, path: str) -> None:
-        """Exports the current initiative data to a file"""
-        serializable_roster = {
-            name: entry.to_dict() for name, entry in self.roster.items()
-        }
-        with open(path, "w") as fo:
-            json.dump(serializable_roster, fo, indent=2)
+        Once the encounter started, the round and current turn are saved too.
+        """
+        writer = formats.WRITERS[formats.detect_format(path, fmt)]
+        writer(path, self._order, self.turn_state())
 
     def add_to_initiative(
         self,
@@ -191,7 +882,7 @@ class Initiative:
         if self.roster.get(name, False):
             return False
         # Create roster entry object
-        self.roster[name] = Entry(
+        entry = Entry(
             name,
             ac=int(ac),
             hp_max=int(hp_max),
@@ -200,10 +891,11 @@ class Initiative:
         )
         # '+/-' indicates an initiative bonus and will be rolled automagically
         if initiative.startswith("+") or initiative.startswith("-"):
-            self.roster[name].init_bonus = int(initiative)
-            self.roster[name].initiative = self.roll(modifier=int(initiative))
+            entry.init_bonus = int(initiative)
+            entry.initiative = self.roll(modifier=int(initiative))
         # Otherwise initiative is considered explicit and will be set
         else:
-            self.roster[name].initiative = int(initiative)
+            entry.initiative = int(initiative)
+        self.__insert_entry(entry)
 
         return True
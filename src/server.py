@@ -0,0 +1,165 @@
+"""Implements an asyncio server that pushes the player view to viewers"""
+import asyncio
+import json
+import threading
+
+# Viewers that fall this many bytes behind are disconnected
+MAX_BACKLOG = 1 << 20
+
+
+def _encode(message: dict) -> bytes:
+    """Encodes a message as one JSON line"""
+    return f"{json.dumps(message)}\n".encode()
+
+
+class PlayerViewServer:
+
+    """
+    Serves the player view of a roster over TCP, one JSON message per line
+
+    A viewer first receives {"type": "reset", "rows": [...]} holding every
+    row of the view, the same rows as Initiative.print_roster(). After every
+    command that changed the view it receives
+    {"type": "diff", "length": N, "rows": {"INDEX": "ROW", ...}} holding only
+    the rows that changed, with the view truncated to N rows. The event loop
+    runs in a background thread so viewers never block the command loop.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Initializes a server; port 0 picks a free port once started"""
+        self.host = host
+        self.port = port
+        self.clients = set()
+        self._rows = []
+        self._changed = True
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    def attach(self, initiative) -> None:
+        """Tracks changes to initiative and renders its current view"""
+        initiative.listeners.append(self.record)
+        self.publish(initiative)
+
+    def detach(self, initiative) -> None:
+        """Stops tracking initiative, so another roster can be attached"""
+        initiative.listeners.remove(self.record)
+        # Whatever gets attached next has to be rendered from scratch
+        self._changed = True
+
+    def record(self, change: tuple) -> None:
+        """Notes that the roster changed since the last publish"""
+        self._changed = True
+
+    def start(self) -> None:
+        """Starts serving in a background thread"""
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self.__serve_client, self.host, self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self) -> None:
+        """Disconnects every viewer and stops the background thread"""
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            for writer in list(self.clients):
+                writer.close()
+            await self._server.wait_closed()
+            self._loop.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def publish(self, initiative) -> None:
+        """Sends the rows of the player view that changed to every viewer"""
+        if not self._changed:
+            return
+        self._changed = False
+        rows = initiative.print_roster().splitlines()
+        changed = {
+            idx: row
+            for idx, row in enumerate(rows)
+            if idx >= len(self._rows) or self._rows[idx] != row
+        }
+        if not changed and len(rows) == len(self._rows):
+            return
+        # Rows are replaced rather than mutated, so viewers connecting from
+        # the loop thread always see a complete view
+        self._rows = rows
+        if self._loop is not None:
+            message = _encode({"type": "diff", "length": len(rows), "rows": changed})
+            self._loop.call_soon_threadsafe(self.__broadcast, message)
+
+    def __broadcast(self, message: bytes) -> None:
+        """Writes a message to every viewer, dropping those too far behind"""
+        for writer in list(self.clients):
+            if writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+                self.clients.discard(writer)
+                writer.close()
+                continue
+            writer.write(message)
+
+    async def __serve_client(self, reader, writer) -> None:
+        """Sends a new viewer the whole view, then keeps it until it leaves"""
+        self.clients.add(writer)
+        writer.write(_encode({"type": "reset", "rows": self._rows}))
+        try:
+            # Viewers send nothing; an empty read means they disconnected
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+
+class PlayerViewClient:
+
+    """Mirrors the player view served by a PlayerViewServer"""
+
+    def __init__(self) -> None:
+        self.rows = []
+
+    def apply(self, message: dict) -> None:
+        """Applies a reset or diff message to the mirrored rows"""
+        if message["type"] == "reset":
+            self.rows = list(message["rows"])
+            return
+        del self.rows[message["length"] :]
+        self.rows.extend([""] * (message["length"] - len(self.rows)))
+        for idx, row in message["rows"].items():
+            self.rows[int(idx)] = row
+
+    async def watch(self, host: str, port: int):
+        """Yields the mirrored rows after every message from the server"""
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while line := await reader.readline():
+                self.apply(json.loads(line))
+                yield self.rows
+        finally:
+            writer.close()
+
+
+async def watch(host: str, port: int) -> None:
+    """Prints the player view served at host:port every time it changes"""
+    async for rows in PlayerViewClient().watch(host, port):
+        print("Initiative order\n________________")
+        print("\n".join(rows))
@@ -0,0 +1,246 @@
+"""Implements a roster published in shared memory for viewer processes"""
+import struct
+import time
+
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+from src.entry import Entry
+from src.render import RosterRenderer
+from src.snapshot import COLUMNS
+
+# magic, sequence, entry capacity, name area size, entry count, name bytes
+# used, turn index (-1 before the first turn), round, closed flag
+HEADER = struct.Struct("<8sQIIIIiiI4x")
+MAGIC = b"INITSHM1"
+SEQUENCE = struct.Struct("<Q")
+SEQUENCE_OFFSET = 8
+# Name area bytes reserved per entry of capacity
+NAME_BYTES = 64
+POLL_INTERVAL = 0.1
+
+
+def _layout(capacity: int, name_capacity: int) -> tuple:
+    """Returns the offsets of the columns, hidden flags, name ends and names"""
+    offset = HEADER.size
+    columns = []
+    for _ in COLUMNS:
+        columns.append(offset)
+        offset += 4 * capacity
+    hidden = offset
+    name_ends = hidden + capacity
+    names = name_ends + 4 * (capacity + 1)
+    return columns, hidden, name_ends, names, names + name_capacity
+
+
+class SharedRoster:
+
+    """
+    Writes the roster of an Initiative to a named shared memory segment
+
+    The segment holds a header, one int32 column per numeric attribute, a
+    hidden flag per entry, the end offset of every name and a name area,
+    all sized for capacity entries up front. Writes are guarded by a seqlock:
+    the sequence number is odd while a write is in progress, so readers
+    retry until they read the same even number before and after copying.
+    Conditions are not shared, as the player view does not show them.
+    """
+
+    def __init__(self, name: str = "initiative", capacity: int = 4096) -> None:
+        self.capacity = capacity
+        self.name_capacity = capacity * NAME_BYTES
+        *_, size = _layout(capacity, self.name_capacity)
+        self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        self.name = self.shm.name
+        self._sequence = 0
+        self._changed = True
+        self.__write_header(0, 0, -1, 0)
+
+    def __write_header(
+        self, count: int, names_used: int, turn: int, round: int, closed: int = 0
+    ) -> None:
+        """Helper function to write every header field but the sequence"""
+        HEADER.pack_into(
+            self.shm.buf,
+            0,
+            MAGIC,
+            self._sequence,
+            self.capacity,
+            self.name_capacity,
+            count,
+            names_used,
+            turn,
+            round,
+            closed,
+        )
+
+    def __bump_sequence(self) -> None:
+        """Helper function to enter or leave a write"""
+        self._sequence += 1
+        SEQUENCE.pack_into(self.shm.buf, SEQUENCE_OFFSET, self._sequence)
+
+    def attach(self, initiative) -> None:
+        """Tracks changes to initiative, written by the next publish"""
+        initiative.listeners.append(self.record)
+        self._changed = True
+
+    def detach(self, initiative) -> None:
+        """Stops tracking initiative, so another roster can be attached"""
+        initiative.listeners.remove(self.record)
+        self._changed = True
+
+    def record(self, change: tuple) -> None:
+        """Notes that the roster changed since the last publish"""
+        self._changed = True
+
+    def publish(self, initiative) -> None:
+        """Writes the roster to shared memory if it changed since last time"""
+        if not self._changed:
+            return
+        entries = list(initiative)
+        if len(entries) > self.capacity:
+            raise ValueError(
+                f"the shared roster holds at most {self.capacity} entries"
+            )
+        names = [entry.name.encode() for entry in entries]
+        name_ends = array("I", [0])
+        for name in names:
+            name_ends.append(name_ends[-1] + len(name))
+        if name_ends[-1] > self.name_capacity:
+            raise ValueError(
+                f"the shared roster holds at most {self.name_capacity} bytes of names"
+            )
+        try:
+            columns = [
+                array("i", [getattr(entry, column) for entry in entries])
+                for column in COLUMNS
+            ]
+        except OverflowError as e:
+            raise ValueError(f"shared roster columns hold 32-bit integers: {e}") from e
+        self._changed = False
+
+        count = len(entries)
+        offsets, hidden, ends_offset, names_offset, _ = _layout(
+            self.capacity, self.name_capacity
+        )
+        buf = self.shm.buf
+        self.__bump_sequence()
+        for offset, column in zip(offsets, columns):
+            buf[offset : offset + 4 * count] = column.tobytes()
+        buf[hidden : hidden + count] = bytes(entry.hidden for entry in entries)
+        buf[ends_offset : ends_offset + 4 * (count + 1)] = name_ends.tobytes()
+        buf[names_offset : names_offset + name_ends[-1]] = b"".join(names)
+        turn = -1 if initiative.current_turn() is None else initiative.turn_row(True)
+        self.__write_header(count, name_ends[-1], turn, initiative.round)
+        self.__bump_sequence()
+
+    def close(self) -> None:
+        """Tells viewers the roster is gone and removes the segment"""
+        self.__bump_sequence()
+        self.__write_header(0, 0, -1, 0, closed=1)
+        self.__bump_sequence()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedRosterView:
+
+    """Read-only view of a roster written by a SharedRoster in another process"""
+
+    def __init__(self, name: str = "initiative") -> None:
+        try:
+            self.shm = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            # Before Python 3.13, attaching registers the segment with the
+            # resource tracker, which would remove it when this viewer exits
+            self.shm = shared_memory.SharedMemory(name)
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        if bytes(self.shm.buf[: len(MAGIC)]) != MAGIC:
+            self.shm.close()
+            raise ValueError(f"{name} is not a shared roster")
+        header = HEADER.unpack_from(self.shm.buf)
+        capacity, name_capacity = header[2], header[3]
+        offsets, hidden, name_ends, names, _ = _layout(capacity, name_capacity)
+        buf = self.shm.buf
+        # Columns are viewed in place; the writer is on the same machine, so
+        # they are always in native byte order
+        self._columns = [
+            buf[offset : offset + 4 * capacity].cast("i") for offset in offsets
+        ]
+        self._hidden = buf[hidden : hidden + capacity]
+        self._name_ends = buf[name_ends : name_ends + 4 * (capacity + 1)].cast("I")
+        self._names = buf[names : names + name_capacity]
+        self.renderer = RosterRenderer()
+
+    def sequence(self) -> int:
+        """Returns the sequence number, which changes with every write"""
+        return SEQUENCE.unpack_from(self.shm.buf, SEQUENCE_OFFSET)[0]
+
+    def read(self) -> tuple:
+        """
+        Returns (entries, turn, round, closed) as of one consistent write
+
+        turn is the index in entries of the entry whose turn it is, or None
+        before the first turn.
+        """
+        while True:
+            before = self.sequence()
+            if before & 1:
+                # A write is in progress
+                time.sleep(0)
+                continue
+            _, _, _, _, count, _, turn, round, closed = HEADER.unpack_from(
+                self.shm.buf
+            )
+            names, name_ends, hidden = self._names, self._name_ends, self._hidden
+            try:
+                entries = [
+                    Entry(
+                        str(names[name_ends[idx] : name_ends[idx + 1]], "utf-8"),
+                        *row,
+                        bool(hidden[idx]),
+                    )
+                    for idx, row in enumerate(
+                        zip(*(column[:count] for column in self._columns))
+                    )
+                ]
+            except UnicodeDecodeError:
+                # A write started after the sequence was read and cut a name
+                continue
+            if self.sequence() == before:
+                return entries, None if turn < 0 else turn, round, bool(closed)
+
+    def render(self) -> tuple:
+        """Returns the player view as printable text and whether it closed"""
+        entries, turn, round, closed = self.read()
+        current = entries[turn] if turn is not None else None
+        visible = (entry for entry in entries if not entry.hidden)
+        text = "".join(
+            self.renderer.render_part(enumerate(visible, 1), False, current)
+        )
+        return text, closed
+
+    def close(self) -> None:
+        """Releases the column views and detaches from the segment"""
+        for view in self._columns + [self._hidden, self._name_ends, self._names]:
+            view.release()
+        self.shm.close()
+
+
+def view(name: str = "initiative") -> None:
+    """Prints the player view of a shared roster every time it changes"""
+    roster = SharedRosterView(name)
+    try:
+        seen = None
+        while True:
+            sequence = roster.sequence()
+            if sequence != seen and not sequence & 1:
+                text, closed = roster.render()
+                if closed:
+                    return
+                seen = sequence
+                print("Initiative order\n________________")
+                print(text, end="")
+            time.sleep(POLL_INTERVAL)
+    finally:
+        roster.close()
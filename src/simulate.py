@@ -0,0 +1,220 @@
+"""Implements a Monte Carlo encounter simulator built on the roster model"""
+import os
+import random
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from src.dice import DiceExpression, DiceRoller
+from src.helpers import split_name
+
+# Trials are run in fixed-size chunks, each with its own seeded random stream,
+# so results for a given seed do not depend on the number of workers
+CHUNK_SIZE = 250
+DEFAULT_PROFILE = {"to_hit": 3, "damage": "1d6"}
+
+
+def attack_profile(entry, profiles: dict = None) -> dict:
+    """
+    Returns the attack profile of an entry: its side, to_hit and damage
+
+    profiles maps entry names or base names (such as 'goblin' for 'goblin 3')
+    to partial profiles. Numbered entries default to the 'monsters' side and
+    all other entries to the 'party' side.
+    """
+    base, number = split_name(entry.name)
+    profile = {
+        **DEFAULT_PROFILE,
+        "side": "party" if number is None else "monsters",
+    }
+    profiles = profiles or {}
+    profile.update(profiles.get(base, {}))
+    profile.update(profiles.get(entry.name, {}))
+    return profile
+
+
+class Combatant(NamedTuple):
+
+    """The stats of one entry taking part in simulated encounters"""
+
+    name: str
+    side: str
+    ac: int
+    hp: int
+    init_bonus: int
+    to_hit: int
+    damage: str
+
+
+class SimulationResult:
+
+    """Aggregate statistics of a number of simulated encounters"""
+
+    def __init__(self, names: list) -> None:
+        self.names = names
+        self.trials = 0
+        # Side name -> number of wins; None counts encounters nobody won
+        self.wins = Counter()
+        self.rounds_total = 0
+        self.hp_total = [0] * len(names)
+        self.survivals = [0] * len(names)
+
+    def add_trial(self, winner: str, rounds: int, hp: list) -> None:
+        """Adds the outcome of one encounter"""
+        self.trials += 1
+        self.wins[winner] += 1
+        self.rounds_total += rounds
+        for idx, value in enumerate(hp):
+            if value > 0:
+                self.hp_total[idx] += value
+                self.survivals[idx] += 1
+
+    def merge(self, other) -> None:
+        """Adds the statistics of another result over the same combatants"""
+        self.trials += other.trials
+        self.wins.update(other.wins)
+        self.rounds_total += other.rounds_total
+        for idx in range(len(self.names)):
+            self.hp_total[idx] += other.hp_total[idx]
+            self.survivals[idx] += other.survivals[idx]
+
+    def win_rate(self, side: str) -> float:
+        """Returns the fraction of encounters won by side"""
+        return self.wins[side] / self.trials if self.trials else 0.0
+
+    def mean_rounds(self) -> float:
+        """Returns the mean number of rounds an encounter lasted"""
+        return self.rounds_total / self.trials if self.trials else 0.0
+
+    def summary(self) -> str:
+        """Returns the statistics as printable text"""
+        if not self.trials:
+            return "No trials were run\n"
+        outcomes = ", ".join(
+            f"{side if side is not None else 'no winner'} {count / self.trials:.1%}"
+            for side, count in self.wins.most_common()
+        )
+        lines = [
+            f"{self.trials} trials, {len(self.names)} combatants",
+            f"Outcomes: {outcomes}",
+            f"Rounds: {self.mean_rounds():.2f} on average",
+        ]
+        name_width = max((len(name) for name in self.names), default=0)
+        for name, survivals, hp_total in zip(
+            self.names, self.survivals, self.hp_total
+        ):
+            lines.append(
+                f"{name:>{name_width}} survived {survivals / self.trials:6.1%}, "
+                f"{hp_total / self.trials:.1f} HP left on average"
+            )
+        return "".join(f"{line}\n" for line in lines)
+
+
+def _run_chunk(combatants: list, trials: int, seed: int, max_rounds: int):
+    """Runs a number of encounters in one worker with its own random stream"""
+    dice = DiceRoller(seed, use_numpy=False)
+    rng = dice.random
+    damage = [DiceExpression.parse(combatant.damage) for combatant in combatants]
+    sides = sorted({combatant.side for combatant in combatants})
+    result = SimulationResult([combatant.name for combatant in combatants])
+
+    for _ in range(trials):
+        hp = [combatant.hp for combatant in combatants]
+        # Living combatant indexes per side, for random target selection
+        alive = {side: [] for side in sides}
+        for idx, combatant in enumerate(combatants):
+            if hp[idx] > 0:
+                alive[combatant.side].append(idx)
+        order = sorted(
+            range(len(combatants)),
+            key=lambda idx: rng.randint(1, 20) + combatants[idx].init_bonus,
+            reverse=True,
+        )
+        standing = [side for side in sides if alive[side]]
+        rounds = 0
+        while len(standing) > 1 and rounds < max_rounds:
+            rounds += 1
+            for idx in order:
+                if hp[idx] <= 0:
+                    continue
+                side = combatants[idx].side
+                enemies = [enemy for enemy in standing if enemy != side]
+                if not enemies:
+                    break
+                targets = alive[rng.choice(enemies)]
+                target = rng.choice(targets)
+                to_hit = rng.randint(1, 20)
+                # Natural 1s always miss and natural 20s always hit
+                if to_hit == 1:
+                    continue
+                hit_bonus, target_ac = combatants[idx].to_hit, combatants[target].ac
+                if to_hit != 20 and to_hit + hit_bonus < target_ac:
+                    continue
+                hp[target] -= max(dice.roll(damage[idx]), 0)
+                if hp[target] <= 0:
+                    targets.remove(target)
+                    if not targets:
+                        standing.remove(combatants[target].side)
+        winner = standing[0] if len(standing) == 1 else None
+        result.add_trial(winner, rounds, hp)
+    return result
+
+
+def simulate(
+    initiative,
+    trials: int,
+    profiles: dict = None,
+    workers: int = None,
+    seed: int = None,
+    max_rounds: int = 100,
+) -> SimulationResult:
+    """
+    Simulates trials encounters between the sides of an Initiative roster
+
+    Every entry with HP left fights using its ac, hp and init_bonus plus the
+    attack profile given by attack_profile(). Each round every standing
+    combatant attacks a random enemy in freshly rolled initiative order.
+    Trials are spread over workers processes (default: one per CPU; 1 runs
+    in-process), and equal seeds give equal results for any worker count.
+    """
+    combatants = []
+    for entry in initiative:
+        profile = attack_profile(entry, profiles)
+        # Validate damage expressions before handing them to the workers
+        DiceExpression.parse(profile["damage"])
+        combatants.append(
+            Combatant(
+                entry.name,
+                profile["side"],
+                entry.ac,
+                entry.hp,
+                entry.init_bonus,
+                int(profile["to_hit"]),
+                profile["damage"],
+            )
+        )
+    seeds = random.Random(seed)
+    chunks = [
+        (min(CHUNK_SIZE, trials - start), seeds.getrandbits(64))
+        for start in range(0, trials, CHUNK_SIZE)
+    ]
+
+    result = SimulationResult([combatant.name for combatant in combatants])
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1 or len(chunks) <= 1:
+        for chunk_trials, chunk_seed in chunks:
+            result.merge(_run_chunk(combatants, chunk_trials, chunk_seed, max_rounds))
+        return result
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _run_chunk, combatants, chunk_trials, chunk_seed, max_rounds
+            )
+            for chunk_trials, chunk_seed in chunks
+        ]
+        for future in futures:
+            result.merge(future.result())
+    return result
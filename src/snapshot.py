@@ -0,0 +1,199 @@
+"""Implements the binary roster snapshot format and its memory-mapped reader"""
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+
+from src.entry import Entry
+
+# magic, byte order (0 little, 1 big), entry count, name table size,
+# extras table size
+HEADER = struct.Struct("<8sB3xIII")
+MAGIC = b"INITSNP3"
+# Snapshots written before tags were tracked hold only conditions in their
+# table, and those written before conditions were tracked have no table
+MAGIC_V2 = b"INITSNP2"
+HEADER_V1 = struct.Struct("<8sB3xII")
+MAGIC_V1 = b"INITSNP1"
+# Attributes held in the extras table, for the rows where they are not empty
+EXTRAS = ("conditions", "tags")
+# Fixed-width int32 columns, stored in this order after the header
+COLUMNS = ("initiative", "init_bonus", "ac", "hp_max", "hp")
+_NATIVE_ORDER = 0 if sys.byteorder == "little" else 1
+
+
+def write_snapshot(path: str, entries, turn: dict = None) -> None:
+    """
+    Writes entries to a binary snapshot file, replacing it atomically
+
+    Entries are stored in the given order, which should be initiative order
+    so that loading needs no sort. After the header come one int32 column per
+    numeric attribute, a bitset of hidden flags, the end offset of every name,
+    the UTF-8 name table and finally a JSON table holding the conditions and
+    tags of the entries that have any, keyed by row, and turn, the round and
+    the name of the current entry as returned by Initiative.turn_state().
+    """
+    # json is slow to import, so only loading or saving a roster imports it
+    import json
+
+    entries = list(entries)
+    count = len(entries)
+    try:
+        columns = [
+            array("i", [getattr(entry, column) for entry in entries])
+            for column in COLUMNS
+        ]
+    except OverflowError as e:
+        raise ValueError(f"snapshot columns hold 32-bit integers: {e}") from e
+    hidden = bytearray((count + 7) // 8)
+    for idx, entry in enumerate(entries):
+        if entry.hidden:
+            hidden[idx >> 3] |= 1 << (idx & 7)
+    names = [entry.name.encode() for entry in entries]
+    table = {
+        attribute: {
+            idx: getattr(entry, attribute)
+            for idx, entry in enumerate(entries)
+            if getattr(entry, attribute)
+        }
+        for attribute in EXTRAS
+    }
+    if turn is not None:
+        table["turn"] = turn
+    extras = json.dumps(table).encode()
+    name_ends = array("I", [0])
+    for name in names:
+        name_ends.append(name_ends[-1] + len(name))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as fo:
+        fo.write(
+            HEADER.pack(MAGIC, _NATIVE_ORDER, count, name_ends[-1], len(extras))
+        )
+        for column in columns:
+            column.tofile(fo)
+        fo.write(hidden)
+        name_ends.tofile(fo)
+        fo.writelines(names)
+        fo.write(extras)
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+
+    """Read-only, memory-mapped view of a snapshot; rows become Entry on access"""
+
+    def __init__(self, path: str) -> None:
+        """Maps a snapshot file without reading its rows"""
+        with open(path, "rb") as fo:
+            self._mmap = mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ)
+        magic = self._mmap[: len(MAGIC)]
+        if magic in (MAGIC, MAGIC_V2) and len(self._mmap) >= HEADER.size:
+            header = HEADER.unpack_from(self._mmap)
+            offset = HEADER.size
+        elif magic == MAGIC_V1 and len(self._mmap) >= HEADER_V1.size:
+            header = HEADER_V1.unpack_from(self._mmap) + (0,)
+            offset = HEADER_V1.size
+        else:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a roster snapshot")
+        _, byteorder, count, names_size, extras_size = header
+
+        self._count = count
+        self._view = memoryview(self._mmap)
+        self._columns = []
+        for _ in COLUMNS:
+            self._columns.append(self.__cast(offset, count, "i", byteorder))
+            offset += 4 * count
+        self._hidden = self._view[offset : offset + (count + 7) // 8]
+        offset += (count + 7) // 8
+        self._name_ends = self.__cast(offset, count + 1, "I", byteorder)
+        offset += 4 * (count + 1)
+        self._names = self._view[offset : offset + names_size]
+        offset += names_size
+        # Conditions and tags are rare, so they are parsed up front rather
+        # than mapped
+        self._conditions = {}
+        self._tags = {}
+        # Round and current entry name, if the encounter had started
+        self.turn = None
+        if extras_size:
+            import json
+
+            table = json.loads(bytes(self._view[offset : offset + extras_size]))
+            if magic == MAGIC_V2:
+                table = {"conditions": table}
+            self._conditions, self._tags = (
+                {int(idx): tuple(row) for idx, row in table.get(attribute, {}).items()}
+                for attribute in EXTRAS
+            )
+            self.turn = table.get("turn")
+
+    def __cast(self, offset: int, length: int, typecode: str, byteorder: int):
+        """Helper function to view a column in place, copying only to byteswap"""
+        column = self._view[offset : offset + 4 * length]
+        if byteorder == _NATIVE_ORDER:
+            return column.cast(typecode)
+        swapped = array(typecode)
+        swapped.frombytes(column)
+        swapped.byteswap()
+        return swapped
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, idx: int) -> Entry:
+        """Materializes the Entry stored at row idx"""
+        if not 0 <= idx < self._count:
+            raise IndexError(f"snapshot row {idx} is out of range")
+        name_start, name_end = self._name_ends[idx], self._name_ends[idx + 1]
+        name = str(self._names[name_start:name_end], "utf-8")
+        initiative, init_bonus, ac, hp_max, hp = (
+            column[idx] for column in self._columns
+        )
+        hidden = bool(self._hidden[idx >> 3] & (1 << (idx & 7)))
+        conditions = self._conditions.get(idx, ())
+        tags = self._tags.get(idx, ())
+        return Entry(
+            name, initiative, init_bonus, ac, hp_max, hp, hidden, conditions, tags
+        )
+
+    def __iter__(self):
+        names, name_ends, hidden = self._names, self._name_ends, self._hidden
+        conditions, tags = self._conditions, self._tags
+        for idx, row in enumerate(zip(*self._columns)):
+            name = str(names[name_ends[idx] : name_ends[idx + 1]], "utf-8")
+            yield Entry(
+                name,
+                *row,
+                bool(hidden[idx >> 3] & (1 << (idx & 7))),
+                conditions.get(idx, ()),
+                tags.get(idx, ()),
+            )
+
+    def close(self) -> None:
+        """Releases the column views and unmaps the file"""
+        for column in self._columns + [self._name_ends]:
+            if isinstance(column, memoryview):
+                column.release()
+        self._hidden.release()
+        self._names.release()
+        self._view.release()
+        self._mmap.close()
+
+
+def read_snapshot(path: str, turn: dict = None):
+    """
+    Yields the entries of a snapshot file in their stored order
+
+    If the snapshot holds a turn, it is copied into the turn dict, if given.
+    """
+    snapshot = Snapshot(path)
+    try:
+        if turn is not None and snapshot.turn is not None:
+            turn.update(snapshot.turn)
+        yield from snapshot
+    finally:
+        snapshot.close()
@@ -0,0 +1,149 @@
+"""Implements per-command latency statistics for the command loop"""
+import time
+
+from bisect import bisect_left
+
+# Upper bounds in seconds of the latency histogram buckets; slower commands
+# land in a final overflow bucket
+BUCKETS = (0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+BUCKETS += (0.2, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+def _bucket_label(idx: int) -> str:
+    """Returns the label of a histogram bucket, such as '<=0.005'"""
+    if idx < len(BUCKETS):
+        return f"<={BUCKETS[idx]:g}"
+    return f">{BUCKETS[-1]:g}"
+
+
+class CommandTimes:
+
+    """Call count, total, maximum and latency histogram of one command"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def add(self, elapsed: float) -> None:
+        """Adds the latency of one call"""
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.histogram[bisect_left(BUCKETS, elapsed)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """Returns the bucket bound below which fraction of the calls fell"""
+        threshold = fraction * self.count
+        seen = 0
+        for idx, calls in enumerate(self.histogram):
+            seen += calls
+            if calls and seen >= threshold:
+                # Bounds overestimate, but no call took longer than the maximum
+                return min(BUCKETS[idx], self.max) if idx < len(BUCKETS) else self.max
+        return 0.0
+
+    def to_dict(self) -> dict:
+        """Returns the statistics as a JSON-serializable dictionary"""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "histogram": {
+                _bucket_label(idx): calls
+                for idx, calls in enumerate(self.histogram)
+                if calls
+            },
+        }
+
+
+class CommandStats:
+
+    """
+    Latency statistics of every command run by a ProgramLoop
+
+    The loop calls begin() before and end() after every command. Alongside
+    the command latencies, reports include the internal operation counters of
+    the attached Initiative, such as sorts, render passes and rolls.
+    """
+
+    def __init__(self) -> None:
+        self.commands = {}
+        self.initiative = None
+        self._command = None
+        self._start = None
+
+    def attach(self, initiative) -> None:
+        """Includes the operation counters of initiative in reports"""
+        self.initiative = initiative
+
+    def begin(self, command: str) -> None:
+        """Starts timing a command"""
+        self._command = command
+        self._start = time.perf_counter()
+
+    def end(self) -> None:
+        """Stops timing the current command and records its latency"""
+        if self._start is None:
+            return
+        elapsed = time.perf_counter() - self._start
+        self._start = None
+        self.commands.setdefault(self._command, CommandTimes()).add(elapsed)
+
+    def reset(self) -> None:
+        """Forgets every recorded latency and operation count"""
+        self.commands.clear()
+        if self.initiative is not None:
+            self.initiative.counters.clear()
+
+    def to_dict(self) -> dict:
+        """Returns the statistics as a JSON-serializable dictionary"""
+        counters = {}
+        if self.initiative is not None:
+            counters = dict(self.initiative.counters)
+        return {
+            "commands": {
+                command: times.to_dict()
+                for command, times in sorted(self.commands.items())
+            },
+            "counters": counters,
+        }
+
+    def dump(self, path: str) -> None:
+        """Writes the statistics to a json file"""
+        import json
+
+        with open(path, "w") as fo:
+            json.dump(self.to_dict(), fo, indent=2)
+
+    def summary(self) -> str:
+        """Returns the statistics as printable text, slowest commands first"""
+        if not self.commands:
+            lines = ["No commands timed yet"]
+        else:
+            name_width = max(len(command) for command in [*self.commands, "command"])
+            lines = [
+                f"{'command':>{name_width}} {'calls':>7} {'total ms':>10} "
+                f"{'mean ms':>9} {'p95 ms':>9} {'max ms':>9}"
+            ]
+            for command, times in sorted(
+                self.commands.items(), key=lambda item: -item[1].total
+            ):
+                lines.append(
+                    f"{command:>{name_width}} {times.count:>7} "
+                    f"{times.total * 1000:>10.2f} "
+                    f"{times.total / times.count * 1000:>9.3f} "
+                    f"{times.percentile(0.95) * 1000:>9.3f} "
+                    f"{times.max * 1000:>9.3f}"
+                )
+        if self.initiative is not None and self.initiative.counters:
+            lines.append(
+                "Operations: "
+                + ", ".join(
+                    f"{name} {count}"
+                    for name, count in sorted(self.initiative.counters.items())
+                )
+            )
+        return "".join(f"{line}\n" for line in lines)
@@ -0,0 +1,121 @@
+"""Creature templates read from a bestiary directory and spawned"""
+import json
+import os
+
+import pytest
+
+from src.bestiary import INDEX_FILE, Bestiary
+from src.roster import Initiative
+
+GOBLIN = {"name": "goblin", "ac": 15, "hp": "2d6", "init_bonus": 2}
+ORC = {"name": "orc", "ac": 13, "hp": 15}
+WOLF = {"name": "wolf", "ac": 13, "hp": 11, "init_bonus": 2, "hidden": True}
+
+
+def _write(directory, filename: str, templates: list) -> None:
+    """Writes templates as a json list file or one per line of a jsonl file"""
+    with open(os.path.join(directory, filename), "w") as fo:
+        if filename.endswith(".jsonl"):
+            fo.writelines(f"{json.dumps(template)}\n" for template in templates)
+        else:
+            # Non-ASCII text before a record checks byte offsets
+            fo.write(' [ {"name": "dryad", "note": "élan"},\n')
+            fo.write(",\n".join(json.dumps(template) for template in templates))
+            fo.write("\n]\n")
+
+
+def _bestiary(tmp_path) -> Bestiary:
+    """Returns a bestiary of a json file and a jsonl file"""
+    _write(tmp_path, "monsters.json", [GOBLIN, ORC])
+    _write(tmp_path, "beasts.jsonl", [WOLF])
+    return Bestiary(str(tmp_path))
+
+
+def test_templates_of_both_formats(tmp_path):
+    bestiary = _bestiary(tmp_path)
+    assert len(bestiary) == 4
+    assert "wolf" in bestiary and "troll" not in bestiary
+    assert bestiary.get("goblin") == GOBLIN
+    assert bestiary.get("orc") == ORC
+    assert bestiary.get("wolf") == WOLF
+    assert bestiary.names.prefix("") == ["dryad", "goblin", "orc", "wolf"]
+
+
+def test_unknown_name_suggests_templates(tmp_path):
+    bestiary = _bestiary(tmp_path)
+    with pytest.raises(ValueError, match="did you mean goblin"):
+        bestiary.get("gobiln")
+    with pytest.raises(ValueError, match="no template is named dragon$"):
+        bestiary.get("dragon")
+
+
+def test_index_is_cached_and_refreshed(tmp_path):
+    _bestiary(tmp_path)
+    with open(tmp_path / INDEX_FILE) as fo:
+        index = json.load(fo)
+    assert sorted(index["files"]) == ["beasts.jsonl", "monsters.json"]
+    # A stale cached record shows the unchanged file is not read again
+    index["files"]["beasts.jsonl"]["records"][0][0] = "warg"
+    with open(tmp_path / INDEX_FILE, "w") as fo:
+        json.dump(index, fo)
+    assert "warg" in Bestiary(str(tmp_path))
+    _write(tmp_path, "beasts.jsonl", [WOLF, {"name": "bear", "hp": 34}])
+    bestiary = Bestiary(str(tmp_path))
+    assert "warg" not in bestiary
+    assert bestiary.get("bear") == {"name": "bear", "hp": 34}
+    os.remove(tmp_path / "beasts.jsonl")
+    assert "wolf" not in Bestiary(str(tmp_path))
+
+
+def test_file_sorting_last_wins(tmp_path):
+    _bestiary(tmp_path)
+    _write(tmp_path, "zz-homebrew.jsonl", [{"name": "orc", "hp": 30}])
+    assert Bestiary(str(tmp_path)).get("orc") == {"name": "orc", "hp": 30}
+
+
+@pytest.mark.parametrize(
+    "filename, text",
+    [("bad.json", '{"name": "orc"}'), ("bad.jsonl", '{"hp": 5}\n'), ("bad.json", "[")],
+)
+def test_invalid_file(tmp_path, filename, text):
+    with open(tmp_path / filename, "w") as fo:
+        fo.write(text)
+    with pytest.raises(ValueError, match="not a valid bestiary file"):
+        Bestiary(str(tmp_path))
+
+
+def test_cache_keeps_most_recently_used(tmp_path):
+    _write(tmp_path, "monsters.json", [GOBLIN, ORC, WOLF])
+    bestiary = Bestiary(str(tmp_path), cache_size=2)
+    goblin = bestiary.get("goblin")
+    orc = bestiary.get("orc")
+    assert bestiary.get("goblin") is goblin
+    bestiary.get("wolf")
+    # The orc was least recently used, so it is parsed again
+    assert bestiary.get("orc") is not orc
+    assert bestiary.get("orc") == ORC
+
+
+def test_spawn_from_templates(tmp_path):
+    bestiary = _bestiary(tmp_path)
+    initiative = Initiative(seed=0)
+    goblins = initiative.spawn(bestiary.get("goblin"), 3)
+    wolves = initiative.spawn(bestiary.get("wolf"), 2)
+    assert [entry.name for entry in goblins] == ["goblin 1", "goblin 2", "goblin 3"]
+    assert all(2 <= entry.hp == entry.hp_max <= 12 for entry in goblins)
+    assert all(entry.ac == 15 and entry.init_bonus == 2 for entry in goblins)
+    assert all(entry.hidden and entry.hp == 11 for entry in wolves)
+    assert len(initiative) == 5
+    assert [entry.name for entry in initiative.spawn(bestiary.get("goblin"), 1)] == [
+        "goblin 4"
+    ]
+
+
+@pytest.mark.parametrize(
+    "template", [{"hp": 5}, {"name": "orc", "hp": None}, {"name": "orc", "ac": "x"}]
+)
+def test_spawn_refuses_invalid_template(template):
+    initiative = Initiative(seed=0)
+    with pytest.raises(ValueError, match="invalid template"):
+        initiative.spawn(template, 2)
+    assert len(initiative) == 0
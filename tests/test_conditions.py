@@ -0,0 +1,127 @@
+"""Conditions and their expiry at points of the turn order"""
+import pytest
+
+from src.roster import Initiative
+
+
+def _roster() -> Initiative:
+    """Returns a roster of four entries, before the first turn"""
+    initiative = Initiative(seed=0)
+    for name, value in (("orc", 15), ("elf", 12), ("imp", 8), ("bat", 3)):
+        initiative.add_to_initiative(name, str(value))
+    return initiative
+
+
+def _names(initiative: Initiative, entry_name: str) -> list:
+    """Returns the names of an entry's conditions"""
+    return [condition["name"] for condition in initiative.roster[entry_name].conditions]
+
+
+def _advance_until_expired(initiative: Initiative, limit: int = 20) -> tuple:
+    """Passes turns until a condition expires, returning when and what"""
+    for _ in range(limit):
+        initiative.next_turn()
+        if initiative.expired:
+            return initiative.round, initiative.current_turn().name, initiative.expired
+    return None
+
+
+def test_condition_without_duration_lasts():
+    initiative = _roster()
+    initiative.add_condition("*", "lit")
+    assert _advance_until_expired(initiative) is None
+    assert initiative.remove_condition("?mp", "lit") == 1
+    assert _names(initiative, "imp") == []
+    assert _names(initiative, "orc") == ["lit"]
+
+
+def test_rounds_expire_at_start_of_current_turn():
+    initiative = _roster()
+    initiative.next_turn()
+    initiative.next_turn()
+    initiative.add_condition([3], "blessed", rounds=2)
+    assert _advance_until_expired(initiative) == (3, "elf", [("bat", "blessed")])
+
+
+def test_rounds_before_first_turn_expire_on_each_target():
+    initiative = _roster()
+    initiative.add_condition([0, 2], "hasted", rounds=1)
+    assert _advance_until_expired(initiative) == (2, "orc", [("orc", "hasted")])
+    assert _advance_until_expired(initiative) == (2, "imp", [("imp", "hasted")])
+
+
+@pytest.mark.parametrize(
+    "phase, expected",
+    [
+        ("end", (1, "bat", [("orc", "stunned")])),
+        ("start", (1, "imp", [("orc", "stunned")])),
+    ],
+)
+def test_anchor_expires_at_phase_of_next_turn(phase, expected):
+    initiative = _roster()
+    initiative.next_turn()
+    initiative.add_condition([0], "stunned", anchor=2, phase=phase)
+    assert _advance_until_expired(initiative) == expected
+
+
+def test_anchor_whose_turn_passed_waits_for_next_round():
+    initiative = _roster()
+    for _ in range(3):
+        initiative.next_turn()
+    initiative.add_condition([3], "marked", anchor=0, phase="end")
+    assert _advance_until_expired(initiative) == (2, "elf", [("bat", "marked")])
+
+
+def test_same_name_replaces_condition():
+    initiative = _roster()
+    initiative.next_turn()
+    initiative.add_condition([1], "poisoned", rounds=1)
+    initiative.add_condition([1], "poisoned", rounds=3)
+    assert _names(initiative, "elf") == ["poisoned"]
+    assert _advance_until_expired(initiative) == (4, "orc", [("elf", "poisoned")])
+
+
+def test_removed_condition_does_not_expire_later():
+    initiative = _roster()
+    initiative.next_turn()
+    initiative.add_condition([1], "prone", rounds=1)
+    initiative.remove_condition([1], "prone")
+    initiative.add_condition([1], "prone")
+    assert _advance_until_expired(initiative) is None
+    assert _names(initiative, "elf") == ["prone"]
+
+
+def test_renamed_anchor_keeps_its_conditions():
+    initiative = _roster()
+    initiative.next_turn()
+    initiative.add_condition([3], "charmed", anchor=2)
+    initiative.rename_entry(2, "imp lord")
+    assert initiative.roster["bat"].conditions[0]["anchor"] == "imp lord"
+    assert _advance_until_expired(initiative) == (1, "bat", [("bat", "charmed")])
+
+
+def test_removed_anchor_hands_conditions_to_next_entry():
+    initiative = _roster()
+    initiative.next_turn()
+    initiative.add_condition([1], "blessed", rounds=1)
+    initiative.remove_entry(initiative.index_of("orc"))
+    assert initiative.roster["elf"].conditions[0]["anchor"] == "elf"
+    assert _advance_until_expired(initiative) == (2, "elf", [("elf", "blessed")])
+
+
+def test_removed_last_anchor_hands_conditions_to_next_round():
+    initiative = _roster()
+    initiative.add_condition([0], "marked", anchor=3, phase="end")
+    initiative.remove_entry(3)
+    # The bat would have ended its turn after the imp's, in round 1
+    assert _advance_until_expired(initiative) == (2, "orc", [("orc", "marked")])
+
+
+def test_invalid_conditions_are_refused():
+    initiative = _roster()
+    with pytest.raises(ValueError):
+        initiative.add_condition([0], "slow", rounds=0)
+    with pytest.raises(ValueError):
+        initiative.add_condition([0], "slow", anchor=1, phase="middle")
+    with pytest.raises(IndexError):
+        initiative.add_condition([9], "slow")
@@ -0,0 +1,100 @@
+"""Parsing and rolling of dice expressions"""
+import pytest
+
+from src.dice import HAVE_NUMPY, NUMPY_MIN_BATCH, DiceExpression, DiceRoller
+
+ROLLERS = [False] + ([True] if HAVE_NUMPY else [])
+
+
+def _terms(expression) -> list:
+    """Returns (sign, count, sides, keep_high, keep) of every term"""
+    if isinstance(expression, str):
+        expression = DiceExpression.parse(expression)
+    return [
+        (term.sign, term.count, term.sides, term.keep_high, term.keep)
+        for term in expression.terms
+    ]
+
+
+def test_parses_terms_and_modifier():
+    expression = DiceExpression.parse("2d6 + d8 - 1d4 + 3 - 1")
+    assert [term[:3] + term[4:] for term in _terms(expression)] == [
+        (1, 2, 6, None),
+        (1, 1, 8, None),
+        (-1, 1, 4, None),
+    ]
+    assert expression.modifier == 2
+    assert expression.advantage == 0
+
+
+@pytest.mark.parametrize(
+    "text, keep_high, keep",
+    [
+        ("4d6kh3", True, 3),
+        ("4d6k3", True, 3),
+        ("4d6dl1", True, 3),
+        ("2d20kl1", False, 1),
+        ("4d6dh1", False, 3),
+        ("3D6KH2", True, 2),
+    ],
+)
+def test_parses_keep_and_drop(text, keep_high, keep):
+    [(_, _, _, term_keep_high, term_keep)] = _terms(text)
+    assert (term_keep_high, term_keep) == (keep_high, keep)
+
+
+def test_keeping_every_die_keeps_none():
+    assert _terms("2d6kh2")[0][4] is None
+    assert _terms("2d6kh5")[0][4] is None
+
+
+@pytest.mark.parametrize(
+    "text, advantage",
+    [("d20+5 adv", 1), ("d20 advantage", 1), ("d20 dis", -1), ("d20 DISADVANTAGE", -1)],
+)
+def test_parses_advantage_flags(text, advantage):
+    assert DiceExpression.parse(text).advantage == advantage
+
+
+@pytest.mark.parametrize("text", ["", "adv", "d", "2x6", "d20 5", "d0", "1d6 +"])
+def test_rejects_invalid_expressions(text):
+    with pytest.raises(ValueError):
+        DiceExpression.parse(text)
+
+
+def test_same_seed_same_rolls():
+    first, second = DiceRoller(seed=42), DiceRoller(seed=42)
+    assert [first.roll("3d6+1") for _ in range(50)] == [
+        second.roll("3d6+1") for _ in range(50)
+    ]
+
+
+@pytest.mark.parametrize("use_numpy", ROLLERS)
+@pytest.mark.parametrize("amount", [1, NUMPY_MIN_BATCH - 1, 2000])
+def test_rolls_stay_in_bounds(use_numpy, amount):
+    roller = DiceRoller(seed=1, use_numpy=use_numpy)
+    totals = roller.roll_many("4d6kh3-2", amount)
+    assert len(totals) == amount
+    assert all(1 <= total <= 16 for total in totals)
+    assert all(isinstance(total, int) for total in totals)
+
+
+@pytest.mark.parametrize("use_numpy", ROLLERS)
+def test_keep_and_advantage_shift_the_average(use_numpy):
+    roller = DiceRoller(seed=3, use_numpy=use_numpy)
+
+    def average(text):
+        totals = roller.roll_many(text, 4000)
+        return sum(totals) / len(totals)
+
+    plain = average("d20")
+    assert average("d20 adv") > plain + 2 > plain - 2 > average("d20 dis")
+    assert average("2d20kh1") > plain + 2 > plain - 2 > average("2d20kl1")
+    assert average("-d6") < 0
+
+
+def test_simple_expression():
+    expression = DiceExpression.simple(die=8, count=2, modifier=-1, advantage=True)
+    assert [term[:3] for term in _terms(expression)] == [(1, 2, 8)]
+    assert (expression.modifier, expression.advantage) == (-1, 1)
+
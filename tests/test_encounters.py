@@ -0,0 +1,112 @@
+"""Encounters hosted together, evicted to snapshots and reloaded"""
+import os
+
+import pytest
+
+from src.encounters import EncounterManager
+from src.roster import Initiative
+
+
+def _rows(initiative: Initiative) -> list:
+    """Returns the entries of a roster as dictionaries, in initiative order"""
+    return [entry.to_dict() for entry in initiative]
+
+
+def _fill(initiative: Initiative, base: str, amount: int) -> None:
+    """Adds amount numbered entries with a turn under way to a roster"""
+    for number in range(amount):
+        initiative.add_to_initiative(f"{base} {number}", str(number), hp_max=5, hp=5)
+    initiative.next_turn()
+    initiative.next_turn()
+
+
+def test_new_and_switch(tmp_path):
+    manager = EncounterManager(str(tmp_path), seed=0)
+    first = manager.new("cave")
+    second = manager.new("bridge-2")
+    assert manager.switch("cave") is first and manager.current == "cave"
+    assert manager.get("bridge-2") is second
+    assert manager.ids() == ["bridge-2", "cave"]
+
+
+@pytest.mark.parametrize("encounter_id", ["", "a b", "../up", "cave.snap"])
+def test_invalid_ids_are_refused(tmp_path, encounter_id):
+    manager = EncounterManager(str(tmp_path))
+    with pytest.raises(ValueError):
+        manager.new(encounter_id)
+
+
+def test_duplicate_ids_are_refused_unless_replaced(tmp_path):
+    manager = EncounterManager(str(tmp_path))
+    manager.new("cave")
+    with pytest.raises(ValueError):
+        manager.new("cave")
+    replacement = Initiative()
+    assert manager.new("cave", replacement, replace=True) is replacement
+    with pytest.raises(ValueError):
+        manager.get("crypt")
+
+
+def test_eviction_keeps_rosters_and_turns(tmp_path):
+    manager = EncounterManager(str(tmp_path), memory_budget=0, seed=0)
+    cave = manager.new("cave")
+    _fill(cave, "bat", 5)
+    manager.switch("cave")
+    expected = _rows(cave), cave.turn_state()
+    manager.new("bridge")
+    assert list(manager.loaded) == ["cave", "bridge"]
+    manager.switch("bridge")
+    # Only the encounter in use may stay loaded under a budget of nothing
+    assert list(manager.loaded) == ["bridge"]
+    assert os.path.exists(tmp_path / "cave.snap")
+    assert manager.summary() == [("bridge", 0, True), ("cave", 5, False)]
+    reloaded = manager.get("cave")
+    assert reloaded is not cave
+    assert (_rows(reloaded), reloaded.turn_state()) == expected
+
+
+def test_eviction_in_least_recently_used_order(tmp_path):
+    manager = EncounterManager(str(tmp_path), seed=0)
+    for encounter_id in ("a", "b", "c"):
+        _fill(manager.new(encounter_id), "orc", 10)
+    manager.get("a")
+    manager.memory_budget = manager.memory_estimate() - 1
+    manager.get("c")
+    assert list(manager.loaded) == ["a", "c"]
+
+
+def test_current_and_pinned_encounters_stay_loaded(tmp_path):
+    manager = EncounterManager(str(tmp_path), memory_budget=0)
+    manager.new("camp")
+    manager.pin("camp")
+    manager.new("road")
+    manager.switch("road")
+    manager.new("ruins")
+    assert list(manager.loaded) == ["camp", "road", "ruins"]
+    manager.switch("ruins")
+    assert sorted(manager.loaded) == ["camp", "ruins"]
+    manager.close()
+    assert not os.path.exists(tmp_path / "camp.snap")
+    assert os.path.exists(tmp_path / "ruins.snap")
+
+
+def test_replace_drops_saved_encounter(tmp_path):
+    manager = EncounterManager(str(tmp_path))
+    _fill(manager.new("default"), "imp", 3)
+    manager.close()
+    manager = EncounterManager(str(tmp_path))
+    assert manager.summary() == [("default", 3, False)]
+    manager.new("default", replace=True)
+    assert not os.path.exists(tmp_path / "default.snap")
+    assert manager.summary() == [("default", 0, True)]
+
+
+def test_temporary_directory_is_removed():
+    manager = EncounterManager(memory_budget=0)
+    manager.new("cave")
+    manager.new("crypt")
+    manager.switch("crypt")
+    directory = manager.directory
+    assert os.path.exists(os.path.join(directory, "cave.snap"))
+    manager.close()
+    assert not os.path.exists(directory)
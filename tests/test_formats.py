@@ -0,0 +1,190 @@
+"""Round trips of rosters through the json, jsonl and snapshot formats"""
+import json
+import struct
+import sys
+
+import pytest
+
+from src.entry import Entry
+from src.roster import Initiative
+from src.snapshot import (
+    COLUMNS,
+    HEADER,
+    HEADER_V1,
+    MAGIC,
+    MAGIC_V1,
+    MAGIC_V2,
+    Snapshot,
+    write_snapshot,
+)
+
+EXTENSIONS = {"json": ".json", "jsonl": ".jsonl", "snapshot": ".snap"}
+
+
+def _sample_roster() -> Initiative:
+    """Returns a roster with hidden entries, conditions, tags and odd names"""
+    initiative = Initiative(seed=1)
+    initiative.add_to_initiative("orc 1", "15", ac=13, hp_max=15, hp=9)
+    initiative.add_to_initiative("Ælfwine", "12", ac=15, hp_max=30, hp=30)
+    initiative.add_to_initiative("ゴブリン 2", "12", hp_max=7, hp=7, hidden=True)
+    initiative.add_to_initiative("wolf", "-3", ac=-1, hp_max=11, hp=-4)
+    initiative.add_condition("orc *", "poisoned")
+    initiative.add_condition([1, 2], "blessed", rounds=2)
+    initiative.tag_entries([0, 2], "elite")
+    return initiative
+
+
+def _rows(initiative: Initiative) -> list:
+    """Returns the entries of a roster as dicts, in initiative order"""
+    return [entry.to_dict() for entry in initiative]
+
+
+def _write_raw_snapshot(path, magic, entries, byteorder, table=None) -> None:
+    """Writes a snapshot by hand, as older versions or other machines did"""
+    order = "<" if byteorder == "little" else ">"
+    count = len(entries)
+    names = [entry.name.encode() for entry in entries]
+    name_ends = [0]
+    for name in names:
+        name_ends.append(name_ends[-1] + len(name))
+    extras = b"" if table is None else json.dumps(table).encode()
+    flag = 0 if byteorder == "little" else 1
+    with open(path, "wb") as fo:
+        if magic == MAGIC_V1:
+            fo.write(HEADER_V1.pack(magic, flag, count, name_ends[-1]))
+        else:
+            fo.write(HEADER.pack(magic, flag, count, name_ends[-1], len(extras)))
+        for column in COLUMNS:
+            values = [getattr(entry, column) for entry in entries]
+            fo.write(struct.pack(f"{order}{count}i", *values))
+        hidden = bytearray((count + 7) // 8)
+        for idx, entry in enumerate(entries):
+            if entry.hidden:
+                hidden[idx >> 3] |= 1 << (idx & 7)
+        fo.write(hidden)
+        fo.write(struct.pack(f"{order}{count + 1}I", *name_ends))
+        fo.write(b"".join(names))
+        fo.write(extras)
+
+
+@pytest.mark.parametrize("fmt", EXTENSIONS)
+def test_round_trip(tmp_path, fmt):
+    initiative = _sample_roster()
+    path = str(tmp_path / f"roster{EXTENSIONS[fmt]}")
+    initiative.export_file(path)
+
+    loaded = Initiative()
+    loaded.import_file(path)
+    assert _rows(loaded) == _rows(initiative)
+    assert loaded.round == 0 and loaded.current_turn() is None
+    assert loaded.group("#elite").count == 2
+
+
+@pytest.mark.parametrize("fmt", EXTENSIONS)
+def test_round_trip_keeps_turn(tmp_path, fmt):
+    initiative = _sample_roster()
+    for _ in range(9):
+        initiative.next_turn()
+    path = str(tmp_path / f"roster{EXTENSIONS[fmt]}")
+    initiative.export_file(path)
+
+    loaded = Initiative()
+    loaded.import_file(path)
+    assert _rows(loaded) == _rows(initiative)
+    assert loaded.round == 3
+    assert loaded.current_turn().name == "orc 1"
+    # Conditions lasting rounds expire as they would have without the trip
+    loaded.next_turn()
+    assert loaded.expired == [("Ælfwine", "blessed")]
+
+
+@pytest.mark.parametrize("fmt", EXTENSIONS)
+def test_round_trip_empty(tmp_path, fmt):
+    path = str(tmp_path / f"roster{EXTENSIONS[fmt]}")
+    Initiative().export_file(path)
+
+    loaded = Initiative()
+    loaded.add_to_initiative("leftover", "3")
+    loaded.import_file(path)
+    assert len(loaded) == 0 and loaded.roster == {}
+
+
+def test_format_overrides_extension(tmp_path):
+    initiative = _sample_roster()
+    path = str(tmp_path / "roster.dat")
+    initiative.export_file(path, "jsonl")
+
+    loaded = Initiative()
+    loaded.import_file(path, "jsonl")
+    assert _rows(loaded) == _rows(initiative)
+
+
+def test_snapshot_rows_on_access(tmp_path):
+    initiative = _sample_roster()
+    path = str(tmp_path / "roster.snap")
+    initiative.export_file(path)
+
+    snapshot = Snapshot(path)
+    try:
+        assert len(snapshot) == 4
+        assert snapshot[2].to_dict() == _rows(initiative)[2]
+        with pytest.raises(IndexError):
+            snapshot[4]
+    finally:
+        snapshot.close()
+
+
+@pytest.mark.parametrize("byteorder", ["little", "big"])
+def test_reads_v1_snapshot(tmp_path, byteorder):
+    entries = [Entry("orc", 15, 2, 13, 15, 9), Entry("ゴブリン", 3, hidden=True)]
+    path = str(tmp_path / "v1.snap")
+    _write_raw_snapshot(path, MAGIC_V1, entries, byteorder)
+
+    loaded = Initiative()
+    loaded.import_file(path)
+    assert _rows(loaded) == [entry.to_dict() for entry in entries]
+
+
+@pytest.mark.parametrize("byteorder", ["little", "big"])
+def test_reads_v2_snapshot(tmp_path, byteorder):
+    poisoned = {"name": "poisoned"}
+    entries = [Entry("orc", 15, conditions=[poisoned]), Entry("elf", 12)]
+    path = str(tmp_path / "v2.snap")
+    # Version 2 tables hold the conditions alone
+    _write_raw_snapshot(path, MAGIC_V2, entries, byteorder, {"0": [poisoned]})
+
+    loaded = Initiative()
+    loaded.import_file(path)
+    assert _rows(loaded) == [entry.to_dict() for entry in entries]
+
+
+def test_reads_byte_swapped_snapshot(tmp_path):
+    initiative = _sample_roster()
+    other = "big" if sys.byteorder == "little" else "little"
+    path = str(tmp_path / "swapped.snap")
+    entries = list(initiative)
+    table = {
+        "conditions": {
+            idx: entry.conditions
+            for idx, entry in enumerate(entries)
+            if entry.conditions
+        },
+        "tags": {idx: entry.tags for idx, entry in enumerate(entries) if entry.tags},
+    }
+    _write_raw_snapshot(path, MAGIC, entries, other, table)
+
+    loaded = Initiative()
+    loaded.import_file(path)
+    assert _rows(loaded) == _rows(initiative)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "roster.snap"
+    path.write_bytes(b"not a snapshot at all")
+    with pytest.raises(ValueError):
+        Initiative().import_file(str(path))
+
+
+def test_snapshot_rejects_wide_integers(tmp_path):
+    with pytest.raises(ValueError):
+        write_snapshot(str(tmp_path / "wide.snap"), [Entry("titan", 1 << 40)])
@@ -0,0 +1,107 @@
+"""Running totals of entry families and tags"""
+import pytest
+
+from src.groups import Groups
+from src.history import History
+from src.roster import Initiative
+
+
+def _roster() -> Initiative:
+    """Returns a roster of three goblins, two of them tagged, and an orc"""
+    initiative = Initiative(seed=0)
+    initiative.add_to_initiative("goblin", "12", hp_max=7, hp=7)
+    initiative.copy_index(0, 2)
+    initiative.add_to_initiative("orc", "15", hp_max=15, hp=15, hidden=True)
+    initiative.tag_entries("goblin [12]", "front")
+    return initiative
+
+
+def _totals(groups: dict) -> dict:
+    """Returns the totals of every group, keyed by group name"""
+    return {
+        key: (group.count, group.visible, group.alive, group.hp, group.hp_max)
+        for key, group in groups.items()
+    }
+
+
+def _assert_matches_recompute(initiative: Initiative) -> None:
+    """Checks the running totals against groups built from scratch"""
+    fresh = Groups(initiative)
+    assert _totals(initiative.groups.families) == _totals(fresh.families)
+    assert _totals(initiative.groups.tags) == _totals(fresh.tags)
+    for key, group in fresh.families.items():
+        live = initiative.groups.families[key]
+        assert live.lowest().hp == group.lowest().hp
+
+
+def test_families_and_tags():
+    initiative = _roster()
+    goblins = initiative.group("goblin")
+    assert (goblins.count, goblins.alive, goblins.hp, goblins.hp_max) == (3, 3, 21, 21)
+    orcs = initiative.group("orc")
+    assert (orcs.count, orcs.visible) == (1, 0)
+    front = initiative.group("#front")
+    assert sorted(entry.name for entry in front) == ["goblin 1", "goblin 2"]
+    _assert_matches_recompute(initiative)
+
+
+def test_unknown_group():
+    initiative = _roster()
+    with pytest.raises(ValueError):
+        initiative.group("troll")
+    with pytest.raises(ValueError):
+        initiative.group("#back")
+
+
+def test_hp_changes_and_lowest():
+    initiative = _roster()
+    goblin_2 = initiative.index_of("goblin 2")
+    initiative.damage(goblin_2, 9)
+    initiative.apply_hp_batch("goblin [13]", [-3, -1])
+    goblins = initiative.group("goblin")
+    assert (goblins.hp, goblins.alive) == (-2 + 4 + 6, 2)
+    assert goblins.lowest().name == "goblin 2"
+    initiative.heal(goblin_2, 20)
+    assert goblins.lowest().name == "goblin 1"
+    assert initiative.group("#front").hp == 4 + 18
+    _assert_matches_recompute(initiative)
+
+
+def test_lowest_survives_many_outdated_items():
+    initiative = _roster()
+    for amount in range(200):
+        initiative.apply_hp_batch("goblin *", [amount % 3, -1, amount % 2])
+    _assert_matches_recompute(initiative)
+
+
+def test_membership_changes():
+    initiative = _roster()
+    initiative.toggle_hidden(initiative.index_of("goblin 3"))
+    initiative.rename_entry(initiative.index_of("goblin 1"), "orc 2")
+    initiative.untag_entries("goblin 2", "front")
+    initiative.modify_index(initiative.index_of("orc"), "hp_max", 30)
+    assert initiative.group("goblin").count == 2
+    assert initiative.group("orc").hp_max == 37
+    assert [entry.name for entry in initiative.group("#front")] == ["orc 2"]
+    initiative.remove_entry(initiative.index_of("orc 2"))
+    with pytest.raises(ValueError):
+        initiative.group("#front")
+    _assert_matches_recompute(initiative)
+
+
+def test_undo_restores_totals():
+    initiative = _roster()
+    before = _totals(initiative.groups.families), _totals(initiative.groups.tags)
+    history = History()
+    history.attach(initiative)
+    history.begin()
+    initiative.apply_hp_batch("goblin *", -5)
+    initiative.rename_entry(initiative.index_of("goblin 3"), "hobgoblin")
+    initiative.tag_entries("orc", "front")
+    initiative.remove_entry(initiative.index_of("goblin 1"))
+    history.end()
+    _assert_matches_recompute(initiative)
+    history.undo()
+    after = _totals(initiative.groups.families), _totals(initiative.groups.tags)
+    assert after == before
+    _assert_matches_recompute(initiative)
@@ -0,0 +1,110 @@
+"""Undo and redo of roster changes"""
+from src.history import History
+from src.roster import Initiative
+
+
+def _tracked(depth: int = 100) -> tuple:
+    """Returns a seeded roster of three entries and a history attached to it"""
+    initiative = Initiative(seed=7)
+    initiative.add_to_initiative("orc", "15", ac=13, hp_max=15, hp=15)
+    initiative.add_to_initiative("goblin", "+2", hp_max=7, hp=7)
+    initiative.add_to_initiative("elf", "10", hp_max=20, hp=20)
+    history = History(depth)
+    history.attach(initiative)
+    return initiative, history
+
+
+def _step(history: History, action, *args) -> None:
+    """Runs one action as a single undoable step, as a command would"""
+    history.begin()
+    action(*args)
+    history.end()
+
+
+def _state(initiative: Initiative) -> tuple:
+    """Returns everything undo should restore: rows, turn and round"""
+    current = initiative.current_turn()
+    return (
+        [entry.to_dict() for entry in initiative],
+        current.name if current is not None else None,
+        initiative.round,
+    )
+
+
+def test_undo_redo_copy_of_unnumbered_entry():
+    initiative, history = _tracked()
+    before = _state(initiative)
+    goblin = initiative.index_of("goblin")
+    _step(history, initiative.copy_index, goblin, 3)
+    after = _state(initiative)
+    assert initiative.names.glob("goblin*") == [f"goblin {n}" for n in range(1, 5)]
+
+    assert history.undo()
+    assert _state(initiative) == before
+    assert "goblin 1" not in initiative.names
+    assert history.redo()
+    assert _state(initiative) == after
+
+    # Undoing gave the copy numbers back, so copying again reuses them
+    assert history.undo()
+    initiative.copy_index(initiative.index_of("goblin"), 1)
+    assert initiative.names.glob("goblin*") == ["goblin 1", "goblin 2"]
+
+
+def test_undo_redo_rename():
+    initiative, history = _tracked()
+    before = _state(initiative)
+    _step(history, initiative.rename_entry, initiative.index_of("orc"), "orc chief")
+    after = _state(initiative)
+
+    assert history.undo()
+    assert _state(initiative) == before
+    assert initiative.lookup("orc").name == "orc"
+    assert initiative.names.glob("orc*") == ["orc"]
+    assert history.redo()
+    assert _state(initiative) == after
+    assert initiative.names.glob("orc*") == ["orc chief"]
+
+
+def test_undo_redo_removing_current_entry():
+    initiative, history = _tracked()
+    initiative.next_turn()
+    initiative.next_turn()
+    initiative.add_condition([0], "marked", anchor=1)
+    current = initiative.current_turn()
+    before = _state(initiative)
+    _step(history, initiative.remove_entry, initiative.index_of(current.name))
+    after = _state(initiative)
+    assert current.name not in initiative.roster
+    assert after[1] != current.name
+
+    assert history.undo()
+    assert _state(initiative) == before
+    assert initiative.current_turn().name == current.name
+    assert history.redo()
+    assert _state(initiative) == after
+
+
+def test_history_depth_evicts_oldest_steps():
+    initiative, history = _tracked(depth=2)
+    for amount in (1, 2, 3):
+        _step(history, initiative.damage, initiative.index_of("orc"), amount)
+    assert initiative.roster["orc"].hp == 9
+
+    assert history.undo()
+    assert history.undo()
+    # The first step fell off the history, so its damage stays
+    assert not history.undo()
+    assert initiative.roster["orc"].hp == 14
+    assert history.redo()
+    assert history.redo()
+    assert not history.redo()
+    assert initiative.roster["orc"].hp == 9
+
+
+def test_new_step_clears_redo():
+    initiative, history = _tracked()
+    _step(history, initiative.toggle_hidden, 0)
+    assert history.undo()
+    _step(history, initiative.heal, 0, 5)
+    assert not history.redo()
@@ -0,0 +1,147 @@
+"""Durability of rosters through the journal and its snapshot"""
+from src.journal import Journal
+from src.roster import Initiative
+
+
+def _rows(initiative: Initiative) -> list:
+    """Returns the entries of a roster as dicts, in initiative order"""
+    return [entry.to_dict() for entry in initiative]
+
+
+def _journaled(path, **options) -> tuple:
+    """Returns a roster recovered from path and the journal attached to it"""
+    initiative = Initiative(seed=5)
+    journal = Journal(str(path), **options)
+    journal.attach(initiative)
+    return initiative, journal
+
+
+def _recovered(path) -> tuple:
+    """Returns a fresh roster recovered from path and the records replayed"""
+    initiative = Initiative()
+    replayed = Journal(str(path)).recover(initiative)
+    return initiative, replayed
+
+
+def _play(initiative: Initiative) -> None:
+    """Makes a few changes of every kind"""
+    initiative.add_to_initiative("orc", "15", ac=13, hp_max=15, hp=15)
+    initiative.add_to_initiative("goblin", "+2", hp_max=7, hp=7)
+    initiative.copy_index(initiative.index_of("goblin"), 2)
+    initiative.damage(initiative.index_of("orc"), 4)
+    initiative.rename_entry(initiative.index_of("goblin 2"), "boss")
+    initiative.next_turn()
+    initiative.add_condition([0], "prone")
+
+
+def test_recovers_flushed_changes(tmp_path):
+    path = tmp_path / "roster.snap"
+    initiative, journal = _journaled(path)
+    _play(initiative)
+    journal.flush()
+
+    recovered, replayed = _recovered(path)
+    assert replayed > 0
+    assert _rows(recovered) == _rows(initiative)
+    assert recovered.current_turn().name == initiative.current_turn().name
+
+
+def test_close_compacts_pending_changes(tmp_path):
+    path = tmp_path / "roster.snap"
+    initiative, journal = _journaled(path)
+    _play(initiative)
+    journal.close()
+
+    recovered, replayed = _recovered(path)
+    assert replayed == 0
+    assert _rows(recovered) == _rows(initiative)
+    assert recovered.round == 1
+
+
+def test_reattaching_resumes_roster_and_turn(tmp_path):
+    path = tmp_path / "roster.snap"
+    initiative, journal = _journaled(path)
+    _play(initiative)
+    journal.close()
+
+    resumed, journal = _journaled(path)
+    assert _rows(resumed) == _rows(initiative)
+    resumed.next_turn()
+    journal.close()
+    assert _recovered(path)[0].current_turn().name == resumed.current_turn().name
+
+
+def test_torn_final_record_is_skipped(tmp_path):
+    path = tmp_path / "roster.snap"
+    initiative, journal = _journaled(path)
+    initiative.add_to_initiative("orc", "15")
+    initiative.add_to_initiative("elf", "12")
+    journal.flush()
+    with open(f"{path}.journal", "a") as fo:
+        fo.write('["add", {"name": "tro')
+
+    recovered, replayed = _recovered(path)
+    assert replayed == 2
+    assert list(recovered.roster) == ["orc", "elf"]
+
+
+def test_compacts_every_so_many_records(tmp_path):
+    path = tmp_path / "roster.snap"
+    initiative, journal = _journaled(path, flush_every=4, compact_every=8)
+    for number in range(10):
+        initiative.add_to_initiative(f"orc {number}", str(number))
+    journal.flush()
+
+    with open(f"{path}.journal") as fo:
+        lines = fo.readlines()
+    # Eight records were folded into the snapshot, the last two were not
+    assert len(lines) == 3
+    recovered, replayed = _recovered(path)
+    assert replayed == 2
+    assert _rows(recovered) == _rows(initiative)
+
+
+def test_journal_of_another_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "roster.snap"
+    initiative, journal = _journaled(path)
+    initiative.add_to_initiative("orc", "15")
+    journal.flush()
+    with open(f"{path}.journal") as fo:
+        leftover = fo.read()
+    journal.compact()
+    # As if a crash hit between writing the snapshot and the new journal
+    with open(f"{path}.journal", "w") as fo:
+        fo.write(leftover)
+
+    recovered, replayed = _recovered(path)
+    assert replayed == 0
+    assert list(recovered.roster) == ["orc"]
+
+
+def test_failed_compaction_keeps_journal(tmp_path):
+    path = tmp_path / "roster.snap"
+    initiative, journal = _journaled(path)
+    initiative.add_to_initiative("orc", "15", hp_max=10, hp=10)
+    # Too large for the snapshot's 32-bit columns
+    initiative.modify_index(0, "hp", 3_000_000_000)
+    journal.close()
+    assert "32-bit" in journal.error
+
+    recovered, replayed = _recovered(path)
+    assert replayed == 2
+    assert recovered.roster["orc"].hp == 3_000_000_000
+
+
+def test_import_replaces_journal(tmp_path):
+    path = tmp_path / "roster.snap"
+    source = Initiative()
+    source.add_to_initiative("lich", "20")
+    source.export_file(str(tmp_path / "source.json"))
+    initiative, journal = _journaled(path)
+    initiative.add_to_initiative("orc", "15")
+    initiative.import_file(str(tmp_path / "source.json"))
+    initiative.add_to_initiative("imp", "3")
+    journal.flush()
+
+    recovered, _ = _recovered(path)
+    assert list(recovered.roster) == ["lich", "imp"]
@@ -0,0 +1,78 @@
+"""Lookups in the sorted name index"""
+import pytest
+
+from src.names import SIMILAR_WINDOW, NameIndex
+
+
+def _index() -> NameIndex:
+    """Returns an index of a few names, added out of order"""
+    return NameIndex(["orc 2", "goblin", "orc 10", "orc 1", "ogre", "imp"])
+
+
+def test_membership_tracks_add_and_discard():
+    index = _index()
+    assert len(index) == 6 and "ogre" in index and "troll" not in index
+    index.add("troll")
+    index.discard("ogre")
+    index.discard("ogre")
+    assert len(index) == 6 and "troll" in index and "ogre" not in index
+
+
+def test_update_keeps_names_sorted():
+    index = NameIndex()
+    index.update(["b", "c"])
+    index.update(["a", "bb"])
+    assert index.prefix("") == ["a", "b", "bb", "c"]
+
+
+def test_duplicate_names_are_kept_once_per_add():
+    index = NameIndex(["imp", "imp"])
+    index.discard("imp")
+    assert "imp" in index
+    index.discard("imp")
+    assert "imp" not in index
+
+
+@pytest.mark.parametrize(
+    "prefix, expected",
+    [
+        ("orc", ["orc 1", "orc 10", "orc 2"]),
+        ("o", ["ogre", "orc 1", "orc 10", "orc 2"]),
+        ("orc 1", ["orc 1", "orc 10"]),
+        ("zombie", []),
+    ],
+)
+def test_prefix(prefix, expected):
+    assert _index().prefix(prefix) == expected
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        ("orc ?", ["orc 1", "orc 2"]),
+        ("orc 1*", ["orc 1", "orc 10"]),
+        ("*o*", ["goblin", "ogre", "orc 1", "orc 10", "orc 2"]),
+        ("[gi]*", ["goblin", "imp"]),
+        ("imp", ["imp"]),
+        ("im", []),
+    ],
+)
+def test_glob(pattern, expected):
+    assert _index().glob(pattern) == expected
+
+
+def test_similar_corrects_typos():
+    index = _index()
+    assert index.similar("gobiln") == ["goblin"]
+    assert sorted(index.similar("orc 3", count=2)) == ["orc 1", "orc 2"]
+    assert index.similar("dragon") == []
+
+
+def test_similar_compares_only_the_window_around_name():
+    index = NameIndex(["goblin"])
+    assert index.similar("oblin") == ["goblin"]
+    # A typo in the first letter sorts it away from the name it misspells
+    index.update(f"m {n:04}" for n in range(2 * SIMILAR_WINDOW))
+    assert index.similar("oblin") == []
+    assert index.similar("gobiln") == ["goblin"]
+    assert index.similar("m 0000x", count=1) == ["m 0000"]
@@ -0,0 +1,81 @@
+"""Player view diffs sent by the server, as mirrored by a client"""
+import json
+import socket
+
+from src.roster import Initiative
+from src.server import PlayerViewClient, PlayerViewServer
+
+
+class _Viewer:
+
+    """A viewer connected over TCP, mirroring the view with a client"""
+
+    def __init__(self, server: PlayerViewServer) -> None:
+        self.connection = socket.create_connection((server.host, server.port))
+        self.connection.settimeout(5)
+        self.stream = self.connection.makefile("rb")
+        self.client = PlayerViewClient()
+        self.receive()
+
+    def receive(self) -> None:
+        """Applies the next message from the server"""
+        self.client.apply(json.loads(self.stream.readline()))
+
+    def close(self) -> None:
+        self.stream.close()
+        self.connection.close()
+
+
+def test_client_mirrors_player_view():
+    initiative = Initiative(seed=3)
+    initiative.add_to_initiative("orc", "15", ac=13, hp_max=15, hp=15)
+    initiative.add_to_initiative("elf", "12", hp_max=20, hp=20)
+    server = PlayerViewServer()
+    server.attach(initiative)
+    server.start()
+    viewers = []
+    try:
+        viewers.append(_Viewer(server))
+        changes = [
+            lambda: initiative.add_to_initiative("goblin", "+2", hp_max=7, hp=7),
+            lambda: initiative.copy_index(initiative.index_of("goblin"), 5),
+            lambda: initiative.toggle_hidden(initiative.index_of("goblin 3")),
+            lambda: initiative.damage(initiative.index_of("elf"), 12),
+            lambda: initiative.add_to_initiative("lich", "30", hidden=True),
+            lambda: initiative.remove_entry(initiative.index_of("orc")),
+            initiative.next_turn,
+            lambda: initiative.rename_entry(initiative.index_of("goblin 1"), "boss"),
+            lambda: initiative.remove_entry(initiative.index_of("elf")),
+            lambda: initiative.toggle_hidden(initiative.index_of("lich")),
+            lambda: initiative.apply_hp_batch("goblin *", -100),
+            # Changes hidden from the player view send nothing
+            lambda: initiative.damage(initiative.index_of("goblin 3"), 1),
+        ]
+        for step, change in enumerate(changes):
+            before = initiative.print_roster().splitlines()
+            change()
+            server.publish(initiative)
+            rows = initiative.print_roster().splitlines()
+            for viewer in viewers:
+                # The server only writes when the view changed
+                if rows != before:
+                    viewer.receive()
+                assert viewer.client.rows == rows, step
+            if step == 4:
+                # A viewer joining mid-encounter starts from a reset
+                viewers.append(_Viewer(server))
+                assert viewers[-1].client.rows == rows
+        assert len(viewers[0].client.rows) == len(rows) > 0
+    finally:
+        for viewer in viewers:
+            viewer.close()
+        server.stop()
+
+
+def test_client_applies_truncating_diff():
+    client = PlayerViewClient()
+    client.apply({"type": "reset", "rows": ["a", "b", "c"]})
+    client.apply({"type": "diff", "length": 2, "rows": {"0": "z"}})
+    assert client.rows == ["z", "b"]
+    client.apply({"type": "diff", "length": 4, "rows": {"2": "x", "3": "y"}})
+    assert client.rows == ["z", "b", "x", "y"]
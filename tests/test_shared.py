@@ -0,0 +1,141 @@
+"""A roster published in shared memory and read back by a viewer"""
+import uuid
+
+from multiprocessing import resource_tracker, shared_memory
+
+import pytest
+
+from src.roster import Initiative
+from src.shared import NAME_BYTES, SharedRoster, SharedRosterView
+
+
+@pytest.fixture
+def shared():
+    """Yields a shared roster under a segment name no other test uses"""
+    roster = SharedRoster(f"initiative-test-{uuid.uuid4().hex[:12]}", capacity=8)
+    yield roster
+    if roster.shm.buf is not None:
+        roster.close()
+
+
+def _view(name: str) -> SharedRosterView:
+    """Opens a view in the writer's own process, as the tests run in one"""
+    try:
+        return SharedRosterView(name)
+    finally:
+        # Before Python 3.13 the view drops the segment from the resource
+        # tracker, which this process still needs to track for the writer
+        resource_tracker.register(f"/{name}", "shared_memory")
+
+
+def _roster() -> Initiative:
+    """Returns a roster with a hidden entry, a non-ASCII name and a turn"""
+    initiative = Initiative(seed=0)
+    initiative.add_to_initiative("orc", "15", ac=13, hp_max=15, hp=9)
+    initiative.add_to_initiative("ghoul", "12", hp_max=22, hp=22, hidden=True)
+    initiative.add_to_initiative("éowyn", "10", ac=17, hp_max=30, hp=30)
+    initiative.next_turn()
+    initiative.next_turn()
+    return initiative
+
+
+def _rows(entries) -> list:
+    """Returns entries as dictionaries, in the order given"""
+    return [entry.to_dict() for entry in entries]
+
+
+def test_publish_and_read(shared):
+    initiative = _roster()
+    shared.attach(initiative)
+    shared.publish(initiative)
+    viewer = _view(shared.name)
+    try:
+        entries, turn, round, closed = viewer.read()
+        assert _rows(entries) == _rows(initiative)
+        assert (entries[turn].name, round, closed) == ("ghoul", 1, False)
+        sequence = viewer.sequence()
+        initiative.damage(0, 4)
+        initiative.next_turn()
+        shared.publish(initiative)
+        assert viewer.sequence() > sequence
+        entries, turn, _, _ = viewer.read()
+        assert entries[0].hp == 5 and entries[turn].name == "éowyn"
+    finally:
+        viewer.close()
+
+
+def test_publish_skips_unchanged_roster(shared):
+    initiative = _roster()
+    shared.attach(initiative)
+    shared.publish(initiative)
+    viewer = _view(shared.name)
+    sequence = viewer.sequence()
+    shared.publish(initiative)
+    assert viewer.sequence() == sequence
+    viewer.close()
+
+
+def test_render_hides_hidden_entries(shared):
+    initiative = _roster()
+    shared.attach(initiative)
+    shared.publish(initiative)
+    viewer = _view(shared.name)
+    text, closed = viewer.render()
+    viewer.close()
+    assert "orc" in text and "éowyn" in text and "ghoul" not in text
+    assert not closed
+
+
+def test_before_first_turn(shared):
+    initiative = Initiative(seed=0)
+    initiative.add_to_initiative("orc", "15")
+    shared.attach(initiative)
+    shared.publish(initiative)
+    viewer = _view(shared.name)
+    _, turn, round, _ = viewer.read()
+    viewer.close()
+    assert (turn, round) == (None, 0)
+
+
+def test_capacity_is_enforced(shared):
+    initiative = Initiative(seed=0)
+    for number in range(9):
+        initiative.add_to_initiative(f"orc {number}", "10")
+    shared.attach(initiative)
+    with pytest.raises(ValueError, match="at most 8 entries"):
+        shared.publish(initiative)
+    initiative.remove_entry(0)
+    shared.publish(initiative)
+
+
+def test_name_area_is_enforced(shared):
+    initiative = Initiative(seed=0)
+    initiative.add_to_initiative("a" * (8 * NAME_BYTES + 1), "10")
+    shared.attach(initiative)
+    with pytest.raises(ValueError, match="bytes of names"):
+        shared.publish(initiative)
+
+
+def test_close_is_seen_by_viewers(shared):
+    initiative = _roster()
+    shared.attach(initiative)
+    shared.publish(initiative)
+    viewer = _view(shared.name)
+    shared.close()
+    entries, _, _, closed = viewer.read()
+    viewer.close()
+    assert entries == [] and closed
+    with pytest.raises(FileNotFoundError):
+        SharedRosterView(shared.name)
+
+
+def test_view_refuses_other_segments():
+    segment = shared_memory.SharedMemory(
+        f"initiative-test-{uuid.uuid4().hex[:12]}", create=True, size=64
+    )
+    try:
+        with pytest.raises(ValueError, match="not a shared roster"):
+            _view(segment.name)
+    finally:
+        segment.close()
+        segment.unlink()
@@ -0,0 +1,73 @@
+"""Monte Carlo simulation of encounters between the sides of a roster"""
+import pytest
+
+from src.roster import Initiative
+from src.simulate import CHUNK_SIZE, attack_profile, simulate
+
+
+def _roster() -> Initiative:
+    """Returns a party of two against three goblins"""
+    initiative = Initiative(seed=0)
+    initiative.add_to_initiative("fighter", "+2", ac=18, hp_max=30, hp=30)
+    initiative.add_to_initiative("wizard", "+3", ac=12, hp_max=14, hp=14)
+    initiative.add_to_initiative("goblin", "+2", ac=15, hp_max=7, hp=7)
+    initiative.copy_index(initiative.index_of("goblin"), 2)
+    return initiative
+
+
+def _outcome(result) -> tuple:
+    """Returns every statistic a simulation result holds"""
+    return (
+        result.trials,
+        dict(result.wins),
+        result.rounds_total,
+        result.hp_total,
+        result.survivals,
+    )
+
+
+def test_attack_profiles():
+    initiative = _roster()
+    profiles = {"goblin": {"damage": "1d4"}, "goblin 2": {"to_hit": 6}}
+    fighter = attack_profile(initiative.lookup("fighter"), profiles)
+    goblin = attack_profile(initiative.lookup("goblin 2"), profiles)
+    assert fighter == {"to_hit": 3, "damage": "1d6", "side": "party"}
+    assert goblin == {"to_hit": 6, "damage": "1d4", "side": "monsters"}
+
+
+def test_totals_are_consistent():
+    initiative = _roster()
+    result = simulate(initiative, 300, workers=1, seed=1)
+    assert result.trials == 300 == sum(result.wins.values())
+    assert set(result.wins) <= {"party", "monsters", None}
+    assert 0 < result.mean_rounds() <= 100
+    assert all(0 <= survivals <= 300 for survivals in result.survivals)
+    assert result.summary().startswith("300 trials, 5 combatants\n")
+
+
+def test_stronger_side_wins_more():
+    initiative = _roster()
+    profiles = {"fighter": {"to_hit": 10, "damage": "3d8"}}
+    result = simulate(initiative, 200, profiles, workers=1, seed=2)
+    assert result.win_rate("party") > result.win_rate("monsters")
+
+
+def test_seed_gives_same_result_for_any_worker_count():
+    initiative = _roster()
+    trials = 2 * CHUNK_SIZE + 10
+    alone = simulate(initiative, trials, workers=1, seed=3)
+    spread = simulate(initiative, trials, workers=2, seed=3)
+    assert _outcome(alone) == _outcome(spread)
+
+
+def test_one_sided_roster_ends_at_once():
+    initiative = Initiative(seed=0)
+    initiative.add_to_initiative("fighter", "10", hp_max=10, hp=10)
+    result = simulate(initiative, 5, workers=1, seed=0)
+    assert (result.wins["party"], result.mean_rounds()) == (5, 0)
+
+
+def test_invalid_damage_is_refused():
+    initiative = _roster()
+    with pytest.raises(ValueError):
+        simulate(initiative, 10, {"goblin": {"damage": "lots"}}, workers=1)
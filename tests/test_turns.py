@@ -0,0 +1,125 @@
+"""Turn order, rounds and the current turn as the roster changes"""
+import pytest
+
+from src.roster import Initiative
+
+
+def _roster(*entries) -> Initiative:
+    """Returns a roster holding (name, initiative) entries"""
+    initiative = Initiative(seed=0)
+    for name, value in entries:
+        initiative.add_to_initiative(name, str(value))
+    return initiative
+
+
+def _turn(initiative: Initiative) -> tuple:
+    """Returns the round and the name of the entry whose turn it is"""
+    current = initiative.current_turn()
+    return initiative.round, current.name if current is not None else None
+
+
+def test_turns_wrap_into_new_rounds():
+    initiative = _roster(("orc", 15), ("elf", 12), ("imp", 3))
+    assert _turn(initiative) == (0, None)
+    seen = [_turn(initiative) for _ in range(7) if initiative.next_turn()]
+    assert seen == [
+        (1, "orc"),
+        (1, "elf"),
+        (1, "imp"),
+        (2, "orc"),
+        (2, "elf"),
+        (2, "imp"),
+        (3, "orc"),
+    ]
+
+
+def test_previous_turn_goes_back_across_rounds():
+    initiative = _roster(("orc", 15), ("elf", 12))
+    with pytest.raises(ValueError):
+        initiative.previous_turn()
+    for _ in range(3):
+        initiative.next_turn()
+    assert _turn(initiative) == (2, "orc")
+    initiative.previous_turn()
+    assert _turn(initiative) == (1, "elf")
+    initiative.previous_turn()
+    with pytest.raises(ValueError):
+        initiative.previous_turn()
+
+
+def test_ties_keep_insertion_order():
+    initiative = _roster(("b", 10), ("a", 10), ("c", 12), ("d", 10))
+    assert [entry.name for entry in initiative] == ["c", "b", "a", "d"]
+    initiative.modify_index(1, "initiative", 10)
+    # Changing initiative moves an entry behind those it now ties with
+    assert [entry.name for entry in initiative] == ["c", "a", "d", "b"]
+    assert [initiative.index_of(name) for name in "abcd"] == [1, 3, 0, 2]
+
+
+def test_turn_stays_on_entry_as_order_changes():
+    initiative = _roster(("orc", 15), ("elf", 12), ("imp", 3))
+    initiative.next_turn()
+    initiative.next_turn()
+    initiative.add_to_initiative("lich", "30")
+    initiative.copy_index(initiative.index_of("imp"), 3)
+    initiative.remove_entry(initiative.index_of("orc"))
+    assert _turn(initiative) == (1, "elf")
+    initiative.modify_index(initiative.index_of("elf"), "initiative", 1)
+    assert _turn(initiative) == (1, "elf")
+    assert initiative.next_turn().name == "lich"
+    assert initiative.round == 2
+
+
+def test_removing_current_entry_passes_the_turn():
+    initiative = _roster(("orc", 15), ("elf", 12))
+    initiative.next_turn()
+    initiative.next_turn()
+    initiative.remove_entry(initiative.index_of("elf"))
+    assert _turn(initiative) == (2, "orc")
+    initiative.remove_entry(0)
+    assert _turn(initiative) == (2, None)
+    with pytest.raises(ValueError):
+        initiative.next_turn()
+
+
+def test_delay_and_ready():
+    initiative = _roster(("orc", 15), ("elf", 12), ("imp", 3))
+    initiative.next_turn()
+    # The orc waits until after the imp
+    assert initiative.delay_turn(2).name == "elf"
+    assert [entry.name for entry in initiative] == ["elf", "imp", "orc"]
+    assert initiative.next_turn().name == "imp"
+    assert initiative.next_turn().name == "orc"
+    assert initiative.round == 1
+    # The elf readies an action for after the imp, which it ties with
+    initiative.next_turn()
+    assert initiative.ready_turn(initiative.index_of("imp")).name == "imp"
+    assert [entry.name for entry in initiative] == ["imp", "elf", "orc"]
+    with pytest.raises(ValueError):
+        initiative.ready_turn(initiative.index_of("imp"))
+
+
+def test_turn_row_skips_hidden_entries():
+    initiative = _roster(("orc", 15), ("elf", 12), ("imp", 3))
+    initiative.toggle_hidden(initiative.index_of("elf"))
+    for _ in range(3):
+        initiative.next_turn()
+    assert initiative.turn_row(True) == 2
+    assert initiative.turn_row() == 1
+    assert initiative.print_roster().splitlines()[1].startswith(">")
+
+
+def test_turn_changes_undo_through_records():
+    initiative = _roster(("orc", 15), ("elf", 12))
+    records = []
+    initiative.listeners.append(records.append)
+    initiative.next_turn()
+    initiative.next_turn()
+    initiative.next_turn()
+    initiative.listeners.remove(records.append)
+    for change in reversed(records):
+        initiative.revert_change(change)
+    assert _turn(initiative) == (0, None)
+    for change in records:
+        initiative.apply_change(change)
+    assert _turn(initiative) == (2, "orc")
@@ -0,0 +1,94 @@
+"""Partial views of a large roster: top, page, window and collapsed"""
+import io
+
+import pytest
+
+from src.initiative_cmd import ProgramLoop
+from src.roster import Initiative
+
+
+def _roster() -> Initiative:
+    """Returns 30 goblins, every third one hidden, with the 8th row's turn"""
+    initiative = Initiative(seed=0)
+    for number in range(1, 31):
+        hidden = number % 3 == 0
+        initiative.add_to_initiative(
+            f"goblin {number}", str(100 - number), hp_max=7, hp=7, hidden=hidden
+        )
+    for _ in range(8):
+        initiative.next_turn()
+    return initiative
+
+
+def _normalized(text: str) -> list:
+    """Returns the lines of a view with their column padding removed"""
+    return [" ".join(line.split()) for line in text.splitlines()]
+
+
+@pytest.mark.parametrize("with_hidden", [False, True])
+@pytest.mark.parametrize("start, stop", [(0, 5), (3, 12), (18, None), (25, 40)])
+def test_rows_match_full_view(with_hidden, start, stop):
+    initiative = _roster()
+    full = _normalized(initiative.print_roster(with_hidden))
+    part = _normalized("".join(initiative.iter_roster(start, stop, with_hidden)))
+    assert part == full[start:stop]
+
+
+def test_turn_row_counts_shown_rows():
+    initiative = _roster()
+    assert initiative.current_turn().name == "goblin 8"
+    assert initiative.turn_row(True) == 7
+    # goblin 3 and goblin 6 come before it and are hidden
+    assert initiative.turn_row(False) == 5
+    assert Initiative().turn_row() == 0
+
+
+def _run(line: str) -> list:
+    """Runs one command against the roster, returning the rows it printed"""
+    program = ProgramLoop(stdout=io.StringIO())
+    program.register_initiative(_roster())
+    program.onecmd(line)
+    return _normalized(program.stdout.getvalue())[2:]
+
+
+@pytest.mark.parametrize(
+    "line, rows",
+    [
+        ("print --top 3", ["1. [99] goblin 1", "2. [98] goblin 2", "3. [96] goblin 4"]),
+        (
+            "print --window 1",
+            ["5. [93] goblin 7", ">6. [92] goblin 8", "7. [90] goblin 10"],
+        ),
+        (
+            "hprint --window 1",
+            [
+                "7. [93] goblin 7 (7/7 HP)",
+                ">8. [92] goblin 8 (7/7 HP)",
+                "9. [91] goblin 9 (7/7 HP)",
+            ],
+        ),
+        ("print --page 2", []),
+    ],
+)
+def test_view_commands(line, rows):
+    assert _run(line) == rows
+
+
+def test_page_command():
+    rows = _run("hprint --page 2")
+    assert len(rows) == 10
+    assert (rows[0], rows[-1]) == (
+        "21. [79] goblin 21 (7/7 HP)",
+        "30. [70] goblin 30 (7/7 HP)",
+    )
+
+
+def test_collapsed_view():
+    rows = _run("print --collapse")
+    assert rows == [">1. [99] goblin x20"]
+
+
+@pytest.mark.parametrize("line", ["print --top 0", "print --page", "hprint --side 3"])
+def test_invalid_view_options(line, capsys):
+    assert _run(line) == []
+    assert "failed" in capsys.readouterr().out